@@ -0,0 +1,232 @@
+"""
+MedBot — Admission control and per-client fair queueing for Stage 2
+===================================================================
+Under a burst, every /api/chat request used to go straight to Groq: with
+threaded workers they all waited on the upstream at once; with sync workers
+they sat invisibly in gunicorn's listen backlog until they timed out. One
+client replaying long histories in a loop could take most of the LLM capacity
+from everyone else. AdmissionControl sits in front of the LLM call (Stage 1,
+the knowledge-base fast path and the response cache never wait on it):
+
+  slots    → at most MEDBOT_ADMISSION_INFLIGHT LLM calls run at once per worker
+  queue    → beyond that, up to MEDBOT_ADMISSION_QUEUE requests wait, one FIFO
+             per client; a freed slot goes to the next client in round-robin
+             order, so a client with 20 queued requests gets one turn like a
+             client with one
+  buckets  → every client has a token bucket of MEDBOT_ADMISSION_BURST prompt
+             tokens, refilled at MEDBOT_ADMISSION_RATE tokens/s; a request
+             costs the estimated tokens of its message and history. While
+             nobody waits, requests are admitted regardless (the bucket is only
+             drained); once there is a queue, a request its client's bucket
+             cannot pay for is shed with 429 instead of queued — checked
+             once more before Stage 1 runs, so such a client costs almost nothing
+  shedding → a request is also shed at once when the queue is full or when
+             its expected wait (queue position × recent slot hold time) is
+             past MEDBOT_ADMISSION_WAIT, and after waiting that long without a
+             slot. app.py answers a shed request from the knowledge base
+             (route "shed") when the intent is confident, otherwise 503; both
+             the 429 and the 503 carry Retry-After.
+
+Clients are told apart by the peer address, or, behind MEDBOT_PROXY_HOPS
+trusted proxies, by MEDBOT_CLIENT_HEADER (X-Forwarded-For by default: the
+MEDBOT_PROXY_HOPS-th address from the right, the one the outermost trusted proxy
+saw). Behind the Render/Heroku router the peer address is the router's, shared
+by every user, so the Procfile sets MEDBOT_PROXY_HOPS=1. With no proxy in front
+the header is whatever the client sent, hence the default of 0: never trusted.
+
+The queue lives in the worker, so it only sees concurrency the worker accepts:
+run gunicorn with threads (--threads N, N above the in-flight limit) for it
+to queue and shed; with one sync thread per worker only the buckets matter.
+asgi.py does not use any of this: its chat routes are never queued, rate
+limited or shed per client, only capped by its LLMPool.
+
+Config (environment):
+  MEDBOT_ADMISSION           on | off                                          (default on)
+  MEDBOT_ADMISSION_INFLIGHT  concurrent LLM calls per worker                   (default 8)
+  MEDBOT_ADMISSION_QUEUE     requests waiting for a slot per worker, 0 = none  (default 32)
+  MEDBOT_ADMISSION_WAIT      longest wait for a slot in seconds                (default 5)
+  MEDBOT_ADMISSION_RATE      per-client refill in prompt tokens per second     (default 2000)
+  MEDBOT_ADMISSION_BURST     per-client bucket size in prompt tokens           (default 8000)
+  MEDBOT_CLIENT_HEADER       request header naming the client, "" = peer address (default X-Forwarded-For)
+  MEDBOT_PROXY_HOPS          trusted proxies appending to that header, 0 = peer address (default 0)
+"""
+
+import os, math, time, threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from metrics import Histogram
+
+MAX_CLIENTS = 10000   # idle, refilled buckets are forgotten beyond this many clients
+HOLD_ALPHA  = 0.2     # EWMA weight of the latest slot hold time
+
+
+class Shed(Exception):
+    """The request was not admitted to an LLM slot."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"request shed ({reason})")
+        self.reason      = reason   # rate_limited | queue_full | timeout
+        self.status      = 429 if reason == "rate_limited" else 503
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class _Bucket:
+    __slots__ = ("tokens", "stamp")
+
+    def __init__(self, tokens: float, stamp: float):
+        self.tokens = tokens
+        self.stamp  = stamp
+
+
+class _Waiter:
+    __slots__ = ("event", "admitted")
+
+    def __init__(self):
+        self.event    = threading.Event()
+        self.admitted = False
+
+
+class AdmissionControl:
+    """
+    with admission.slot(client, cost): ...  runs the block holding one LLM slot,
+    after waiting for it in the client's queue if needed, or raises Shed.
+    """
+
+    def __init__(self, max_inflight: int = 8, max_queue: int = 32, max_wait: float = 5.0,
+                 rate: float = 2000.0, burst: float = 8000.0):
+        self.max_inflight = max_inflight
+        self.max_queue    = max_queue
+        self.max_wait     = max_wait
+        self.rate         = rate
+        self.burst        = burst
+        self.inflight     = 0
+        self.queued       = 0
+        self.hold         = None                  # EWMA of seconds a slot is held
+        self.wait         = Histogram()           # queue wait of admitted requests
+        self.counts       = {"admitted": 0, "queued": 0, "rate_limited": 0, "queue_full": 0, "timeout": 0}
+        self._buckets     = {}                    # client → _Bucket
+        self._waiting     = OrderedDict()         # client → deque of _Waiter, in round-robin order
+        self._lock        = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        if os.environ.get("MEDBOT_ADMISSION", "on").lower() == "off":
+            return None
+        return cls(max_inflight = int(os.environ.get("MEDBOT_ADMISSION_INFLIGHT", 8)),
+                   max_queue    = int(os.environ.get("MEDBOT_ADMISSION_QUEUE", 32)),
+                   max_wait     = float(os.environ.get("MEDBOT_ADMISSION_WAIT", 5)),
+                   rate         = float(os.environ.get("MEDBOT_ADMISSION_RATE", 2000)),
+                   burst        = float(os.environ.get("MEDBOT_ADMISSION_BURST", 8000)))
+
+    # ── Token buckets ───────────────────────────────────────────────────────
+    def _bucket(self, client: str, now: float) -> _Bucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= MAX_CLIENTS:
+                self._forget_idle(now)
+            bucket = self._buckets[client] = _Bucket(self.burst, now)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.stamp) * self.rate)
+            bucket.stamp  = now
+        return bucket
+
+    def _forget_idle(self, now: float):
+        """Drop buckets that would be full again: a new bucket for that client is the same thing."""
+        full = [c for c, b in self._buckets.items()
+                if b.tokens + (now - b.stamp) * self.rate >= self.burst and c not in self._waiting]
+        for client in full:
+            del self._buckets[client]
+
+    # ── Slots ───────────────────────────────────────────────────────────────
+    def check(self, client: str, cost: float):
+        """
+        Early rate check, before any work is spent on the request: raise the
+        Shed acquire() would raise for `client`'s rate right now. Charges nothing.
+        """
+        cost = min(cost, self.burst)
+        with self._lock:
+            if self.inflight < self.max_inflight and not self.queued:
+                return
+            bucket = self._bucket(client, time.monotonic())
+            if bucket.tokens < cost:
+                self.counts["rate_limited"] += 1
+                raise Shed("rate_limited", (cost - bucket.tokens) / self.rate)
+
+    def acquire(self, client: str, cost: float) -> float:
+        """Take a slot for `client` (→ seconds waited) or raise Shed."""
+        cost = min(cost, self.burst)   # a full bucket always pays for one request
+        with self._lock:
+            now    = time.monotonic()
+            bucket = self._bucket(client, now)
+            if self.inflight < self.max_inflight and not self.queued:
+                bucket.tokens = max(0.0, bucket.tokens - cost)
+                self.inflight += 1
+                self.counts["admitted"] += 1
+                self.wait.observe(0.0)
+                return 0.0
+            if bucket.tokens < cost:
+                self.counts["rate_limited"] += 1
+                raise Shed("rate_limited", (cost - bucket.tokens) / self.rate)
+            if self.queued >= self.max_queue or self._expected_wait(self.queued + 1) > self.max_wait:
+                self.counts["queue_full"] += 1
+                raise Shed("queue_full", self._expected_wait(self.queued + 1) or self.max_wait)
+            bucket.tokens -= cost
+            waiter = _Waiter()
+            self._waiting.setdefault(client, deque()).append(waiter)
+            self.queued += 1
+            self.counts["queued"] += 1
+
+        waiter.event.wait(self.max_wait)
+        with self._lock:
+            waited = time.monotonic() - now
+            if waiter.admitted:
+                self.counts["admitted"] += 1
+                self.wait.observe(waited)
+                return waited
+            queue = self._waiting[client]
+            queue.remove(waiter)
+            if not queue:
+                del self._waiting[client]
+            self.queued -= 1
+            bucket.tokens = min(self.burst, bucket.tokens + cost)   # not served → not charged
+            self.counts["timeout"] += 1
+        raise Shed("timeout", self.max_wait)
+
+    def release(self, held: float):
+        """Give a slot back (held = seconds it was held) and hand it to the next client in line."""
+        with self._lock:
+            self.hold      = held if self.hold is None else self.hold + HOLD_ALPHA * (held - self.hold)
+            self.inflight -= 1
+            while self.inflight < self.max_inflight and self._waiting:
+                client, queue = next(iter(self._waiting.items()))
+                waiter = queue.popleft()
+                if queue:
+                    self._waiting.move_to_end(client)
+                else:
+                    del self._waiting[client]
+                self.queued   -= 1
+                self.inflight += 1
+                waiter.admitted = True
+                waiter.event.set()
+
+    def _expected_wait(self, position: int) -> float:
+        """Seconds until the position-th waiter gets a slot, judging by recent hold times (0 → unknown)."""
+        if self.hold is None:
+            return 0.0
+        return math.ceil(position / self.max_inflight) * self.hold
+
+    @contextmanager
+    def slot(self, client: str, cost: float):
+        self.acquire(client, cost)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {"inflight": self.inflight, "max_inflight": self.max_inflight, "queue_depth": self.queued,
+                "max_queue": self.max_queue, "max_wait": self.max_wait, "clients": len(self._buckets),
+                "waiting_clients": len(self._waiting), "hold_ms": round(self.hold * 1000, 1) if self.hold else None,
+                "wait": {k: v for k, v in self.wait.snapshot().items() if k != "buckets"}, **self.counts}
@@ -9,66 +9,178 @@ Pipeline:
 Routes:
   GET  /           → Landing page
   GET  /chat       → Chat interface
-  POST /api/chat   → JSON: {"message": "...", "history": [...]}
-                         → {"response": "...", "intent": "...", "confidence": 95.3, "model": "SVM"}
+  POST /api/chat   → JSON: {"message": "...", "session_id": "..."}
+                         → {"response": "...", "route": "kb|cache|llm|fallback|shed", "session_id": "...", "intent": "...", ...}
+                         (the conversation is kept server-side, see sessions.py; "history" is still accepted)
+                         429/503 + Retry-After when the LLM is overloaded and there is no confident
+                         knowledge-base answer (see admission.py)
+  POST /api/chat/stream → same request body, answered as Server-Sent Events
+                         (meta event with intent/confidence/top3 first, then LLM tokens)
+  POST /api/classify/batch → JSON: {"messages": [...]} → {"results": [{tag, intent, confidence, top3}, ...]}
   GET  /api/models → Returns ML model accuracy + training stats
+  GET  /assets/<path> → static/ files under content-hashed names (immutable; see static_assets.py)
+  GET  /api/ready  → 200 once /api/chat can be served, 503 while MEDBOT_FAST_START is still warming up
+  GET  /api/stats  → Runtime counters (response cache, micro-batcher, ...)
+  GET  /api/metrics → Prometheus text: per-stage latency, route latency, errors, fallbacks, confidence
 """
 
-import os, json, joblib
-from flask import Flask, render_template, request, jsonify
-from groq import Groq
+import os, json, time, threading
+from contextlib import nullcontext
+import numpy as np
+from flask import Flask, Response, abort, render_template, request, jsonify, stream_with_context, url_for
 from dotenv import load_dotenv
+from response_cache import ResponseCache
+from microbatch import MicroBatcher
+from prompt_budget import PromptBudget, estimate_tokens
+from prompt_table import PromptTable
+from sessions import sessions_from_env, new_session_id, SessionLost
+from routing import FastPath, RouteStats, gate_confidence
+from metrics import Registry, PERCENT_BUCKETS
+from resilience import LLMGuard, LLMUnavailable
+from singleflight import SingleFlight, flight_key
+from pattern_index import PatternIndex
+from cascade import Cascade
+from static_assets import AssetStore
+from knowledge_store import KnowledgeStore
+from admission import AdmissionControl, Shed
 
 load_dotenv()
 
-app    = Flask(__name__)
-BASE   = os.path.dirname(os.path.abspath(__file__))
-client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+app  = Flask(__name__)
+BASE = os.path.dirname(os.path.abspath(__file__))
+
+# 0 → load the models and the Groq client at import (preloaded once by the gunicorn master)
+# 1 → import only what "/", "/chat" and /api/models need, load the rest on a warm-up thread;
+#     /api/ready says when /api/chat can be served (see "Warm-up" below)
+FAST_START = os.environ.get("MEDBOT_FAST_START", "0") == "1"
+
+# Stage timers + counters behind /api/metrics; MEDBOT_METRICS=0 turns them into no-ops,
+# MEDBOT_SERVER_TIMING=1 adds a per-request Server-Timing header (see metrics.py)
+telemetry = Registry.from_env()
 
 # ── Load ML Models ─────────────────────────────────────────────────────────────
 def load_model(name):
+    import joblib   # with scikit-learn (pulled in by unpickling) most of the start-up time
     return joblib.load(os.path.join(BASE, "models", name))
 
-best_model    = load_model("best_model.pkl")
-label_encoder = load_model("label_encoder.pkl")
-knowledge     = load_model("knowledge.pkl")
-
 with open(os.path.join(BASE, "models", "model_meta.json")) as f:
     model_meta = json.load(f)
 
+# tfidf  → production TF-IDF pipeline picked by train.py (best_model)
+# hashed → HashingVectorizer + stored idf + calibrated SVM: no vocabulary to load
+ENGINE = os.environ.get("MEDBOT_ENGINE", "tfidf").lower()
+
+# pickle  → joblib pipelines (each worker unpickles a private copy)
+# compact → flat arrays memory-mapped from models/compact/, shared across workers (see compact_model.py)
+MODEL_FORMAT = os.environ.get("MEDBOT_MODEL_FORMAT", "pickle").lower()
+
+MODEL_NAME = model_meta["engines"]["hashed"]["model"] if ENGINE == "hashed" else model_meta["best_model"]
+
 CONFIDENCE_THRESHOLD = 0.25   # below this → LLM gets no ML hint
 
+# Set by load_pipeline() (see "Warm-up"): the models, the Stage 1 cascade, the response cache,
+# the pattern index, the Groq client and its guard
+best_model = label_encoder = knowledge = knowledge_store = vectorize = classify = cascade = None
+response_cache = pattern_index = client = llm_guard = LLM_RETRY_ON = None
+
+# Clear greetings/thanks/emergencies answered from the knowledge base, no LLM (see routing.py);
+# the gates train.py tuned are on the best model's scale, so the hashed engine keeps the defaults
+fast_path   = FastPath.from_env(model_meta.get("fast_path") if ENGINE == "tfidf" else None)
+route_stats = RouteStats()
+
 
 # ── ML Intent Detection ─────────────────────────────────────────────────────────
+CLASSES    = None   # proba column → intent tag (load_pipeline)
+TOP_K      = 3
+BATCH_MAX  = int(os.environ.get("MEDBOT_BATCH_MAX", 10000))
+EVIDENCE_K = max(1, int(os.environ.get("MEDBOT_INDEX_K", 3)))   # nearest patterns per message
+_COLUMN    = {}     # intent tag → proba column
+_PATTERNS  = []     # (pattern, tag) rows of the pattern index
+
+
+def detect_intents(messages: list) -> list:
+    """
+    Stage 1, batched: classify many messages with one predict_proba call.
+    Top-k uses argpartition (O(classes) per row) and labels come straight from
+    the precomputed CLASSES array. With the cascade on, "model_used" names the
+    model that answered each row. With the pattern index on, each result also
+    carries its nearest training patterns ("evidence") and unsure rows are
+    refined by their votes ("refined"). "gate_confidence" and "gate_margin" are
+    what the routing gates compare: the classifier's own probabilities of the
+    top two intents (never the refined blend), on the best model's scale
+    whichever cascade stage answered. Returns one detect_intent()-style dict per message.
+    """
+    texts    = [m.lower().strip() for m in messages]
+    features = vectorize(texts)
+    if cascade is not None:
+        proba, used = cascade.predict_proba(features)
+    else:
+        proba, used = classify(features), None
+    raw = proba
+    if pattern_index is not None:
+        near_ids, near_sims = pattern_index.search(features, EVIDENCE_K)
+        proba, refined      = pattern_index.refine(raw, near_ids, near_sims)
+
+    # Top-3 per row: partition, then order just those 3 columns
+    top_idx = np.argpartition(proba, -TOP_K, axis=1)[:, -TOP_K:]
+    top_p   = np.take_along_axis(proba, top_idx, axis=1)
+    order   = np.argsort(-top_p, axis=1, kind="stable")
+    top_idx = np.take_along_axis(top_idx, order, axis=1)
+    top_pct = (np.take_along_axis(top_p, order, axis=1) * 100).tolist()
+    top_tag = CLASSES[top_idx].tolist()
+
+    # Routing gates: classifier probabilities of the top two, on one scale whichever model answered
+    gate    = np.take_along_axis(raw, top_idx[:, :2], axis=1)
+    if cascade is not None:
+        gate = cascade.gate(gate, used)
+    gate    = (gate * 100).tolist()
+
+    results = []
+    for row, (tags, pcts) in enumerate(zip(top_tag, top_pct)):
+        result = {
+            "tag":             tags[0],
+            "confidence":      round(pcts[0], 1),
+            "top3":            [(t, round(p, 1)) for t, p in zip(tags, pcts)],
+            "top_responses":   kb_hints(tags[0]),
+            "model_used":      MODEL_NAME if used is None else used[row],
+            "gate_confidence": round(gate[row][0], 1),
+            "gate_margin":     round(gate[row][0] - (gate[row][1] if TOP_K > 1 else 0.0), 1),
+        }
+        if pattern_index is not None:
+            result["evidence"]       = [{"pattern": _PATTERNS[j][0], "tag": _PATTERNS[j][1],
+                                         "similarity": round(float(s), 3)}
+                                        for j, s in zip(near_ids[row], near_sims[row]) if j >= 0]
+            result["refined"]        = bool(refined[row])
+        results.append(result)
+    return results
+
+
+_KB_HINTS = {}   # tag → its top 2 KB answers, sent to the LLM as hints (filled on first use)
+
+
+def kb_hints(tag: str) -> tuple:
+    if knowledge_store is not None:   # just the first two responses, read on demand through the store's LRU
+        return knowledge_store.hints(tag)
+    hints = _KB_HINTS.get(tag)
+    if hints is None:
+        intent_map = knowledge["intent_map"]
+        hints = _KB_HINTS[tag] = tuple(intent_map.get(tag, intent_map.get(knowledge["fallback"], []))[:2])
+    return hints
+
+
+# Optional: coalesce concurrent single-message calls into one batch (see microbatch.py)
+intent_batcher = MicroBatcher.from_env(detect_intents)
+
+
 def detect_intent(user_input: str) -> dict:
     """
     Stage 1: Run TF-IDF + ML classifier to detect medical intent.
-    Returns dict: {tag, confidence, top_responses}
+    Returns dict: {tag, confidence, top3, top_responses, model_used, gate_confidence, gate_margin[, evidence, refined]}
     """
-    text  = [user_input.lower().strip()]
-    proba = best_model.predict_proba(text)[0]
-    top_idx = int(proba.argmax())
-    conf    = float(proba[top_idx])
-    tag     = label_encoder.inverse_transform([top_idx])[0]
-
-    # Get top-3 intents for richer context
-    top3_idx = proba.argsort()[-3:][::-1]
-    top3 = [(label_encoder.inverse_transform([i])[0], round(float(proba[i])*100, 1))
-            for i in top3_idx]
-
-    # Get knowledge base responses for the detected intent
-    top_responses = knowledge["intent_map"].get(
-        tag,
-        knowledge["intent_map"].get(knowledge["fallback"], [])
-    )
-
-    return {
-        "tag":           tag,
-        "confidence":    round(conf * 100, 1),
-        "top3":          top3,
-        "top_responses": top_responses[:2],   # send top 2 KB answers as hints
-        "model_used":    model_meta["best_model"],
-    }
+    with telemetry.stage("detect_intent"):
+        if intent_batcher is not None:
+            return intent_batcher.submit(user_input)
+        return detect_intents([user_input])[0]
 
 
 # ── LLM Doctor Response (Stage 2) ──────────────────────────────────────────────
@@ -92,104 +204,698 @@ IMPORTANT: Always end with a brief reminder that your advice is informational an
 should see a licensed physician for proper diagnosis and treatment."""
 
 
-def build_system_prompt(ml_result: dict) -> str:
-    """Inject ML-detected intent as context into the LLM system prompt."""
-    prompt = SYSTEM_PROMPT_BASE
+# Per-intent prompt heads rendered once (warmed in load_pipeline), confidence appended per request
+# (see prompt_table.py)
+prompt_table = PromptTable(SYSTEM_PROMPT_BASE)
 
-    if ml_result["confidence"] >= CONFIDENCE_THRESHOLD * 100:
-        intent_tag   = ml_result["tag"].replace("_", " ").title()
-        confidence   = ml_result["confidence"]
-        kb_hints     = "\n".join(f"- {r}" for r in ml_result["top_responses"])
 
-        prompt += f"""
+def build_system_prompt(ml_result: dict, hints: list = None) -> str:
+    """Inject ML-detected intent as context into the LLM system prompt.
+    `hints` are the knowledge-base hints to include; None leaves the ML block out."""
+    return prompt_table.render(ml_result, hints)
 
---- INTERNAL ML CONTEXT (do NOT mention to patient) ---
-The patient's message has been classified by your internal ML diagnostic system:
-  • Detected Medical Intent : {intent_tag}
-  • ML Classifier Confidence: {confidence}%
-  • Model Used              : {ml_result['model_used']} (TF-IDF features)
-  • Knowledge Base Hints    :
-{kb_hints}
 
-Use this context to give a more targeted, medically accurate response. \
-If the intent doesn't match the patient's actual message, trust the message itself."""
+# ── Groq LLM Call ──────────────────────────────────────────────────────────────
+LLM_MODEL = "llama-3.3-70b-versatile"
 
-    return prompt
+# Input-token budget: compacts history, dedupes KB hints, logs prompt sizes (see prompt_budget.py)
+prompt_budget = PromptBudget.from_env(ml_min_confidence=CONFIDENCE_THRESHOLD * 100)
+
+
+
+def build_messages(user_message: str, history: list, ml_result: dict) -> list:
+    """Assemble the chat-completion message list: system prompt, compacted history, new message."""
+    with telemetry.stage("build_prompt"):
+        return prompt_budget.build(user_message, history, ml_result, build_system_prompt, prompt_table.tokens)
 
 
-# ── Groq LLM Call ──────────────────────────────────────────────────────────────
 def get_llm_response(user_message: str, history: list, ml_result: dict) -> str:
     """Stage 2: Send to Groq Llama 3.3 70B with enriched doctor system prompt."""
-    system_prompt = build_system_prompt(ml_result)
+    messages = build_messages(user_message, history, ml_result)
+    with telemetry.stage("llm"):
+        completion = llm_guard.call(lambda timeout: client.chat.completions.create(
+            model       = LLM_MODEL,
+            messages    = messages,
+            temperature = 0.7,
+            max_tokens  = 1024,
+            top_p       = 0.9,
+            timeout     = timeout,
+        ))
+    return completion.choices[0].message.content
+
+
+def stream_llm_response(user_message: str, history: list, ml_result: dict):
+    """Stage 2 (streaming): yield response text fragments as Groq produces them.
+    Raises LLMUnavailable before the first fragment if the stream cannot be opened."""
+    messages = build_messages(user_message, history, ml_result)
+    started, first, failed = time.perf_counter(), True, True
+    try:
+        # Retried and bounded like get_llm_response, but never hedged: a losing stream would stay open
+        stream = llm_guard.call(lambda timeout: client.chat.completions.create(
+            model       = LLM_MODEL,
+            messages    = messages,
+            temperature = 0.7,
+            max_tokens  = 1024,
+            top_p       = 0.9,
+            stream      = True,
+            timeout     = timeout,
+        ), hedge=False)
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first:
+                    telemetry.observe_stage("llm_first_token", time.perf_counter() - started)
+                    first = False
+                yield chunk.choices[0].delta.content
+        failed = False
+    finally:
+        telemetry.observe_stage("llm", time.perf_counter() - started, failed=failed)
+
+
+# ── Response Cache ──────────────────────────────────────────────────────────────
+def cache_lookup(user_message: str, history: list, ml_result: dict):
+    """Return a cached Stage 2 answer for this message/intent/history, or None."""
+    if response_cache is None:
+        return None
+    return response_cache.get(user_message, ml_result["tag"], history)
+
+
+def cache_store(user_message: str, history: list, ml_result: dict, response_text: str):
+    if response_cache is not None and response_text:
+        response_cache.put(user_message, ml_result["tag"], history, response_text)
+
+
+def local_answer(user_message: str, history: list, ml_result: dict):
+    """(response_text, route) without calling the LLM: KB fast path, then the cache; (None, "llm") otherwise."""
+    observe_intent(ml_result)
+    if fast_path is not None:
+        with telemetry.stage("fast_path"):
+            response_text = fast_path.answer(ml_result, knowledge["intent_map"], user_message)
+        if response_text is not None:
+            return response_text, "kb"
+    with telemetry.stage("cache_lookup"):
+        response_text = cache_lookup(user_message, history, ml_result)
+    return response_text, ("cache" if response_text is not None else "llm")
+
+
+def fallback_answer(ml_result: dict, error: LLMUnavailable) -> str:
+    """Knowledge-base answer for the detected intent when Groq is unavailable."""
+    telemetry.inc("medbot_fallbacks_total", FALLBACKS_HELP, reason="llm_unavailable")
+    print(f"⚠️  LLM unavailable ({error.reason}), answering '{ml_result['tag']}' from the knowledge base")
+    responses = knowledge["intent_map"].get(ml_result["tag"])
+    if not responses or gate_confidence(ml_result) < CONFIDENCE_THRESHOLD * 100:
+        return ("⚠️ I can't reach my full medical reasoning service right now. Please try again in a minute. "
+                "If this is an emergency, call your local emergency number immediately.")
+    return "⚠️ I'm answering from my built-in medical notes right now, so this may be brief:\n\n" + responses[0]
+
+
+# ── Admission control ───────────────────────────────────────────────────────────
+# At most MEDBOT_ADMISSION_INFLIGHT Groq calls per worker; further requests wait in per-client
+# round-robin queues, behind per-client token buckets, or are shed (see admission.py)
+admission     = AdmissionControl.from_env()
+# Behind Render/Heroku every request comes from the router, so the peer address is one "client":
+# deployments behind a proxy set MEDBOT_PROXY_HOPS (the Procfile sets 1). Without a proxy the header
+# is whatever the client sent, so by default (0) it is not trusted at all
+CLIENT_HEADER = os.environ.get("MEDBOT_CLIENT_HEADER", "X-Forwarded-For")
+PROXY_HOPS    = max(0, int(os.environ.get("MEDBOT_PROXY_HOPS", 0)))
+
+
+def client_id() -> str:
+    """
+    Who is asking: the address the outermost trusted proxy saw, i.e. the
+    MEDBOT_PROXY_HOPS-th value of MEDBOT_CLIENT_HEADER from the right (hops to
+    its left are whatever the client sent), else the peer address.
+    """
+    hops = [h.strip() for h in request.headers.get(CLIENT_HEADER, "").split(",")] \
+        if CLIENT_HEADER and PROXY_HOPS else []
+    hops = [h for h in hops if h]
+    return (hops[-min(PROXY_HOPS, len(hops))] if hops else "") or request.remote_addr or "-"
 
-    messages = [{"role": "system", "content": system_prompt}]
 
-    # Include last 10 turns of history for context
-    for turn in history[-10:]:
-        if turn.get("role") in ("user", "assistant") and turn.get("content"):
-            messages.append({"role": turn["role"], "content": turn["content"]})
+def request_cost(user_message: str, history: list) -> int:
+    """Estimated prompt tokens a request asks for: its message + the history turns the LLM would be given."""
+    turns = history[-prompt_budget.history_turns:]
+    return estimate_tokens(user_message) + sum(estimate_tokens(t.get("content") or "") for t in turns)
 
-    messages.append({"role": "user", "content": user_message})
 
-    completion = client.chat.completions.create(
-        model       = "llama-3.3-70b-versatile",
-        messages    = messages,
-        temperature = 0.7,
-        max_tokens  = 1024,
-        top_p       = 0.9,
-    )
-    return completion.choices[0].message.content
+def llm_slot(client: str, user_message: str, history: list):
+    """Context manager holding one admitted LLM slot (raises Shed); a no-op with MEDBOT_ADMISSION=off."""
+    if admission is None:
+        return nullcontext()
+    return admission.slot(client, request_cost(user_message, history))
+
+
+def shed_answer(ml_result: dict, shed: Shed):
+    """Knowledge-base answer for a request shed under overload, None → answer 429/503 instead."""
+    telemetry.inc("medbot_fallbacks_total", FALLBACKS_HELP, reason="shed")
+    responses = knowledge["intent_map"].get(ml_result["tag"])
+    if shed.status == 429 or not responses or gate_confidence(ml_result) < CONFIDENCE_THRESHOLD * 100:
+        return None
+    return "⚠️ I'm very busy right now, so here's a brief answer from my built-in medical notes:\n\n" + responses[0]
+
+
+def early_shed(client: str, user_message: str, history: list):
+    """429 before Stage 1 for a client already over its share while the LLM is busy (raises Shed)."""
+    if admission is not None:
+        admission.check(client, request_cost(user_message, history))
+
+
+def busy_text(shed: Shed) -> str:
+    if shed.status == 429:
+        return "⚠️ You're sending messages faster than I can answer them. Please wait a moment."
+    return "⚠️ MedBot is very busy right now. Please try again in a moment."
+
+
+def busy_response(shed: Shed):
+    """429 (client over its fair share) or 503 (overloaded), both with Retry-After."""
+    return (jsonify({"response": busy_text(shed), "intent": "", "confidence": 0}), shed.status,
+            {"Retry-After": str(shed.retry_after)})
+
+
+def respond(user_message: str, history: list, ml_result: dict, client: str = "-"):
+    """Stage 2 → (response_text, route): local answer if there is one, else Groq (then cached)."""
+    response_text, route = local_answer(user_message, history, ml_result)
+    if response_text is None:
+        try:
+            with llm_slot(client, user_message, history):
+                response_text = get_llm_response(user_message, history, ml_result)
+        except LLMUnavailable as e:
+            return fallback_answer(ml_result, e), "fallback"
+        except Shed as e:
+            response_text = shed_answer(ml_result, e)
+            if response_text is None:
+                raise
+            return response_text, "shed"
+        cache_store(user_message, history, ml_result, response_text)
+    return response_text, route
+
+
+# Identical concurrent chats (same message + history) share one pipeline run (see singleflight.py)
+single_flight = SingleFlight.from_env()
+
+
+def answer(user_message: str, history: list, client: str = "-"):
+    """Stage 1 + Stage 2 → (ml_result, response_text, route), coalesced across identical in-flight requests."""
+    def pipeline():
+        ml_result = detect_intent(user_message)
+        response_text, route = respond(user_message, history, ml_result, client)
+        return ml_result, response_text, route
+
+    if single_flight is None:
+        return pipeline()
+    # A leader shed by admission control says nothing about the followers' clients: they retry
+    result, _ = single_flight.run(flight_key(user_message, history), pipeline, retry_on=(Shed,))
+    return result
+
+
+def llm_stream(client: str, user_message: str, history: list, ml_result: dict):
+    """Groq fragments for Stage 2 (admitted, then cached), fanned out to identical in-flight streams."""
+    def pipeline():
+        parts = []
+        with llm_slot(client, user_message, history):
+            for text in stream_llm_response(user_message, history, ml_result):
+                parts.append(text)
+                yield text
+        cache_store(user_message, history, ml_result, "".join(parts))
+
+    if single_flight is None:
+        return pipeline()
+    return single_flight.stream(flight_key(user_message, history), pipeline, retry_on=(Shed,))
+
+
+# ── Conversation Sessions ───────────────────────────────────────────────────────
+session_store = sessions_from_env()
+
+
+def open_session(data: dict):
+    """
+    → (session_id, history, restarted). The history comes from the server-side
+    session. A request without a session id starts one; an unknown or expired id
+    starts a fresh one seeded with the "history" the request carried, if any.
+    Requests that send a history but no session id (older clients) stay sessionless.
+    An unknown id without a history from a client that can resend one ("can_resend")
+    raises SessionLost, so the client resends rather than losing its context.
+    """
+    session_id = data.get("session_id")
+    history    = session_store.history(session_id) if session_store is not None and session_id else None
+    if history is not None:
+        return session_id, history, False
+    if session_id and session_store is not None and data.get("can_resend") and "history" not in data:
+        raise SessionLost(session_id)
+
+    history = data.get("history")
+    history = [t for t in history if isinstance(t, dict)] if isinstance(history, list) else []
+    if session_store is None or (history and not session_id):
+        return None, history, False
+    new_id = new_session_id()
+    seed   = [(t["role"], t["content"]) for t in history
+              if t.get("role") in ("user", "assistant") and isinstance(t.get("content"), str) and t["content"]]
+    if seed:
+        session_store.append(new_id, *seed)
+    return new_id, history, bool(session_id)
+
+
+def close_turn(session_id, user_message: str, response_text: str):
+    """Record a finished exchange in the session's ring buffer."""
+    if session_store is not None and session_id and response_text:
+        session_store.append(session_id, ("user", user_message), ("assistant", response_text))
+
+
+RESEND_HISTORY = {"session_restarted": True, "resend_history": True}   # answer to SessionLost
+
+
+def session_payload(session_id, restarted: bool) -> dict:
+    payload = {"session_id": session_id} if session_id else {}
+    if restarted:
+        payload["session_restarted"] = True
+    return payload
+
+
+def sse_event(event: str, data) -> str:
+    """Encode one Server-Sent Event frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# ── Metrics ─────────────────────────────────────────────────────────────────────
+FALLBACKS_HELP = ("Chat requests that fell back: low_confidence (no ML context for the LLM), "
+                  "llm_unavailable (knowledge-base answer), shed (overload: knowledge-base answer or 429/503) "
+                  "or error (apology text).")
+
+
+def observe_intent(ml_result: dict):
+    """Confidence distribution of chat classifications + low-confidence fallbacks."""
+    if not telemetry.enabled:
+        return
+    telemetry.histogram("medbot_intent_confidence_percent", "Top-intent confidence of chat messages.",
+                        PERCENT_BUCKETS).observe(ml_result["confidence"])
+    if gate_confidence(ml_result) < CONFIDENCE_THRESHOLD * 100:
+        telemetry.inc("medbot_fallbacks_total", FALLBACKS_HELP, reason="low_confidence")
+
+
+def runtime_series() -> list:
+    """Counters owned by other components, read at scrape time."""
+    series = [("medbot_request_errors_total", "counter", "Chat requests that failed.", {}, route_stats.errors)]
+    if response_cache is not None:
+        stats = response_cache.stats()
+        series += [("medbot_cache_events_total", "counter", "Response cache lookups and stores.", {"event": k}, stats[k])
+                   for k in ("hits", "similar_hits", "misses", "stores")]
+    if llm_guard is not None:
+        series += [("medbot_llm_guard_events_total", "counter", "Groq calls and what the resilience layer did with them.",
+                    {"event": k}, v) for k, v in llm_guard.counts.items()]
+        series.append(("medbot_llm_breaker_open", "gauge", "1 while the Groq circuit breaker refuses calls.", {},
+                       int(llm_guard.breaker.state == "open")))
+    if single_flight is not None:
+        series += [("medbot_singleflight_total", "counter", "Chat pipeline runs (leaders) and requests that shared one.",
+                    {"event": k}, v) for k, v in single_flight.counts.items()]
+    if cascade is not None:
+        stats = cascade.stats()
+        series += [("medbot_cascade_messages_total", "counter", "Stage 1 cascade messages answered by NB or escalated.",
+                    {"path": "first"}, stats["messages"] - stats["escalated"]),
+                   ("medbot_cascade_messages_total", "counter", "Stage 1 cascade messages answered by NB or escalated.",
+                    {"path": "escalated"}, stats["escalated"])]
+    if admission is not None:
+        stats = admission.stats()
+        series += [("medbot_admission_inflight", "gauge", "LLM calls holding an admission slot.", {}, stats["inflight"]),
+                   ("medbot_admission_queue_depth", "gauge", "Chat requests waiting for an LLM slot.", {},
+                    stats["queue_depth"])]
+        series += [("medbot_admission_total", "counter",
+                    "Admission decisions: admitted, queued, or shed as rate_limited, queue_full or timeout.",
+                    {"outcome": k}, stats[k]) for k in ("admitted", "queued", "rate_limited", "queue_full", "timeout")]
+    if session_store is not None:
+        series.append(("medbot_sessions", "gauge", "Live conversation sessions in this store.", {},
+                       session_store.info()["sessions"]))
+    return series
+
+
+for _route, _hist in route_stats.latency.items():
+    telemetry.attach("medbot_request_seconds", "End-to-end chat latency by route (kb, cache, llm).", _hist, route=_route)
+telemetry.attach("medbot_prompt_tokens", "Estimated input tokens per LLM request.", prompt_budget.tokens)
+if intent_batcher is not None:
+    telemetry.attach("medbot_batch_queue_wait_seconds", "Stage 1 micro-batcher queue wait.", intent_batcher.queue_wait)
+    telemetry.attach("medbot_batch_size", "Stage 1 micro-batch sizes.", intent_batcher.batch_size)
+if admission is not None:
+    telemetry.attach("medbot_admission_wait_seconds", "Queue wait of chat requests admitted to an LLM slot.",
+                     admission.wait)
+telemetry.collector(runtime_series)
+
+
+@app.before_request
+def begin_timing():
+    telemetry.begin_request()
+
+
+# ── Warm-up ─────────────────────────────────────────────────────────────────────
+def load_pipeline():
+    """
+    The slow half of start-up: the models (joblib + scikit-learn), the response
+    cache and pattern index built on their vectorizer, the prompt table and the
+    Groq SDK, client and guard. Called once, at import or on the warm-up thread.
+    """
+    global best_model, label_encoder, knowledge, knowledge_store, vectorize, classify, response_cache
+    global CLASSES, TOP_K, _COLUMN, _PATTERNS, pattern_index, cascade, client, LLM_RETRY_ON, llm_guard
+    import groq
+
+    # MEDBOT_KNOWLEDGE=sqlite: responses and patterns are read on demand from models/knowledge.db
+    # instead of loading knowledge.pkl (see knowledge_store.py); so are they when the copies are missing
+    compact = MODEL_FORMAT == "compact" and ENGINE == "tfidf"
+    if compact:
+        from compact_model import RESPONSE_FILES, load_compact
+        copies = [os.path.join(BASE, "models", "compact", name) for name in RESPONSE_FILES]
+    else:
+        copies = [os.path.join(BASE, "models", "knowledge.pkl")]
+    knowledge_store = KnowledgeStore.from_env(os.path.join(BASE, "models", "knowledge.db"), copies)
+
+    if compact:
+        best_model, label_encoder, knowledge = load_compact(os.path.join(BASE, "models", "compact"),
+                                                            responses=knowledge_store is None)
+        vectorize = best_model.transform
+        classify  = best_model.predict_proba_features
+        if os.environ.get("MEDBOT_CASCADE", "0") == "1":
+            print("⚠️  MEDBOT_CASCADE=1 needs MEDBOT_MODEL_FORMAT=pickle — compact holds only the best model")
+    else:
+        best_model    = load_model("hashed_model.pkl" if ENGINE == "hashed" else "best_model.pkl")
+        label_encoder = load_model("label_encoder.pkl")
+        knowledge     = None if knowledge_store else load_model("knowledge.pkl")
+        vectorize     = best_model[:-1].transform
+        classify      = best_model[-1].predict_proba   # on vectorize() rows, so the pattern index can share them
+        # MEDBOT_CASCADE=1: Naive Bayes answers, messages below its trained top-2 margin are
+        # re-scored by the escalation target (see cascade.py); tfidf candidates share the vectorizer
+        cascade = Cascade.from_env(model_meta, load_model) if ENGINE == "tfidf" else None
+    if knowledge_store is not None:
+        knowledge = {"intent_map": knowledge_store, "fallback": knowledge_store.fallback}
+
+    # Stage 2 answers keyed on normalized message + intent + history (see response_cache.py)
+    response_cache = ResponseCache.from_env(vectorize=vectorize)
+
+    CLASSES = label_encoder.classes_[best_model.classes_]
+    TOP_K   = min(3, len(CLASSES))
+
+    # Nearest training patterns per message (evidence) + neighbour votes for unsure
+    # classifications (see pattern_index.py)
+    _COLUMN       = {tag: i for i, tag in enumerate(CLASSES)}
+    if knowledge_store is not None:
+        catalogue = knowledge_store.iter_patterns()
+    else:
+        from knowledge_base import INTENTS
+        catalogue = ((i["tag"], p) for i in INTENTS for p in i["patterns"])
+    _PATTERNS     = [(p, tag) for tag, p in catalogue if tag in _COLUMN]
+    if fast_path is not None:
+        fast_path.learn_social(_PATTERNS)
+    pattern_index = PatternIndex.from_env(vectorize, [p for p, _ in _PATTERNS], [_COLUMN[t] for _, t in _PATTERNS],
+                                          refine_below=CONFIDENCE_THRESHOLD * 100)
+    prompt_table.warm(CLASSES.tolist(), kb_hints)
+
+    # Deadline, jittered retries, optional hedging and a circuit breaker around every Groq call
+    # (see resilience.py); LLMUnavailable → knowledge-base fallback answer
+    LLM_RETRY_ON = (groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError)
+    llm_guard    = LLMGuard.from_env(retry_on=LLM_RETRY_ON)
+    client       = groq.Groq(api_key=os.environ.get("GROQ_API_KEY"), max_retries=0)   # retries are llm_guard's job
+
+
+ready   = threading.Event()               # set once load_pipeline() has finished
+warmup  = {"seconds": None, "error": None}
+PIPELINE_ENDPOINTS = {"api_chat", "api_chat_stream", "api_classify_batch"}
+
+
+def warm_up():
+    started = time.perf_counter()
+    try:
+        load_pipeline()
+    except Exception as e:
+        warmup["error"] = f"{type(e).__name__}: {e}"
+        if not FAST_START:
+            raise
+        print(f"❌ Warm-up failed: {warmup['error']}")
+        return
+    warmup["seconds"] = round(time.perf_counter() - started, 3)
+    ready.set()
+    if FAST_START:
+        print(f"🔥 Warm-up finished in {warmup['seconds']:.2f}s — /api/chat is ready")
+
+
+# The warm-up thread must start in the process that serves: gunicorn.conf.py turns preload off
+# in fast-start mode, so each worker imports app.py and warms itself
+if FAST_START:
+    threading.Thread(target=warm_up, name="medbot-warmup", daemon=True).start()
+else:
+    warm_up()
+
+
+@app.before_request
+def require_pipeline():
+    """Routes that need the models answer 503 + Retry-After while the warm-up thread is still loading."""
+    if request.endpoint in PIPELINE_ENDPOINTS and not ready.is_set():
+        return jsonify({"response": "⚠️ MedBot is still starting up. Please try again in a moment.",
+                        "intent": "", "confidence": 0}), 503, {"Retry-After": "1"}
+
+
+@app.after_request
+def add_server_timing(response):
+    header = telemetry.server_timing_header()
+    if header:
+        response.headers["Server-Timing"] = header
+    return response
+
+
+# ── Pages & static assets ───────────────────────────────────────────────────────
+# The pages and /api/models only change when the models are retrained: rendered/encoded once
+# (pages once per SCRIPT_NAME prefix, on first use), with gzip + brotli variants, an ETag and
+# content-hashed static URLs (see static_assets.py)
+assets = AssetStore.from_env(os.path.join(BASE, "static"))
+app.jinja_env.globals["asset_url"] = assets.url if assets else (lambda path: url_for("static", filename=path))
+
+
+def page(name: str):
+    if assets is None:
+        return render_template(name, meta=model_meta)
+    return assets.page(name, lambda: render_template(name, meta=model_meta).encode()).response()
+
+
+def models_json():
+    return assets.pages.get("models.json") or assets.add("models.json", jsonify(model_meta).get_data(),
+                                                         "application/json")
+
+
+def prerender():
+    """Unprefixed pages and /api/models, so the first visitor does not pay for brotli (~0.15 s)."""
+    with app.test_request_context():
+        for name in ("index.html", "chat.html"):
+            assets.page(name, lambda: render_template(name, meta=model_meta).encode())
+        models_json()
+
+
+if assets is not None:
+    if FAST_START:   # off the import path, like the warm-up; a visitor who beats it renders the page itself
+        threading.Thread(target=prerender, name="medbot-prerender", daemon=True).start()
+    else:
+        prerender()
 
 
 # ── Routes ──────────────────────────────────────────────────────────────────────
 @app.route("/")
 def index():
-    return render_template("index.html", meta=model_meta)
+    return page("index.html")
 
 
 @app.route("/chat")
 def chat():
-    return render_template("chat.html", meta=model_meta)
+    return page("chat.html")
+
+
+@app.route("/assets/<path:name>")
+def hashed_asset(name):
+    """static/ files under their content-hashed names, cached as immutable."""
+    asset = assets.static.get(name) if assets is not None else None
+    if asset is None:
+        abort(404)
+    return asset.response()
+
+
+def intent_payload(ml_result: dict) -> dict:
+    """Stage 1 fields shared by /api/chat and the first /api/chat/stream event."""
+    payload = {
+        "intent":     ml_result["tag"].replace("_", " ").title(),
+        "confidence": ml_result["confidence"],
+        "ml_model":   ml_result["model_used"],
+        "top3":       ml_result["top3"],
+    }
+    if "evidence" in ml_result:
+        payload["evidence"] = ml_result["evidence"]
+        payload["refined"]  = ml_result["refined"]
+    return payload
 
 
 @app.route("/api/chat", methods=["POST"])
 def api_chat():
+    started     = time.perf_counter()
     data        = request.get_json() or {}
     user_message = data.get("message", "").strip()
-    history      = data.get("history", [])
 
     if not user_message:
         return jsonify({"response": "Please ask me a medical question — I'm here to help! 🩺",
                         "intent": "", "confidence": 0})
     try:
-        # ── Stage 1: ML Intent Detection ────────────────────
-        ml_result = detect_intent(user_message)
-
-        # ── Stage 2: LLM Natural Response ───────────────────
-        response_text = get_llm_response(user_message, history, ml_result)
-
-        return jsonify({
-            "response":   response_text,
-            "intent":     ml_result["tag"].replace("_", " ").title(),
-            "confidence": ml_result["confidence"],
-            "ml_model":   ml_result["model_used"],
-            "top3":       ml_result["top3"],
-        })
-
+        with telemetry.stage("session"):
+            session_id, history, restarted = open_session(data)
+        client = client_id()
+        early_shed(client, user_message, history)
+
+        # ── Stage 1 (ML intent) + Stage 2 (KB fast path / cache / LLM) ──
+        ml_result, response_text, route = answer(user_message, history, client)
+        with telemetry.stage("session"):
+            close_turn(session_id, user_message, response_text)
+
+        with telemetry.stage("serialize"):
+            response = jsonify({"response": response_text, "route": route,
+                                **session_payload(session_id, restarted), **intent_payload(ml_result)})
+        route_stats.record(route, time.perf_counter() - started)
+        return response
+
+    except SessionLost:
+        return jsonify(RESEND_HISTORY), 409
+    except Shed as e:
+        return busy_response(e)
     except Exception as e:
+        route_stats.error()
+        telemetry.inc("medbot_fallbacks_total", FALLBACKS_HELP, reason="error")
         return jsonify({"response": f"⚠️ Something went wrong: {str(e)}. Please try again.",
                         "intent": "", "confidence": 0})
 
 
+@app.route("/api/chat/stream", methods=["POST"])
+def api_chat_stream():
+    """
+    Same contract as /api/chat, delivered as Server-Sent Events:
+      event: meta  → route / session_id / intent / confidence / ml_model / top3 (as soon as Stage 1 finishes)
+      event: token → {"text": "..."} for every LLM fragment
+      event: done  → {} once the completion ends
+      event: error → {"response": "..."} if anything fails mid-stream
+    """
+    started      = time.perf_counter()
+    data         = request.get_json() or {}
+    user_message = data.get("message", "").strip()
+    client       = client_id()
+
+    def generate():
+        if not user_message:
+            yield sse_event("token", {"text": "Please ask me a medical question — I'm here to help! 🩺"})
+            yield sse_event("done", {})
+            return
+        try:
+            with telemetry.stage("session"):
+                try:
+                    session_id, history, restarted = open_session(data)
+                except SessionLost:
+                    yield sse_event("meta", RESEND_HISTORY)
+                    yield sse_event("done", {})
+                    return
+            try:
+                early_shed(client, user_message, history)
+            except Shed as e:
+                yield sse_event("error", {"response": busy_text(e), "retry_after": e.retry_after})
+                return
+            ml_result = detect_intent(user_message)
+            response_text, route = local_answer(user_message, history, ml_result)
+            yield sse_event("meta", {"route": route, **session_payload(session_id, restarted),
+                                     **intent_payload(ml_result)})
+
+            if response_text is not None:
+                yield sse_event("token", {"text": response_text})
+            else:
+                parts = []
+                try:
+                    for text in llm_stream(client, user_message, history, ml_result):
+                        parts.append(text)
+                        yield sse_event("token", {"text": text})
+                    response_text = "".join(parts)
+                except LLMUnavailable as e:
+                    if parts:
+                        raise
+                    response_text, route = fallback_answer(ml_result, e), "fallback"
+                    yield sse_event("meta", {"route": route})
+                    yield sse_event("token", {"text": response_text})
+                except Shed as e:
+                    response_text, route = shed_answer(ml_result, e), "shed"
+                    if response_text is None:
+                        yield sse_event("error", {"response": busy_text(e),
+                                                  "retry_after": e.retry_after})
+                        return
+                    yield sse_event("meta", {"route": route})
+                    yield sse_event("token", {"text": response_text})
+            close_turn(session_id, user_message, response_text)
+            route_stats.record(route, time.perf_counter() - started)
+            yield sse_event("done", {})
+
+        except Exception as e:
+            route_stats.error()
+            telemetry.inc("medbot_fallbacks_total", FALLBACKS_HELP, reason="error")
+            yield sse_event("error", {"response": f"⚠️ Something went wrong: {str(e)}. Please try again."})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype = "text/event-stream",
+        headers  = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/classify/batch", methods=["POST"])
+def api_classify_batch():
+    """Stage 1 only, for offline replay/analytics: {"messages": [...]} → {"results": [...]}."""
+    data     = request.get_json(silent=True) or {}
+    messages = data.get("messages")
+
+    if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+        return jsonify({"error": "'messages' must be a list of strings"}), 400
+    if len(messages) > BATCH_MAX:
+        return jsonify({"error": f"at most {BATCH_MAX} messages per call"}), 413
+    if not messages:
+        return jsonify({"results": []})
+
+    return jsonify({"results": [{"tag": r["tag"], **intent_payload(r)} for r in detect_intents(messages)]})
+
+
 @app.route("/api/models")
 def api_models():
     """Return ML model accuracy report."""
+    if assets is not None:
+        return models_json().response()
     return jsonify(model_meta)
 
 
+@app.route("/api/ready")
+def api_ready():
+    """Readiness probe: 200 once /api/chat can be served, 503 while warming up (or if warm-up failed)."""
+    return jsonify({"ready": ready.is_set(), "fast_start": FAST_START,
+                    "warmup_seconds": warmup["seconds"], "error": warmup["error"]}), (200 if ready.is_set() else 503)
+
+
+@app.route("/api/stats")
+def api_stats():
+    """Runtime counters for this worker (routes, response cache, Stage 1 micro-batcher, prompt sizes, sessions, admission)."""
+    return jsonify({
+        "routes":       {**route_stats.snapshot(), "fast_path": fast_path.info() if fast_path else None},
+        "cache":        response_cache.stats() if response_cache else None,
+        "sessions":     session_store.info() if session_store else None,
+        "batcher":      intent_batcher.stats() if intent_batcher else None,
+        "prompt":       {**prompt_budget.stats(), "table": prompt_table.stats()},
+        "llm":          llm_guard.stats() if llm_guard else None,
+        "singleflight": single_flight.stats() if single_flight else None,
+        "index":        pattern_index.stats() if pattern_index else None,
+        "cascade":      cascade.stats() if cascade else None,
+        "assets":       assets.stats() if assets else None,
+        "knowledge":    knowledge_store.stats() if knowledge_store else None,
+        "admission":    admission.stats() if admission else None,
+    })
+
+
+@app.route("/api/metrics")
+def api_metrics():
+    """Prometheus exposition of this worker's metrics."""
+    return Response(telemetry.render(), mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     print(f"✅ MedBot Hybrid ML+LLM starting on port {port}")
-    print(f"   ML Model: {model_meta['best_model']} | Accuracy: {max(model_meta['accuracy'].values()):.1%}")
+    print(f"   ML Model: {MODEL_NAME} | Accuracy: {max(model_meta['accuracy'].values()):.1%}")
     print(f"   LLM: Groq Llama 3.3 70B")
     app.run(debug=False, host="0.0.0.0", port=port)
@@ -0,0 +1,361 @@
+"""
+MedBot — Async Serving Mode (ASGI)
+==================================
+The Flask app in app.py runs on sync gunicorn workers, so each worker sits idle
+while its Groq call is in flight. This module serves the two chat routes
+natively on an asyncio event loop instead, so one process can keep many
+conversations in flight at once:
+
+  POST /api/chat         → same contract as app.py, awaited on a pooled AsyncGroq client
+  POST /api/chat/stream  → same SSE contract as app.py
+  everything else        → delegated to the Flask app (landing page, /api/models, ...)
+
+The LLM backend is reached through one keep-alive httpx connection pool. When
+every pooled connection is busy for longer than MEDBOT_POOL_WAIT seconds the
+request is shed with 503 + Retry-After instead of queueing invisibly. Calls go
+through app.llm_guard (deadline, retries, hedging, circuit breaker — see
+resilience.py) and fall back to the knowledge-base answer when it gives up.
+app.py's per-client admission control (admission.py: fair queueing, token
+buckets, 429s) is not applied here; the pool is the only limit. Identical
+in-flight chats share one LLM call, as in app.py (singleflight.py: arun, and
+astream, which fans the stream's fragments out to every waiting request).
+
+Run:  uvicorn asgi:app --host 0.0.0.0 --port $PORT
+  or  gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+
+Config (environment):
+  MEDBOT_LLM_MAX_CONNECTIONS  max concurrent LLM calls / pooled connections (default 64)
+  MEDBOT_LLM_TIMEOUT          client timeout and deadline for a whole streamed answer in seconds (default 30)
+  MEDBOT_POOL_WAIT            how long a request may wait for a free connection (default 0.25)
+  MEDBOT_RETRY_AFTER          Retry-After seconds sent with a 503 (default 1)
+"""
+
+import os, json, time, asyncio
+import httpx
+from asgiref.wsgi import WsgiToAsgi
+from groq import AsyncGroq
+
+import app as medbot
+from resilience import LLMUnavailable
+from sessions import SessionLost
+from singleflight import flight_key
+
+LLM_MAX_CONNECTIONS = int(os.environ.get("MEDBOT_LLM_MAX_CONNECTIONS", 64))
+LLM_TIMEOUT         = float(os.environ.get("MEDBOT_LLM_TIMEOUT", 30))
+POOL_WAIT           = float(os.environ.get("MEDBOT_POOL_WAIT", 0.25))
+RETRY_AFTER         = int(os.environ.get("MEDBOT_RETRY_AFTER", 1))
+
+aclient = AsyncGroq(
+    api_key     = os.environ.get("GROQ_API_KEY"),
+    timeout     = LLM_TIMEOUT,
+    max_retries = 0,   # retries are app.llm_guard's job
+    http_client = httpx.AsyncClient(
+        limits  = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                               max_keepalive_connections=LLM_MAX_CONNECTIONS),
+        timeout = httpx.Timeout(LLM_TIMEOUT, connect=5.0),
+    ),
+)
+wsgi_app = WsgiToAsgi(medbot.app)
+
+
+class PoolSaturated(Exception):
+    """Raised when no LLM connection frees up within POOL_WAIT."""
+
+
+class LLMPool:
+    """Admission gate sized to the httpx pool, so waiting happens here (bounded) not inside httpx."""
+
+    def __init__(self, size: int, wait: float):
+        self.size      = size
+        self.wait      = wait
+        self.in_flight = 0
+        self._sem      = None   # created lazily: it must belong to the running event loop
+
+    async def __aenter__(self):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.size)
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.wait)
+        except asyncio.TimeoutError:
+            raise PoolSaturated()
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.in_flight -= 1
+        self._sem.release()
+
+
+pool = LLMPool(LLM_MAX_CONNECTIONS, POOL_WAIT)
+
+
+# ── Async LLM Calls ─────────────────────────────────────────────────────────────
+async def get_llm_response_async(user_message: str, history: list, ml_result: dict) -> str:
+    """Async twin of app.get_llm_response."""
+    messages = medbot.build_messages(user_message, history, ml_result)
+    with medbot.telemetry.stage("llm"):
+        completion = await medbot.llm_guard.acall(lambda timeout: aclient.chat.completions.create(
+            model       = medbot.LLM_MODEL,
+            messages    = messages,
+            temperature = 0.7,
+            max_tokens  = 1024,
+            top_p       = 0.9,
+            timeout     = timeout,
+        ))
+    return completion.choices[0].message.content
+
+
+async def stream_llm_response_async(user_message: str, history: list, ml_result: dict):
+    """Async twin of app.stream_llm_response; the whole stream shares one LLM_TIMEOUT deadline."""
+    messages = medbot.build_messages(user_message, history, ml_result)
+    loop     = asyncio.get_running_loop()
+    deadline = loop.time() + LLM_TIMEOUT
+    started, first, failed = time.perf_counter(), True, True
+    try:
+        stream = await medbot.llm_guard.acall(lambda timeout: aclient.chat.completions.create(
+            model       = medbot.LLM_MODEL,
+            messages    = messages,
+            temperature = 0.7,
+            max_tokens  = 1024,
+            top_p       = 0.9,
+            stream      = True,
+            timeout     = timeout,
+        ), hedge=False)
+        chunks = stream.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), max(deadline - loop.time(), 0))
+            except StopAsyncIteration:
+                failed = False
+                return
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first:
+                    medbot.telemetry.observe_stage("llm_first_token", time.perf_counter() - started)
+                    first = False
+                yield chunk.choices[0].delta.content
+    finally:
+        medbot.telemetry.observe_stage("llm", time.perf_counter() - started, failed=failed)
+
+
+async def llm_answer(user_message: str, history: list, ml_result: dict) -> str:
+    """Stage 2 on a pooled connection (then cached), shared by identical in-flight chats (see singleflight.py)."""
+    async def pipeline():
+        async with pool:
+            text = await get_llm_response_async(user_message, history, ml_result)
+        await off_loop(medbot.cache_store, user_message, history, ml_result, text)
+        return text
+
+    if medbot.single_flight is None:
+        return await pipeline()
+    text, _ = await medbot.single_flight.arun(flight_key(user_message, history), pipeline)
+    return text
+
+
+def llm_stream(user_message: str, history: list, ml_result: dict):
+    """
+    Stage 2 fragments, fanned out to identical in-flight streams. The first
+    item is None, once a pooled connection is taken: PoolSaturated comes
+    before it, so nothing has been sent when the 503 goes out.
+    """
+    async def pipeline():
+        parts = []
+        async with pool:
+            yield None
+            async for text in stream_llm_response_async(user_message, history, ml_result):
+                parts.append(text)
+                yield text
+        await off_loop(medbot.cache_store, user_message, history, ml_result, "".join(parts))
+
+    if medbot.single_flight is None:
+        return pipeline()
+    return medbot.single_flight.astream(flight_key(user_message, history), pipeline)
+
+
+async def detect_intent_async(user_message: str) -> dict:
+    """Stage 1 off the event loop: on the micro-batcher's thread, or on the default executor without it."""
+    if medbot.intent_batcher is not None:
+        return await asyncio.wrap_future(medbot.intent_batcher.enqueue(user_message))
+    return await asyncio.get_running_loop().run_in_executor(None, medbot.detect_intent, user_message)
+
+
+async def off_loop(fn, *args):
+    """
+    fn(*args) on the default executor, in a copy of this task's context (so its
+    telemetry stages still land in the request's Server-Timing). Sessions, the
+    response cache and the knowledge store may be SQLite (BEGIN IMMEDIATE, 5 s
+    busy timeout under write contention): none of them runs on the event loop.
+    """
+    return await asyncio.to_thread(fn, *args)
+
+
+# ── ASGI plumbing ───────────────────────────────────────────────────────────────
+async def read_json(receive) -> dict:
+    body, more = b"", True
+    while more:
+        message = await receive()
+        body   += message.get("body", b"")
+        more    = message.get("more_body", False)
+    try:
+        return json.loads(body or b"{}") or {}
+    except ValueError:
+        return {}
+
+
+async def send_json(send, payload: dict, status: int = 200, headers: list = ()):
+    body   = json.dumps(payload, ensure_ascii=False).encode()
+    timing = medbot.telemetry.server_timing_header()
+    if timing:
+        headers = [*headers, (b"server-timing", timing.encode())]
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode()), *headers]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_saturated(send):
+    await send_json(send, {"response": "⚠️ MedBot is busy right now. Please try again in a moment.",
+                           "intent": "", "confidence": 0},
+                    status=503, headers=[(b"retry-after", str(RETRY_AFTER).encode())])
+
+
+async def send_warming_up(send):
+    await send_json(send, {"response": "⚠️ MedBot is still starting up. Please try again in a moment.",
+                           "intent": "", "confidence": 0},
+                    status=503, headers=[(b"retry-after", str(RETRY_AFTER).encode())])
+
+
+# ── Routes ──────────────────────────────────────────────────────────────────────
+async def api_chat(receive, send):
+    medbot.telemetry.begin_request()
+    started      = time.perf_counter()
+    data         = await read_json(receive)
+    user_message = data.get("message", "").strip()
+
+    if not user_message:
+        return await send_json(send, {"response": "Please ask me a medical question — I'm here to help! 🩺",
+                                      "intent": "", "confidence": 0})
+    try:
+        with medbot.telemetry.stage("session"):
+            session_id, history, restarted = await off_loop(medbot.open_session, data)
+        ml_result     = await detect_intent_async(user_message)
+        response_text, route = await off_loop(medbot.local_answer, user_message, history, ml_result)
+        if response_text is None:
+            try:
+                response_text = await llm_answer(user_message, history, ml_result)
+            except LLMUnavailable as e:
+                response_text, route = medbot.fallback_answer(ml_result, e), "fallback"
+        await off_loop(medbot.close_turn, session_id, user_message, response_text)
+        medbot.route_stats.record(route, time.perf_counter() - started)
+        await send_json(send, {"response": response_text, "route": route,
+                               **medbot.session_payload(session_id, restarted), **medbot.intent_payload(ml_result)})
+
+    except PoolSaturated:
+        await send_saturated(send)
+    except SessionLost:
+        await send_json(send, medbot.RESEND_HISTORY, status=409)
+    except Exception as e:
+        medbot.route_stats.error()
+        medbot.telemetry.inc("medbot_fallbacks_total", medbot.FALLBACKS_HELP, reason="error")
+        await send_json(send, {"response": f"⚠️ Something went wrong: {str(e) or type(e).__name__}. Please try again.",
+                               "intent": "", "confidence": 0})
+
+
+async def api_chat_stream(receive, send):
+    medbot.telemetry.begin_request()
+    started      = time.perf_counter()
+    data         = await read_json(receive)
+    user_message = data.get("message", "").strip()
+
+    async def start():
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8"),
+                                (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]})
+
+    async def emit(event, payload, more=True):
+        await send({"type": "http.response.body", "more_body": more,
+                    "body": medbot.sse_event(event, payload).encode()})
+
+    if not user_message:
+        await start()
+        await emit("token", {"text": "Please ask me a medical question — I'm here to help! 🩺"})
+        return await emit("done", {}, more=False)
+
+    try:
+        with medbot.telemetry.stage("session"):
+            session_id, history, restarted = await off_loop(medbot.open_session, data)
+        ml_result     = await detect_intent_async(user_message)
+        local, route  = await off_loop(medbot.local_answer, user_message, history, ml_result)
+        meta          = {"route": route, **medbot.session_payload(session_id, restarted),
+                         **medbot.intent_payload(ml_result)}
+    except SessionLost:
+        await start()
+        await emit("meta", medbot.RESEND_HISTORY)
+        return await emit("done", {}, more=False)
+    except Exception as e:   # nothing sent yet: answer with an error event, like app.api_chat_stream
+        medbot.route_stats.error()
+        medbot.telemetry.inc("medbot_fallbacks_total", medbot.FALLBACKS_HELP, reason="error")
+        await start()
+        return await emit("error", {"response": f"⚠️ Something went wrong: {str(e) or type(e).__name__}. "
+                                                "Please try again."}, more=False)
+    if local is not None:   # KB fast path or cache hit: no LLM, no pool slot
+        await off_loop(medbot.close_turn, session_id, user_message, local)
+        medbot.route_stats.record(route, time.perf_counter() - started)
+        await start()
+        await emit("meta", meta)
+        await emit("token", {"text": local})
+        return await emit("done", {}, more=False)
+    parts, opened = [], False
+    try:
+        try:
+            async for text in llm_stream(user_message, history, ml_result):
+                if text is None:   # a pooled connection is ours (or the leader's): the response starts
+                    opened = True
+                    await start()
+                    await emit("meta", meta)
+                    continue
+                parts.append(text)
+                await emit("token", {"text": text})
+        except LLMUnavailable as e:
+            if parts:
+                raise
+            route = "fallback"
+            parts = [medbot.fallback_answer(ml_result, e)]
+            await emit("meta", {"route": route})
+            await emit("token", {"text": parts[0]})
+        await off_loop(medbot.close_turn, session_id, user_message, "".join(parts))
+        medbot.route_stats.record(route, time.perf_counter() - started)
+        await emit("done", {}, more=False)
+    except PoolSaturated:
+        await send_saturated(send)
+    except Exception as e:
+        medbot.route_stats.error()
+        medbot.telemetry.inc("medbot_fallbacks_total", medbot.FALLBACKS_HELP, reason="error")
+        if not opened:
+            await start()
+        await emit("error", {"response": f"⚠️ Something went wrong: {str(e) or type(e).__name__}. Please try again."},
+                   more=False)
+
+
+ROUTES = {
+    ("POST", "/api/chat"):        api_chat,
+    ("POST", "/api/chat/stream"): api_chat_stream,
+}
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await aclient.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    route = ROUTES.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+    if route is None:
+        return await wsgi_app(scope, receive, send)
+    if not medbot.ready.is_set():   # MEDBOT_FAST_START: models still loading on the warm-up thread
+        return await send_warming_up(send)
+    await route(receive, send)
@@ -0,0 +1,181 @@
+"""
+Admission control — well-behaved clients' latency while one client floods /api/chat
+===================================================================================
+Starts the local stub LLM with a provider-style concurrency limit (--capacity
+completions at once, the rest wait) and one threaded gunicorn worker
+(--threads) per mode. Every request goes to the LLM: the response cache and
+single-flight are off and only intents outside the KB fast path are asked.
+
+  nice    → --nice clients, each sending a short question every --interval
+            seconds with an empty history
+  greedy  → one client keeping --greedy requests in flight, each carrying
+            --turns long history turns; after a 429/503 it waits only
+            --backoff seconds (it ignores Retry-After)
+
+  baseline  nice clients alone                      (MEDBOT_ADMISSION=off)
+  off       nice + greedy, no admission control      (MEDBOT_ADMISSION=off)
+  on        nice + greedy, admission control         (MEDBOT_ADMISSION=on, MEDBOT_ADMISSION_INFLIGHT=--capacity)
+
+For each run: the nice clients' p50/p99/max latency and how they were answered
+(llm / shed = knowledge-base answer / 429 / 503 / other), the greedy client's
+answered-by-LLM rate and status counts, and the worker's admission counters.
+
+    python benchmarks/bench_admission.py --duration 20 --capacity 4 --greedy 16
+"""
+import argparse, asyncio, json, os, random, subprocess, sys, time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+import httpx
+from knowledge_base import INTENTS
+from load_test import percentile, wait_ready
+from routing import DEFAULT_ALLOW
+
+FAST_PATH_TAGS = {rule.split(":")[0] for rule in DEFAULT_ALLOW.split(",")}
+
+
+def questions() -> list:
+    return [p for i in INTENTS if i["tag"] not in FAST_PATH_TAGS and i["tag"] != "fallback" for p in i["patterns"]]
+
+
+def long_history(turns: int, words: int, rng: random.Random) -> list:
+    vocab = [w for i in INTENTS for r in i["responses"] for w in r.split()]
+    return [{"role": ("user", "assistant")[n % 2], "content": " ".join(rng.choice(vocab) for _ in range(words))}
+            for n in range(turns)]
+
+
+async def chat(http, url, client, message, history):
+    t0 = time.perf_counter()
+    try:
+        r = await http.post(url, json={"message": message, "history": history}, headers={"X-Client-Id": client})
+        outcome = r.json().get("route") or "other" if r.status_code == 200 else str(r.status_code)
+    except (httpx.HTTPError, ValueError):
+        outcome = "error"
+    return outcome, time.perf_counter() - t0
+
+
+async def drive(url, args, greedy: bool):
+    """→ (nice samples, greedy samples, elapsed): lists of (outcome, seconds)."""
+    rng, asks = random.Random(args.seed), questions()
+    history   = long_history(args.turns, args.turn_words, rng)
+    nice, flood = [], []
+    limits    = httpx.Limits(max_connections=args.nice + args.greedy + 4)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as http:
+        stop = time.perf_counter() + args.duration
+
+        async def nice_client(n):
+            next_at = time.perf_counter() + rng.uniform(0, args.interval)
+            while next_at < stop:
+                await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+                nice.append(await chat(http, url, f"nice-{n}", rng.choice(asks), []))
+                next_at += args.interval
+
+        async def greedy_loop():
+            while time.perf_counter() < stop:
+                sample = await chat(http, url, "greedy", rng.choice(asks), history)
+                flood.append(sample)
+                if sample[0] not in ("llm", "fallback", "other"):
+                    await asyncio.sleep(args.backoff)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(nice_client(n) for n in range(args.nice)),
+                             *(greedy_loop() for _ in range(args.greedy if greedy else 0)))
+    return nice, flood, time.perf_counter() - t0
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    lat = [s for _, s in samples]
+    llm = [s for o, s in samples if o == "llm"]
+    return {"requests": len(samples), "outcomes": dict(Counter(o for o, _ in samples)),
+            "llm_per_s": round(len(llm) / elapsed, 2),
+            "p50_ms": round(percentile(lat, 50) * 1000) if lat else None,
+            "p99_ms": round(percentile(lat, 99) * 1000) if lat else None,
+            "max_ms": round(max(lat) * 1000) if lat else None}
+
+
+def run(name, admission, greedy, args, env):
+    env  = {**env, "MEDBOT_ADMISSION": admission}
+    proc = subprocess.Popen(["gunicorn", "app:app", "-w", "1", "--threads", str(args.threads),
+                             "-b", f"127.0.0.1:{args.port}", "--timeout", "120"],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(f"http://127.0.0.1:{args.port}/api/ready", timeout=120)
+        nice, flood, elapsed = asyncio.run(drive(f"http://127.0.0.1:{args.port}/api/chat", args, greedy))
+        stats = httpx.get(f"http://127.0.0.1:{args.port}/api/stats").json()["admission"]
+    finally:
+        proc.terminate()
+        proc.wait()
+    row = {"run": name, "nice": summarize(nice, elapsed), "greedy": summarize(flood, elapsed) if greedy else None,
+           "admission": stats}
+    n = row["nice"]
+    print(f"{name:>9} │ nice p50 {n['p50_ms']:>6} ms  p99 {n['p99_ms']:>6} ms  max {n['max_ms']:>6} ms  "
+          f"{fmt(n['outcomes'])}")
+    if greedy:
+        g = row["greedy"]
+        print(f"{'':>9} │ greedy   {g['requests']:>5} requests, {g['llm_per_s']:>5}/s answered by the LLM  "
+              f"{fmt(g['outcomes'])}")
+    if stats:
+        print(f"{'':>9} │ worker   admitted {stats['admitted']}  queued {stats['queued']}  "
+              f"shed: rate_limited {stats['rate_limited']}  queue_full {stats['queue_full']}  "
+              f"timeout {stats['timeout']}  wait p99 {stats['wait']['p99']} s")
+    return row
+
+
+def fmt(outcomes: dict) -> str:
+    return " ".join(f"{k}={v}" for k, v in sorted(outcomes.items()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--duration",   type=float, default=20)
+    ap.add_argument("--nice",       type=int,   default=4, help="well-behaved clients")
+    ap.add_argument("--interval",   type=float, default=2.0, help="seconds between a nice client's requests")
+    ap.add_argument("--greedy",     type=int,   default=16, help="requests the greedy client keeps in flight")
+    ap.add_argument("--turns",      type=int,   default=10, help="history turns the greedy client sends")
+    ap.add_argument("--turn-words", type=int,   default=200)
+    ap.add_argument("--backoff",    type=float, default=0.05, help="greedy client's pause after a 429/503")
+    ap.add_argument("--capacity",   type=int,   default=4, help="stub completions at once (and the in-flight limit)")
+    ap.add_argument("--threads",    type=int,   default=32, help="gunicorn threads")
+    ap.add_argument("--queue",      type=int,   default=16, help="MEDBOT_ADMISSION_QUEUE")
+    ap.add_argument("--wait",       type=float, default=3, help="MEDBOT_ADMISSION_WAIT")
+    ap.add_argument("--latency",    type=float, default=0.5, help="stub time-to-first-token (s)")
+    ap.add_argument("--tokens",     type=int,   default=60)
+    ap.add_argument("--token-rate", type=float, default=400)
+    ap.add_argument("--timeout",    type=float, default=60)
+    ap.add_argument("--port",       type=int,   default=8130)
+    ap.add_argument("--stub-port",  type=int,   default=8930)
+    ap.add_argument("--seed",       type=int,   default=7)
+    ap.add_argument("--json",       help="write the report to this file")
+    args = ap.parse_args()
+
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "stub_llm.py"),
+                             "--port", str(args.stub_port), "--latency", str(args.latency), "--tokens", str(args.tokens),
+                             "--token-rate", str(args.token_rate), "--capacity", str(args.capacity)],
+                            stdout=subprocess.DEVNULL)
+    env = {**os.environ, "GROQ_BASE_URL": f"http://127.0.0.1:{args.stub_port}", "GROQ_API_KEY": "stub",
+           "MEDBOT_CACHE": "off", "MEDBOT_SINGLEFLIGHT": "off", "MEDBOT_PROMPT_LOG": "0",
+           "MEDBOT_CLIENT_HEADER": "X-Client-Id", "MEDBOT_PROXY_HOPS": "1", "MEDBOT_ADMISSION_INFLIGHT": str(args.capacity),
+           "MEDBOT_ADMISSION_QUEUE": str(args.queue), "MEDBOT_ADMISSION_WAIT": str(args.wait)}
+    service = args.latency + args.tokens / args.token_rate
+    print(f"🚦 stub: {args.capacity} completions at once, {service:.2f}s each (≈{args.capacity / service:.1f}/s) | "
+          f"{args.nice} nice clients × 1 per {args.interval}s | greedy: {args.greedy} in flight, "
+          f"{args.turns} turns of history\n")
+    try:
+        wait_ready(f"http://127.0.0.1:{args.stub_port}/health")
+        report = {"config": vars(args), "runs": [run("baseline", "off", False, args, env),
+                                                 run("off", "off", True, args, env),
+                                                 run("on", "on", True, args, env)]}
+    finally:
+        stub.terminate()
+
+    base, off, on = (r["nice"] for r in report["runs"])
+    print(f"\n🏁 nice clients' p99: {base['p99_ms']} ms alone → {off['p99_ms']} ms under the flood without admission "
+          f"control → {on['p99_ms']} ms with it")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
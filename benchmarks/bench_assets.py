@@ -0,0 +1,139 @@
+"""
+Pages & static assets — per-request rendering vs render-once, precompressed, ETag'd delivery
+===========================================================================================
+Boots one gunicorn sync worker per mode:
+
+  off → MEDBOT_ASSETS=off: Jinja renders "/" and "/chat" on every hit, /api/models
+        is jsonify'd every call, the stylesheet comes from Flask's /static/
+  on  → MEDBOT_ASSETS=on (default): bodies built once with gzip/brotli variants,
+        ETags, and the stylesheet at its content-hashed /assets/ URL
+
+and measures for "/", "/chat", /api/models and the stylesheet the page links:
+  bytes     → body bytes on the wire for a browser-like client (Accept-Encoding: gzip, deflate, br)
+  headers   → response header bytes
+  rps       → requests per second on the single worker (--concurrency client threads, --duration s,
+              bodies read raw, not decompressed); client and server share the CPUs
+  rps_304   → same, revalidating with If-None-Match (repeat visits), when the route sends an ETag
+  worker_us → time per request calling the WSGI app in-process (no sockets): the worker's own cost,
+              1e6 / worker_us is its ceiling in requests per second
+
+    python benchmarks/bench_assets.py --duration 3 --concurrency 8
+"""
+import argparse, json, os, re, subprocess, sys, threading, time
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+from load_test import wait_ready
+
+BROWSER = {"Accept-Encoding": "gzip, deflate, br"}
+# Per-request Flask time for each route, in a fresh interpreter (MEDBOT_ASSETS comes from the env)
+IN_PROCESS = """
+import json, sys, time
+from werkzeug.test import EnvironBuilder
+import app
+n, out = int(sys.argv[1]), {}
+def call(environ):
+    for _ in app.app(dict(environ), lambda status, headers, exc_info=None: None):
+        pass
+for path in sys.argv[2:]:
+    environ = EnvironBuilder(path, headers={"Accept-Encoding": "gzip, deflate, br"}).get_environ()
+    for _ in range(50):
+        call(environ)
+    started = time.perf_counter()
+    for _ in range(n):
+        call(environ)
+    out[path] = (time.perf_counter() - started) / n * 1e6
+print(json.dumps(out))
+"""
+
+
+def rps(url: str, headers: dict, concurrency: int, duration: float) -> float:
+    done, stop = [0] * concurrency, time.perf_counter() + duration
+
+    def worker(i):
+        with httpx.Client(headers=headers, timeout=10) as client:
+            while time.perf_counter() < stop:
+                with client.stream("GET", url) as r:
+                    for _ in r.iter_raw():
+                        pass
+                done[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return round(sum(done) / (time.perf_counter() - started), 1)
+
+
+def worker_us(env: dict, paths: list, n: int) -> dict:
+    run = subprocess.run([sys.executable, "-c", IN_PROCESS, str(n), *paths], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(run.stdout.strip().splitlines()[-1])
+
+
+def measure(base: str, env: dict, args) -> dict:
+    page = httpx.get(base + "/").text
+    css  = re.search(r'<link rel="stylesheet" href="([^"]+)"', page).group(1)
+    out  = {}
+    for name, path in (("/", "/"), ("/chat", "/chat"), ("/api/models", "/api/models"), ("stylesheet", css)):
+        r    = httpx.get(base + path, headers=BROWSER)
+        etag = r.headers.get("etag")
+        out[name] = {
+            "path":     path,
+            "encoding": r.headers.get("content-encoding", "identity"),
+            "bytes":    r.num_bytes_downloaded,
+            "headers":  sum(len(k) + len(v) + 4 for k, v in r.headers.raw),
+            "cache":    r.headers.get("cache-control"),
+            "rps":      rps(base + path, BROWSER, args.concurrency, args.duration),
+            "rps_304":  rps(base + path, {**BROWSER, "If-None-Match": etag}, args.concurrency, args.duration)
+                        if etag else None,
+        }
+    timed = worker_us(env, [r["path"] for r in out.values()], args.requests)
+    for r in out.values():
+        r["worker_us"] = round(timed[r["path"]], 1)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--duration",    type=float, default=3.0)
+    ap.add_argument("--concurrency", type=int,   default=8)
+    ap.add_argument("--requests",    type=int,   default=2000, help="in-process requests per route")
+    ap.add_argument("--port",        type=int,   default=8420)
+    ap.add_argument("--json",        help="write the report to this file")
+    args = ap.parse_args()
+
+    base   = f"http://127.0.0.1:{args.port}"
+    report = {"config": vars(args), "modes": {}}
+    for mode in ("off", "on"):
+        env  = {**os.environ, "MEDBOT_ASSETS": mode, "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "bench"),
+                "MEDBOT_PROMPT_LOG": "0"}
+        proc = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "app:app", "-w", "1", "-b", f"127.0.0.1:{args.port}"],
+                                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(base + "/api/models")
+            rows = report["modes"][mode] = measure(base, env, args)
+        finally:
+            proc.terminate()
+            proc.wait()
+        print(f"\n📦 MEDBOT_ASSETS={mode} (1 worker, {args.concurrency} clients)")
+        print(f"   {'route':<12} {'encoding':>8} {'body B':>7} {'hdr B':>6} {'req/s':>8} {'304 req/s':>10} "
+              f"{'worker µs':>10}  cache-control")
+        for name, r in rows.items():
+            print(f"   {name:<12} {r['encoding']:>8} {r['bytes']:7} {r['headers']:6} {r['rps']:8.0f} "
+                  f"{'—' if r['rps_304'] is None else format(r['rps_304'], '.0f'):>10} {r['worker_us']:10.0f}  "
+                  f"{r['cache'] or '—'}")
+
+    off, on = report["modes"]["off"], report["modes"]["on"]
+    print("\n⚡ on vs off: " + " | ".join(f"{name} {off[name]['bytes'] / on[name]['bytes']:.1f}× fewer bytes, "
+                                        f"{off[name]['worker_us'] / on[name]['worker_us']:.1f}× less worker time" for name in off))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
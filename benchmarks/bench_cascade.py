@@ -0,0 +1,96 @@
+"""
+Stage 1 cascade — Naive Bayes first, escalation below the trained margin, vs the single best model
+================================================================================================
+Typo'd INTENTS messages are classified one at a time (vectorize + classifier,
+the per-message work of detect_intent) by:
+
+  baseline → the production model alone (best_model.pkl)
+  nb       → Naive Bayes alone (cascade margin 0: never escalates)
+  cascade  → Naive Bayes, escalating below the margin train.py tuned
+  --margins→ extra cascade margins to compare
+
+Reported per mode: mean and p99 latency, share of messages escalated and
+accuracy against the tag the message was made from (the messages are noisy
+copies of training patterns, so accuracy reads high; compare the modes, and
+see "cascade" in models/model_meta.json for the out-of-fold figures).
+
+    python benchmarks/bench_cascade.py --messages 2000
+"""
+import argparse, json, os, random, sys, time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ["MEDBOT_PROMPT_LOG"]   = "0"
+os.environ["MEDBOT_CASCADE"]      = "1"
+os.environ["MEDBOT_MODEL_FORMAT"] = "pickle"
+os.environ["MEDBOT_ENGINE"]       = "tfidf"
+
+import app
+from cascade import Cascade
+from load_test import percentile
+from suite import typo
+
+
+def run(classify, queries) -> tuple:
+    """(latencies, predicted tags) for one message at a time."""
+    latencies, tags = [], []
+    for q in queries:
+        t0    = time.perf_counter()
+        proba = classify(app.vectorize([q]))
+        latencies.append(time.perf_counter() - t0)
+        tags.append(app.CLASSES[proba[0].argmax()])
+    return latencies, np.array(tags)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, default=2000)
+    ap.add_argument("--margins",  type=float, nargs="*", default=[], help="extra cascade margins to compare")
+    ap.add_argument("--seed",     type=int, default=7)
+    ap.add_argument("--json",     help="write the report to this file")
+    args = ap.parse_args()
+
+    if app.cascade is None:
+        sys.exit("❌ no cascade in models/model_meta.json — run train.py first")
+    rng     = random.Random(args.seed)
+    sample  = [rng.choice(app._PATTERNS) for _ in range(args.messages)]
+    queries = [typo(p, rng).lower() for p, _ in sample]
+    truth   = np.array([tag for _, tag in sample])
+
+    trained = app.cascade
+    variant = lambda margin: Cascade(trained.first, trained.escalate, margin, trained.first_name,
+                                     trained.escalate_name, trained.blend_first, trained.scale, trained.escalate_map)
+    modes = {"baseline": None, "nb": variant(0.0), "cascade": trained,
+             **{f"margin {m:g}": variant(m) for m in args.margins}}
+
+    spec = app.model_meta["cascade"]
+    print(f"🪜 {args.messages} typo'd messages, one at a time | baseline {app.MODEL_NAME} | "
+          f"escalate to {trained.escalate_name} below margin {trained.margin:.3f} "
+          f"(out-of-fold: {spec['escalation_rate']:.0%} escalated, accuracy {spec['accuracy']:.3f} vs {spec['best_accuracy']:.3f})\n")
+    print(f"{'mode':>14} {'mean ms':>8} {'p99 ms':>8} {'escalated':>10} {'accuracy':>9}")
+    report = {"config": vars(args), "margin": trained.margin, "modes": {}}
+    for mode, cascade in modes.items():
+        classify = app.best_model[-1].predict_proba if cascade is None else (lambda X, c=cascade: c.predict_proba(X)[0])
+        run(classify, queries[:50])   # warm caches
+        before        = cascade.escalated if cascade else 0
+        latency, tags = run(classify, queries)
+        row = report["modes"][mode] = {
+            "mean_ms":   round(float(np.mean(latency)) * 1000, 3),
+            "p99_ms":    round(percentile(latency, 99) * 1000, 3),
+            "escalated": round((cascade.escalated - before) / len(queries), 4) if cascade else None,
+            "accuracy":  round(float(np.mean(tags == truth)), 4),
+        }
+        escalated = "—" if cascade is None else f"{row['escalated']:.1%}"
+        print(f"{mode:>14} {row['mean_ms']:8.2f} {row['p99_ms']:8.2f} {escalated:>10} {row['accuracy']:9.1%}")
+    base, casc = report["modes"]["baseline"], report["modes"]["cascade"]
+    print(f"\n⚡ cascade: {base['mean_ms'] / casc['mean_ms']:.1f}× lower mean latency, p99 "
+          f"{base['p99_ms']:.2f} → {casc['p99_ms']:.2f} ms, accuracy {casc['accuracy'] - base['accuracy']:+.1%} vs baseline")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Stage 1 classification benchmark — single detect_intent() calls vs batched detect_intents()
+==========================================================================================
+Replays INTENTS patterns (with light synthetic typos) through the production
+classifier and reports the per-message cost for one call per message versus
+one call per batch of N messages.
+
+Run:  python benchmarks/bench_classify.py --messages 1000 --batch-sizes 1 10 100 1000
+"""
+import argparse, json, os, random, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GROQ_API_KEY", "bench")   # app.py builds a Groq client at import
+
+import app
+from knowledge_base import INTENTS
+
+
+def typo(text, rng):
+    if len(text) < 4:
+        return text
+    i = rng.randrange(len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def make_corpus(n, seed=0):
+    rng      = random.Random(seed)
+    patterns = [p for i in INTENTS for p in i["patterns"]]
+    return [typo(rng.choice(patterns), rng) if rng.random() < 0.3 else rng.choice(patterns) for _ in range(n)]
+
+
+def per_message_us(fn, messages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(messages)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(messages) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages",    type=int, default=1000)
+    ap.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    ap.add_argument("--repeat",      type=int, default=2)
+    ap.add_argument("--json",        help="write the report to this file")
+    args = ap.parse_args()
+
+    messages = make_corpus(args.messages)
+    app.detect_intents(messages[:10])   # warm-up
+
+    single = per_message_us(lambda ms: [app.detect_intent(m) for m in ms], messages, args.repeat)
+    report = {"messages": len(messages), "single_us_per_msg": round(single, 1), "batched": []}
+    print(f"🔬 {len(messages)} messages | model {app.model_meta['best_model']}")
+    print(f"   single detect_intent()     : {single:9.1f} µs/msg")
+
+    for size in args.batch_sizes:
+        def run(ms, size=size):
+            for i in range(0, len(ms), size):
+                app.detect_intents(ms[i:i + size])
+        us = per_message_us(run, messages, args.repeat)
+        report["batched"].append({"batch_size": size, "us_per_msg": round(us, 1), "speedup": round(single / us, 1)})
+        print(f"   detect_intents(batch={size:<5}): {us:9.1f} µs/msg  ({single / us:.1f}× faster)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
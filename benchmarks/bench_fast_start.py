@@ -0,0 +1,105 @@
+"""
+Boot time — everything at import (preload) vs MEDBOT_FAST_START (lazy imports + warm-up thread)
+==============================================================================================
+import profile → `python -X importtime -c "import app"` in a fresh interpreter per mode:
+                 total import time and the slowest modules app.py pulls in directly
+                 (in fast-start mode the models, scikit-learn and groq load afterwards,
+                 on the warm-up thread; its duration is reported separately)
+gunicorn boot  → seconds from launching `gunicorn -c gunicorn.conf.py app:app` until
+                 /api/models first answers 200 (static routes servable) and until
+                 /api/ready first answers 200 (/api/chat servable)
+
+    python benchmarks/bench_fast_start.py --workers 2 --repeat 3
+"""
+import argparse, json, os, re, subprocess, sys, time
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+MODES   = {"eager": "0", "fast_start": "1"}
+_LINE   = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+# Holds the fast-start warm-up thread until `import app` has returned, so -X importtime attributes
+# its imports to the thread instead of interleaving them with app's own import tree
+WARM_UP = """
+import threading
+held, start = [], threading.Thread.start
+threading.Thread.start = lambda thread: held.append(thread)
+import app
+threading.Thread.start = start
+for thread in held:
+    thread.start()
+app.ready.wait(120)
+print("warmup_s", app.warmup["seconds"])
+"""
+
+
+def import_profile(env: dict, top: int) -> dict:
+    run = subprocess.run([sys.executable, "-X", "importtime", "-c", WARM_UP], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    rows  = [(int(cum), len(indent), name) for _, cum, indent, name in _LINE.findall(run.stderr)]
+    at    = next(i for i, (_, _, name) in enumerate(rows) if name == "app")
+    total, depth, _ = rows[at]
+    start = max(i for i, (_, _, name) in enumerate(rows[:at]) if name == "site") + 1   # after interpreter start-up
+    direct = sorted(((cum, name) for cum, indent, name in rows[start:at] if indent == depth + 2), reverse=True)
+    return {"import_ms": round(total / 1000, 1), "warmup_s": float(re.search(r"warmup_s ([\d.]+)", run.stdout).group(1)),
+            "slowest": [{"module": name, "ms": round(cum / 1000, 1)} for cum, name in direct[:top]]}
+
+
+def gunicorn_boot(env: dict, args) -> dict:
+    base = f"http://127.0.0.1:{args.port}"
+    proc = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "app:app", "-w", str(args.workers),
+                             "-b", f"127.0.0.1:{args.port}"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    t0, marks = time.perf_counter(), {}
+    try:
+        while len(marks) < 2 and time.perf_counter() - t0 < 120:
+            for name, path in (("models_s", "/api/models"), ("ready_s", "/api/ready")):
+                if name in marks:
+                    continue
+                try:
+                    if httpx.get(base + path, timeout=1).status_code == 200:
+                        marks[name] = round(time.perf_counter() - t0, 3)
+                except httpx.HTTPError:
+                    pass
+            time.sleep(0.01)
+        return marks
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--repeat",  type=int, default=3)
+    ap.add_argument("--top",     type=int, default=6, help="slowest direct imports to list")
+    ap.add_argument("--port",    type=int, default=8410)
+    ap.add_argument("--json",    help="write the report to this file")
+    args = ap.parse_args()
+
+    report = {"config": vars(args), "modes": {}}
+    for mode, flag in MODES.items():
+        env  = {**os.environ, "MEDBOT_FAST_START": flag, "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "bench"),
+                "MEDBOT_PROMPT_LOG": "0"}
+        runs = [import_profile(env, args.top) for _ in range(args.repeat)]
+        boot = [gunicorn_boot(env, args) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["import_ms"])
+        row  = report["modes"][mode] = {
+            **best,
+            "gunicorn_models_s": min(b.get("models_s", float("inf")) for b in boot),
+            "gunicorn_ready_s":  min(b.get("ready_s", float("inf")) for b in boot),
+        }
+        print(f"\n🚀 {mode}: import app {row['import_ms']:.0f} ms"
+              + (f" + warm-up thread {row['warmup_s']:.2f} s" if flag == "1" else ""))
+        for m in row["slowest"]:
+            print(f"   {m['module']:<20} {m['ms']:8.1f} ms")
+        print(f"   gunicorn -w {args.workers}: /api/models 200 after {row['gunicorn_models_s']:.2f} s, "
+              f"/api/ready 200 after {row['gunicorn_ready_s']:.2f} s")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Retrain time after editing one intent — full train.py vs train.py --incremental
+==============================================================================
+Works in a scratch directory (the real models/ is never touched):
+  1. full run on the current knowledge base           → primes models/.train_cache
+  2. one intent gets an extra pattern
+  3. --incremental run on the edited knowledge base   → what the edit costs with the cache
+  4. full run on the edited knowledge base            → what it costs today
+  5. --incremental run with nothing changed            → e.g. after a responses-only edit
+and prints wall time, the per-stage timings and the CV accuracy of each run, so
+the incremental models can be checked against the full rebuild.
+
+    python benchmarks/bench_incremental.py [--intent blood_pressure] [--pattern "..."] [--jobs 1]
+"""
+import argparse, json, os, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EDIT = """from _kb_base import *
+from _kb_base import INTENTS
+for _intent in INTENTS:
+    if _intent["tag"] == {tag!r}:
+        _intent["patterns"].append({pattern!r})
+"""
+
+RUN = ("import sys, runpy; sys.path[:0] = [{kb!r}, {root!r}]; "
+       "sys.argv = ['train.py'] + {args!r}; runpy.run_path({train!r}, run_name='__main__')")
+
+
+def train(workdir, kb, args):
+    code = RUN.format(kb=kb, root=ROOT, args=args, train=os.path.join(ROOT, "train.py"))
+    t0   = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    wall = time.perf_counter() - t0
+    with open(os.path.join(workdir, "models", "model_meta.json")) as f:
+        meta = json.load(f)
+    return {"wall_s": round(wall, 3), "training": meta["training"], "timings": meta["timings"],
+            "accuracy": meta["accuracy"], "hashed_accuracy": meta["engines"]["hashed"]["cv_accuracy"]}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--intent",  default="blood_pressure")
+    ap.add_argument("--pattern", default="is my blood pressure reading too high")
+    ap.add_argument("--jobs",    default="1")
+    ap.add_argument("--json",    help="write the report to this file")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kb = os.path.join(tmp, "kb")
+        os.makedirs(kb)
+        with open(os.path.join(ROOT, "knowledge_base.py")) as src, open(os.path.join(kb, "_kb_base.py"), "w") as dst:
+            dst.write(src.read())
+        kb_file = os.path.join(kb, "knowledge_base.py")
+        with open(kb_file, "w") as f:
+            f.write("from _kb_base import *\n")
+
+        jobs   = ["--jobs", args.jobs]
+        report = {"prime_full": train(tmp, kb, jobs)}
+        with open(kb_file, "w") as f:
+            f.write(EDIT.format(tag=args.intent, pattern=args.pattern))
+        report["edit_incremental"] = train(tmp, kb, jobs + ["--incremental"])
+        report["edit_full"]        = train(tmp, kb, jobs)
+        report["noop_incremental"] = train(tmp, kb, jobs + ["--incremental"])
+
+    for run, r in report.items():
+        stages = " | ".join(f"{k[:-2]} {v:.2f}s" for k, v in r["timings"].items() if k.endswith("_s") and k != "total_s")
+        acc    = " ".join(f"{v:.3f}" for v in r["accuracy"].values())
+        print(f"🔁 {run:17} {r['training']['mode']:11} {r['wall_s']:6.2f}s wall | {stages}")
+        print(f"   {'':17} accuracy {acc} | hashed {r['hashed_accuracy']:.3f} | fits {r['training']['fits']}"
+              + (f" | {r['training']['reason']}" if r["training"]["reason"] else ""))
+    full, inc = report["edit_full"]["wall_s"], report["edit_incremental"]["wall_s"]
+    print(f"\n⚡ one-intent edit: full {full:.2f}s → incremental {inc:.2f}s ({full / inc:.1f}× faster)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Knowledge store — memory and lookup latency as the intent catalogue grows
+========================================================================
+Synthetic catalogues of --sizes intents (the INTENTS catalogue first, then
+copies of its intents under new tags, each response extended to about
+--response-bytes with words from the knowledge base) are written as:
+
+  pickle  → knowledge.pkl, the {tag: [responses]} dict app.py loads today
+  compact → models/compact/'s mmap'd offset table (responses.bin + offsets + intents.json)
+  sqlite  → knowledge.db (knowledge_store.py), LRU of --cache entries
+
+and each is opened in a fresh interpreter that reports:
+  load_ms   → time to open / load it
+  rss_mb    → resident memory added by opening it and serving the lookups
+  anon_mb   → of which anonymous (private heap, never shared between workers)
+  cold_us   → p50/p99 of hints(tag) (the first two responses) for uniformly random tags
+  hot_us    → same with 90% of lookups on 64 hot intents (LRU hits for sqlite)
+
+    python benchmarks/bench_knowledge_store.py --sizes 40 10000 100000
+"""
+import argparse, json, os, random, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+import joblib
+from compact_model import export_responses
+from knowledge_base import INTENTS
+from knowledge_store import build_store
+
+BACKENDS = ("pickle", "compact", "sqlite")
+CHILD = """
+import json, os, random, sys, time
+sys.path[:0] = [{root!r}, {bench!r}]
+import joblib, sqlite3
+from compact_model import ResponseBlob
+from knowledge_store import KnowledgeStore
+from load_test import percentile
+
+def memory():
+    out = {{}}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Anonymous"):
+                out[key] = int(rest.split()[0]) / 1024
+    return out
+
+backend, path, size, lookups, cache = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5])
+tags = json.load(open(os.path.join(os.path.dirname(path), "tags.json")))
+rng  = random.Random(0)
+cold = [rng.choice(tags) for _ in range(lookups)]
+hot  = rng.sample(tags, min(64, len(tags)))
+warm = [rng.choice(hot) if rng.random() < 0.9 else rng.choice(tags) for _ in range(lookups)]
+before = memory()
+t0 = time.perf_counter()
+if backend == "pickle":
+    intent_map = joblib.load(path)["intent_map"]
+    hints = lambda tag: tuple(intent_map[tag][:2])
+elif backend == "compact":
+    blob  = ResponseBlob(path)
+    hints = lambda tag: tuple(blob[tag][:2])
+else:
+    store = KnowledgeStore(path, cache_size=cache)
+    hints = store.hints
+load_ms = (time.perf_counter() - t0) * 1000
+
+def timed(tags):
+    out = []
+    for tag in tags:
+        t0 = time.perf_counter()
+        hints(tag)
+        out.append(time.perf_counter() - t0)
+    return {{"p50": round(percentile(out, 50) * 1e6, 1), "p99": round(percentile(out, 99) * 1e6, 1)}}
+
+result = {{"load_ms": round(load_ms, 1), "cold_us": timed(cold), "hot_us": timed(warm)}}
+after = memory()
+result["rss_mb"]  = round(after["Rss"] - before["Rss"], 1)
+result["anon_mb"] = round(after["Anonymous"] - before["Anonymous"], 1)
+print(json.dumps(result))
+"""
+
+
+def catalogue(size: int, response_bytes: int, seed: int):
+    """{tag: [responses]}: INTENTS, then re-tagged copies with longer, distinct responses."""
+    rng   = random.Random(seed)
+    words = [w for i in INTENTS for r in i["responses"] for w in r.split()]
+    out   = {}
+    for n in range(size):
+        intent = INTENTS[n % len(INTENTS)]
+        tag    = intent["tag"] if n < len(INTENTS) else f"{intent['tag']}__{n}"
+        grow   = lambda r: r if n < len(INTENTS) else \
+            r + "\n\n" + " ".join(rng.choice(words) for _ in range(max(0, (response_bytes - len(r)) // 6)))
+        copies = 1 if n < len(INTENTS) else rng.randint(1, 3)
+        out[tag] = [grow(r) for _ in range(copies) for r in intent["responses"]]
+    return out
+
+
+def write(backends: list, intent_map: dict, out: str) -> dict:
+    paths = {}
+    if "pickle" in backends:
+        paths["pickle"] = os.path.join(out, "knowledge.pkl")
+        joblib.dump({"intent_map": intent_map, "fallback": "fallback"}, paths["pickle"])
+    if "compact" in backends:
+        paths["compact"] = os.path.join(out, "compact")
+        os.makedirs(paths["compact"])
+        export_responses(intent_map, paths["compact"])
+    if "sqlite" in backends:
+        paths["sqlite"] = os.path.join(out, "knowledge.db")
+        patterns = {i["tag"]: i["patterns"] for i in INTENTS}
+        build_store(paths["sqlite"], ({"tag": tag, "patterns": patterns[tag.split("__")[0]], "responses": responses}
+                                      for tag, responses in intent_map.items()))
+    return paths
+
+
+def disk_bytes(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes",          type=int, nargs="+", default=[40, 10000, 100000])
+    ap.add_argument("--backends",       nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    ap.add_argument("--response-bytes", type=int, default=800, help="approximate length of a synthetic response")
+    ap.add_argument("--lookups",        type=int, default=20000)
+    ap.add_argument("--cache",          type=int, default=1024, help="sqlite LRU entries")
+    ap.add_argument("--seed",           type=int, default=7)
+    ap.add_argument("--json",           help="write the report to this file")
+    args = ap.parse_args()
+
+    report = {"config": vars(args), "sizes": []}
+    print(f"📚 hints(tag) lookups: {args.lookups} cold (uniform) + {args.lookups} hot (90% on 64 intents)\n")
+    print(f"{'intents':>8} {'backend':>8} {'disk MB':>8} {'load ms':>8} {'rss MB':>7} {'anon MB':>8} "
+          f"{'cold p50/p99 µs':>16} {'hot p50/p99 µs':>15}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as out:
+            intent_map = catalogue(size, args.response_bytes, args.seed)
+            with open(os.path.join(out, "tags.json"), "w") as f:
+                json.dump(list(intent_map), f)
+            t0      = time.perf_counter()
+            paths   = write(args.backends, intent_map, out)
+            written = time.perf_counter() - t0
+            del intent_map
+            for backend, path in paths.items():
+                code = CHILD.format(root=ROOT, bench=os.path.join(ROOT, "benchmarks"))
+                run  = subprocess.run([sys.executable, "-c", code, backend, path, str(size), str(args.lookups),
+                                       str(args.cache)], capture_output=True, text=True, check=True)
+                row  = {"intents": size, "backend": backend, "disk_mb": round(disk_bytes(path) / 2**20, 1),
+                        **json.loads(run.stdout.strip().splitlines()[-1])}
+                report["sizes"].append(row)
+                print(f"{size:8} {backend:>8} {row['disk_mb']:8.1f} {row['load_ms']:8.1f} {row['rss_mb']:7.1f} "
+                      f"{row['anon_mb']:8.1f} {row['cold_us']['p50']:7.1f}/{row['cold_us']['p99']:<8.1f} "
+                      f"{row['hot_us']['p50']:6.1f}/{row['hot_us']['p99']:<8.1f}")
+        print(f"         ({', '.join(paths)} written in {written:.1f}s)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
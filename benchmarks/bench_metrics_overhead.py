@@ -0,0 +1,91 @@
+"""
+Cost of the per-stage instrumentation — metrics on vs off
+=========================================================
+Two measurements:
+  stage    → one `with telemetry.stage(...)` block, enabled vs the no-op timer
+             (and with the per-request Server-Timing dict on top)
+  request  → /api/chat on the knowledge-base route (Flask test client, no LLM,
+             so the timers are a visible share of the request), run in a fresh
+             interpreter per setting: MEDBOT_METRICS=0, =1, =1 + MEDBOT_SERVER_TIMING=1
+
+    python benchmarks/bench_metrics_overhead.py --requests 3000 [--json out.json]
+"""
+import argparse, json, os, subprocess, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SETTINGS = {
+    "off":           {"MEDBOT_METRICS": "0", "MEDBOT_SERVER_TIMING": "0"},
+    "on":            {"MEDBOT_METRICS": "1", "MEDBOT_SERVER_TIMING": "0"},
+    "server_timing": {"MEDBOT_METRICS": "1", "MEDBOT_SERVER_TIMING": "1"},
+}
+
+
+def bench_stage(iterations: int) -> dict:
+    from metrics import Registry
+    out = {}
+    for name, registry in (("off", Registry(enabled=False)), ("on", Registry()),
+                           ("server_timing", Registry(server_timing=True))):
+        registry.begin_request()
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            with registry.stage("bench"):
+                pass
+        out[name] = round((time.perf_counter() - t0) / iterations * 1e9, 1)
+    return out
+
+
+def child(requests: int):
+    """Runs inside the subprocess: time /api/chat on a fast-path message."""
+    import app as medbot
+    client = medbot.app.test_client()
+    for _ in range(50):
+        client.post("/api/chat", json={"message": "thank you"})
+    samples = []
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        client.post("/api/chat", json={"message": "thank you"})
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    print(json.dumps({"mean_us": round(sum(samples) / len(samples) * 1e6, 1),
+                      "p50_us":  round(samples[len(samples) // 2] * 1e6, 1),
+                      "p99_us":  round(samples[int(len(samples) * 0.99)] * 1e6, 1)}))
+
+
+def bench_request(requests: int) -> dict:
+    out = {}
+    for name, env in SETTINGS.items():
+        env = {**os.environ, **env, "GROQ_API_KEY": "stub", "MEDBOT_CACHE": "off", "MEDBOT_PROMPT_LOG": "0"}
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(requests)],
+                              env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+        out[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--iterations", type=int, default=200_000, help="stage() blocks per setting")
+    ap.add_argument("--requests",   type=int, default=3000, help="/api/chat requests per setting")
+    ap.add_argument("--json",       help="write the report to this file")
+    ap.add_argument("--child",      type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        return child(args.child)
+
+    report = {"stage_ns": bench_stage(args.iterations), "request": bench_request(args.requests)}
+    stage, req = report["stage_ns"], report["request"]
+    print(f"⏱️  one stage() block: off {stage['off']:.0f} ns | on {stage['on']:.0f} ns | "
+          f"+server-timing {stage['server_timing']:.0f} ns")
+    print(f"\n🩺 /api/chat, KB route, {args.requests} requests")
+    print(f"{'setting':>14} {'mean µs':>9} {'p50 µs':>9} {'p99 µs':>9} {'overhead':>9}")
+    for name, row in req.items():
+        overhead = row["mean_us"] / req["off"]["mean_us"] - 1
+        print(f"{name:>14} {row['mean_us']:9.1f} {row['p50_us']:9.1f} {row['p99_us']:9.1f} {overhead:+9.1%}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Pattern vector index — search latency as the pattern count grows, and what refinement buys
+==========================================================================================
+scaling    → synthetic pattern sets of --sizes patterns (INTENTS patterns, then
+             typo'd variants extended with a word from another pattern of the same
+             intent), indexed with the production vectorizer, searched exact and ann:
+             build time, per-message search latency (p50/p99) and how often the ann
+             nearest pattern has the same intent as the exact one / is within 0.05 cosine
+refinement → typo'd INTENTS messages classified by Stage 1 with and without
+             neighbour votes; accuracy over all messages and over the unsure ones
+             (below the refine confidence). Held out: the messages are split into
+             --folds folds and each fold votes with an index built without the
+             patterns its messages came from, so no message finds its own source.
+             (The classifier itself was trained on every pattern, so both columns
+             are optimistic; the difference between them is what refinement buys.)
+
+    python benchmarks/bench_pattern_index.py --sizes 1000 10000 100000 --queries 300
+"""
+import argparse, json, os, random, sys, time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ["MEDBOT_PROMPT_LOG"] = "0"
+
+import app
+from load_test import percentile
+from pattern_index import PatternIndex
+from suite import typo
+
+
+def synthetic(size: int, rng: random.Random):
+    """(patterns, proba columns) — the real patterns first, then noisy same-intent variants."""
+    base  = app._PATTERNS
+    words = {}
+    for p, tag in base:
+        words.setdefault(tag, []).extend(p.split())
+    out = list(base[:size])
+    while len(out) < size:
+        p, tag = rng.choice(base)
+        out.append((f"{typo(typo(p, rng), rng)} {rng.choice(words[tag])}", tag))
+    return [p for p, _ in out], [app._COLUMN[t] for _, t in out]
+
+
+def timed_search(index, rows) -> list:
+    latencies = []
+    for row in rows:
+        t0 = time.perf_counter()
+        index.search(row, 1)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def scaling(args, queries) -> list:
+    Q, rows, report = app.vectorize(queries), [app.vectorize([q]) for q in queries], []
+    print(f"{'patterns':>9} {'mode':>6} {'build s':>8} {'p50 µs':>8} {'p99 µs':>8} {'same intent':>12} {'±0.05 cos':>10}")
+    for size in args.sizes:
+        patterns, labels = synthetic(size, random.Random(args.seed))
+        exact    = PatternIndex(app.vectorize, patterns, labels, exact_max=size)
+        truth    = exact.search(Q, 1)
+        for mode, index in (("exact", exact),
+                            ("ann",   PatternIndex(app.vectorize, patterns, labels, exact_max=0, nprobe=args.nprobe))):
+            lat       = timed_search(index, rows)
+            ids, sims = index.search(Q, 1)
+            same      = np.mean(index.labels[ids[:, 0]] == exact.labels[truth[0][:, 0]])
+            close     = np.mean(sims[:, 0] >= truth[1][:, 0] - 0.05)
+            row = {"patterns": size, "mode": mode, "build_s": round(index.build_seconds, 2),
+                   "p50_us": round(percentile(lat, 50) * 1e6), "p99_us": round(percentile(lat, 99) * 1e6),
+                   "same_intent": round(float(same), 4), "within_005": round(float(close), 4)}
+            report.append(row)
+            print(f"{size:9} {mode:>6} {row['build_s']:8.2f} {row['p50_us']:8} {row['p99_us']:8} "
+                  f"{row['same_intent']:12.1%} {row['within_005']:10.1%}")
+    return report
+
+
+def refinement(sample, queries, truth, folds: int, weight: float) -> dict:
+    live    = app.pattern_index
+    Q       = app.vectorize(queries)
+    base    = app.classify(Q)
+    refined = base.copy()
+    mask    = np.zeros(len(queries), bool)
+    for fold in range(folds):
+        rows  = np.arange(fold, len(queries), folds)
+        held  = {sample[i][0] for i in rows}
+        kept  = [(p, tag) for p, tag in app._PATTERNS if p not in held]
+        index = PatternIndex(app.vectorize, [p for p, _ in kept], [app._COLUMN[t] for _, t in kept],
+                             refine_below=live.refine_below, weight=weight, min_similarity=live.min_similarity)
+        ids, sims = index.search(Q[rows], app.EVIDENCE_K)
+        refined[rows], mask[rows] = index.refine(base[rows], ids, sims)
+    unsure = base.max(axis=1) * 100 < live.refine_below
+    hit    = lambda proba, rows: float(np.mean(app.CLASSES[proba[rows].argmax(axis=1)] == truth[rows]))
+    every  = np.ones(len(queries), bool)
+    return {"messages": len(queries), "folds": folds, "weight": weight, "unsure": int(unsure.sum()), "refined": int(mask.sum()),
+            "accuracy_all":    {"classifier": round(hit(base, every), 4), "refined": round(hit(refined, every), 4)},
+            "accuracy_unsure": {"classifier": round(hit(base, unsure), 4), "refined": round(hit(refined, unsure), 4)}}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes",   type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--nprobe",  type=int, default=8)
+    ap.add_argument("--folds",   type=int, default=5, help="held-out folds for the refinement accuracy")
+    ap.add_argument("--weight",  type=float, default=0.5, help="neighbour-vote weight to evaluate (the app defaults to 0)")
+    ap.add_argument("--seed",    type=int, default=7)
+    ap.add_argument("--json",    help="write the report to this file")
+    args = ap.parse_args()
+
+    rng     = random.Random(args.seed + 1)
+    sample  = [rng.choice(app._PATTERNS) for _ in range(args.queries)]
+    queries = [typo(typo(p, rng), rng).lower() for p, _ in sample]
+    truth   = np.array([tag for _, tag in sample])
+
+    print(f"🔎 {args.queries} typo'd messages, top-1 search, nprobe {args.nprobe}\n")
+    report = {"config": vars(args), "scaling": scaling(args, queries)}
+    if app.pattern_index is not None:
+        r = report["refinement"] = refinement(sample, queries, truth, args.folds, args.weight)
+        print(f"\n🗳️  refinement ({app.pattern_index.stats()['patterns']} patterns, each message's source pattern "
+              f"held out, {args.folds} folds, weight {args.weight}): {r['unsure']} of {r['messages']} messages unsure, {r['refined']} refined")
+        print(f"   accuracy, all    : {r['accuracy_all']['classifier']:.1%} → {r['accuracy_all']['refined']:.1%}")
+        print(f"   accuracy, unsure : {r['accuracy_unsure']['classifier']:.1%} → {r['accuracy_unsure']['refined']:.1%}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
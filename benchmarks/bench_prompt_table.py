@@ -0,0 +1,112 @@
+"""
+Per-request cost of the system prompt — rebuilt every time vs the precomputed prompt table
+========================================================================================
+Replays INTENTS patterns through Stage 1, then times, per request:
+  render  → build_system_prompt() only
+  build   → the full build_messages() (render + token budget) at --turns of history
+for
+  rebuilt → every request formats its prompt and the budget re-estimates it
+            (the pre-table behaviour: no system_tokens, no _norm memo)
+  table   → app.prompt_table: heads + token counts memoized per intent
+It also reports how many leading bytes of the system prompt stay identical
+across requests — the part an upstream prompt cache can reuse.
+
+    python benchmarks/bench_prompt_table.py --messages 500 --turns 0 4 10
+"""
+import argparse, json, os, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ["MEDBOT_PROMPT_LOG"] = "0"
+
+import app
+import prompt_budget
+from prompt_table import ML_CONTEXT_HEAD, REQUEST_LINES
+from knowledge_base import INTENTS
+
+
+def rebuilt_render(ml_result: dict, hints) -> str:
+    if hints is None:
+        return app.SYSTEM_PROMPT_BASE
+    return (app.SYSTEM_PROMPT_BASE
+            + ML_CONTEXT_HEAD.format(intent=ml_result["tag"].replace("_", " ").title(),
+                                     hints="\n".join(f"- {h}" for h in hints) or "  (none)")
+            + REQUEST_LINES.format(model=ml_result["model_used"], confidence=ml_result["confidence"]))
+
+
+def history(turns: int) -> list:
+    answers = [r for i in INTENTS for r in i["responses"]]
+    return [{"role": "user", "content": "I have a question about my health."} if i % 2 == 0 else
+            {"role": "assistant", "content": answers[i % len(answers)]} for i in range(turns)]
+
+
+def per_request_us(fn, cases, repeat) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for case in cases:
+            fn(*case)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(cases) * 1e6
+
+
+def common_prefix(strings) -> int:
+    first, last = min(strings), max(strings)
+    n = 0
+    while n < min(len(first), len(last)) and first[n] == last[n]:
+        n += 1
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, default=500)
+    ap.add_argument("--turns",    type=int, nargs="+", default=[0, 4, 10])
+    ap.add_argument("--repeat",   type=int, default=5)
+    ap.add_argument("--json",     help="write the report to this file")
+    args = ap.parse_args()
+
+    patterns = [p for i in INTENTS for p in i["patterns"]]
+    messages = [patterns[i % len(patterns)] for i in range(args.messages)]
+    results  = app.detect_intents(messages)
+    budget   = app.prompt_budget
+    norm     = prompt_budget._norm
+
+    def rebuilt_build(message, turns, ml):
+        return budget.build(message, turns, ml, rebuilt_render)
+
+    report = {"messages": len(messages), "render": {}, "build": []}
+    cases  = [(ml, ml["top_responses"]) for ml in results]
+    report["render"] = {"rebuilt_us": round(per_request_us(rebuilt_render, cases, args.repeat), 2),
+                        "table_us":   round(per_request_us(app.prompt_table.render, cases, args.repeat), 2)}
+    print(f"🧾 {len(messages)} requests | system prompt render: rebuilt {report['render']['rebuilt_us']:.2f} µs → "
+          f"table {report['render']['table_us']:.2f} µs")
+
+    print(f"\n{'turns':>5} {'rebuilt µs':>11} {'table µs':>9} {'saved µs':>9}")
+    for turns in args.turns:
+        cases = [(m, history(turns), ml) for m, ml in zip(messages, results)]
+        prompt_budget._norm = norm.__wrapped__
+        old = per_request_us(rebuilt_build, cases, args.repeat)
+        prompt_budget._norm = norm
+        new = per_request_us(app.build_messages, cases, args.repeat)
+        report["build"].append({"turns": turns, "rebuilt_us": round(old, 1), "table_us": round(new, 1)})
+        print(f"{turns:5} {old:11.1f} {new:9.1f} {old - new:9.1f}")
+
+    prompts = [app.build_system_prompt(ml, ml["top_responses"]) for ml in results]
+    by_tag  = {}
+    for ml, prompt in zip(results, prompts):
+        by_tag.setdefault(ml["tag"], []).append(prompt)
+    shared  = common_prefix(prompts)
+    per_tag = [common_prefix(p) / len(p[0]) for p in by_tag.values() if len(p) > 1]
+    report["prefix"] = {"shared_all_bytes": shared, "mean_prompt_bytes": round(sum(map(len, prompts)) / len(prompts)),
+                        "same_intent_identical_share": round(sum(per_tag) / len(per_tag), 4)}
+    print(f"\n🔁 identical prefix: {shared} chars across all requests, "
+          f"{report['prefix']['same_intent_identical_share']:.1%} of the prompt across requests with the same intent")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Tail latency & failover of the Groq call — unguarded vs deadlines/retries/hedging/breaker
+======================================================================================
+Starts the stub LLM with injected slowness (--slow-rate of the calls take
+--slow-latency seconds longer) and drives app.respond() from --concurrency
+threads (knowledge-base fast path off, response cache off, so every message
+goes to the stub). The same traffic is replayed with different resilience.LLMGuard
+settings:
+  unguarded  → one attempt, no deadline to speak of (the old behaviour)
+  retry      → per-attempt timeout + jittered retries
+  hedged     → per-attempt timeout + retries + a hedge after the p90 latency
+Then an outage: the stub starts answering 500 and we record how long requests
+take before and after the circuit breaker opens (fallback answers from the
+knowledge base), and whether it closes again after recovery.
+
+    python benchmarks/bench_resilience.py --requests 300 --concurrency 8 --slow-rate 0.05 --slow-latency 3
+"""
+import argparse, json, os, subprocess, sys, time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+from load_test import percentile, wait_ready
+
+
+def guards(args, LLMGuard, CircuitBreaker, retry_on):
+    attempt = args.attempt_timeout
+    return {
+        "unguarded": LLMGuard(deadline=120, attempt_timeout=120, retries=0, retry_on=retry_on),
+        "retry":     LLMGuard(deadline=args.deadline, attempt_timeout=attempt, retries=2, backoff=0.05,
+                              retry_on=retry_on),
+        "hedged":    LLMGuard(deadline=args.deadline, attempt_timeout=attempt, retries=2, backoff=0.05,
+                              hedge=90, hedge_min=0.05, retry_on=retry_on),
+    }
+
+
+def replay(medbot, messages, concurrency):
+    """[(seconds, route)] for every message, `concurrency` at a time."""
+    def one(message):
+        ml = medbot.detect_intent(message)
+        t0 = time.perf_counter()
+        _, route = medbot.respond(message, [], ml)
+        return time.perf_counter() - t0, route
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(one, messages))
+
+
+def summary(rows) -> dict:
+    lat = [s for s, _ in rows]
+    ms  = lambda q: round(percentile(lat, q) * 1000, 1)
+    return {"requests": len(rows), "p50_ms": ms(50), "p95_ms": ms(95), "p99_ms": ms(99),
+            "max_ms": round(max(lat) * 1000, 1), "routes": dict(Counter(r for _, r in rows))}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests",        type=int, default=300)
+    ap.add_argument("--concurrency",     type=int, default=8)
+    ap.add_argument("--latency",         type=float, default=0.1, help="stub time to answer (s)")
+    ap.add_argument("--slow-rate",       type=float, default=0.05)
+    ap.add_argument("--slow-latency",    type=float, default=3.0)
+    ap.add_argument("--attempt-timeout", type=float, default=1.0)
+    ap.add_argument("--deadline",        type=float, default=5.0)
+    ap.add_argument("--outage-requests", type=int, default=40)
+    ap.add_argument("--stub-port",       type=int, default=8950)
+    ap.add_argument("--json",            help="write the report to this file")
+    args = ap.parse_args()
+
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "stub_llm.py"),
+                             "--port", str(args.stub_port), "--latency", str(args.latency), "--tokens", "40",
+                             "--token-rate", "1e9", "--slow-rate", str(args.slow_rate),
+                             "--slow-latency", str(args.slow_latency)], stdout=subprocess.DEVNULL)
+    os.environ.update({"GROQ_BASE_URL": stub_url, "GROQ_API_KEY": "stub", "MEDBOT_CACHE": "off",
+                       "MEDBOT_FASTPATH": "off", "MEDBOT_PROMPT_LOG": "0"})
+    try:
+        wait_ready(f"{stub_url}/health")
+        import app as medbot
+        from knowledge_base import INTENTS
+        from resilience import LLMGuard, CircuitBreaker
+
+        patterns = [p for i in INTENTS for p in i["patterns"]]
+        messages = [patterns[i % len(patterns)] for i in range(args.requests)]
+        report   = {"config": vars(args), "slow_tail": {}}
+
+        print(f"🐢 {args.requests} requests, c={args.concurrency}, {args.slow_rate:.0%} of calls "
+              f"+{args.slow_latency}s (stub {args.latency}s)\n")
+        print(f"{'guard':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'retries':>8} {'hedges':>7}")
+        for name, guard in guards(args, LLMGuard, CircuitBreaker, medbot.LLM_RETRY_ON).items():
+            medbot.llm_guard = guard
+            replay(medbot, messages[:30], args.concurrency)   # warm-up: fills the hedge latency window
+            row = report["slow_tail"][name] = {**summary(replay(medbot, messages, args.concurrency)),
+                                               **{k: guard.counts[k] for k in ("retries", "hedges", "hedge_wins")}}
+            print(f"{name:>10} {row['p50_ms']:8.1f} {row['p95_ms']:8.1f} {row['p99_ms']:8.1f} {row['max_ms']:8.1f} "
+                  f"{row['retries']:8} {row['hedges']:7}")
+
+        # ── Outage: upstream answers 500 until we flip it back ─────────────
+        httpx.post(f"{stub_url}/stub/config", json={"slow_rate": 0, "fail_rate": 1})
+        guard = medbot.llm_guard = LLMGuard(deadline=args.deadline, attempt_timeout=args.attempt_timeout,
+                                            retries=2, backoff=0.05, breaker=CircuitBreaker(5, cooldown=1.0),
+                                            retry_on=medbot.LLM_RETRY_ON)
+        rows = replay(medbot, messages[:args.outage_requests], 1)
+        before, after = rows[:5], rows[5:]
+        report["outage"] = {"before_open": summary(before), "after_open": summary(after),
+                            "breaker": guard.breaker.info()}
+        httpx.post(f"{stub_url}/stub/config", json={"fail_rate": 0})
+        time.sleep(1.1)
+        replay(medbot, messages[:1], 1)
+        report["outage"]["after_recovery"] = guard.breaker.info()["state"]
+
+        o = report["outage"]
+        print(f"\n💥 outage ({args.outage_requests} sequential requests, breaker opens after 5 failures)")
+        print(f"   before open : p50 {o['before_open']['p50_ms']} ms  routes {o['before_open']['routes']}")
+        print(f"   breaker open: p50 {o['after_open']['p50_ms']} ms  routes {o['after_open']['routes']}")
+        print(f"   after recovery + cooldown the breaker is {o['after_recovery']}")
+        tail = report["slow_tail"]
+        print(f"\n🏁 p99 unguarded {tail['unguarded']['p99_ms']:.0f} ms → retry {tail['retry']['p99_ms']:.0f} ms "
+              f"→ hedged {tail['hedged']['p99_ms']:.0f} ms")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
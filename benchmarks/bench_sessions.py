@@ -0,0 +1,83 @@
+"""
+Request payload & parse cost over long conversations — resent history vs server-side sessions
+============================================================================================
+Plays one long conversation through app.py's /api/chat (Flask test client, stub
+LLM with zero latency, response cache off) twice:
+  history  → the old client: every request carries the whole chat so far
+  session  → the current client: {"message", "session_id"} only
+and reports per turn the request body size, the server-side cost of turning
+that body into the history for the LLM (json.loads + open_session, averaged
+over --reps) and the full request time.
+
+    python benchmarks/bench_sessions.py --turns 60 --answer-tokens 300 [--sessions sqlite]
+"""
+import argparse, json, os, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+
+def converse(medbot, client, mode, args, patterns):
+    history, session_id, rows = [], None, []
+    for turn in range(1, args.turns + 1):
+        message = patterns[turn % len(patterns)]
+        if mode == "history":
+            body = {"message": message, "history": history}
+        else:
+            body = {"message": message, **({"session_id": session_id} if session_id else {})}
+        raw = json.dumps(body).encode()
+
+        t0 = time.perf_counter()
+        for _ in range(args.reps):
+            medbot.open_session(json.loads(raw)) if session_id or mode == "history" else json.loads(raw)
+        parse = (time.perf_counter() - t0) / args.reps
+
+        t0    = time.perf_counter()
+        reply = client.post("/api/chat", data=raw, content_type="application/json").get_json()
+        total = time.perf_counter() - t0
+
+        session_id = reply.get("session_id")
+        history   += [{"role": "user", "content": message}, {"role": "assistant", "content": reply["response"]}]
+        rows.append({"turn": turn, "payload_bytes": len(raw), "parse_us": round(parse * 1e6, 1),
+                     "request_ms": round(total * 1000, 2)})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--turns",         type=int, default=60)
+    ap.add_argument("--answer-tokens", type=int, default=300, help="stub answer length (~7 bytes per token)")
+    ap.add_argument("--reps",          type=int, default=200, help="repetitions of the parse measurement")
+    ap.add_argument("--sessions",      default="memory", help="MEDBOT_SESSIONS store to measure")
+    ap.add_argument("--stub-port",     type=int, default=8911)
+    ap.add_argument("--json",          help="write the report to this file")
+    args = ap.parse_args()
+
+    from stub_llm import serve
+    serve(args.stub_port, latency=0, tokens=args.answer_tokens, token_rate=1e9, background=True)
+    os.environ.update({"GROQ_BASE_URL": f"http://127.0.0.1:{args.stub_port}", "GROQ_API_KEY": "stub",
+                       "MEDBOT_CACHE": "off", "MEDBOT_PROMPT_LOG": "0", "MEDBOT_SESSIONS": args.sessions})
+    import app as medbot
+    from knowledge_base import INTENTS
+
+    patterns = [p for i in INTENTS for p in i["patterns"]]
+    client   = medbot.app.test_client()
+    report   = {mode: converse(medbot, client, mode, args, patterns) for mode in ("history", "session")}
+
+    marks = sorted({1, 10, 25, 50, args.turns} & set(range(1, args.turns + 1)))
+    print(f"💬 {args.turns}-turn conversation, ~{args.answer_tokens}-token answers, sessions={args.sessions}\n")
+    print(f"{'turn':>5} | {'history: bytes':>14} {'parse µs':>9} {'req ms':>7} | {'session: bytes':>14} {'parse µs':>9} {'req ms':>7}")
+    for t in marks:
+        h, s = report["history"][t - 1], report["session"][t - 1]
+        print(f"{t:5} | {h['payload_bytes']:14} {h['parse_us']:9.1f} {h['request_ms']:7.2f} | "
+              f"{s['payload_bytes']:14} {s['parse_us']:9.1f} {s['request_ms']:7.2f}")
+    total = {mode: sum(r["payload_bytes"] for r in rows) for mode, rows in report.items()}
+    print(f"\n📦 bytes uploaded over the conversation: history {total['history'] / 1024:.0f} KiB → "
+          f"session {total['session'] / 1024:.1f} KiB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Identical concurrent chats — LLM calls and latency with and without single-flight
+================================================================================
+Boots gunicorn (gthread workers, response cache off) against the stub LLM and
+fires bursts of --burst identical /api/chat requests at the same moment, each
+on its own connection so they spread over the workers. Per MEDBOT_SINGLEFLIGHT
+mode it reports how many completions reached the stub per burst and the
+request latency:
+  off     → every copy calls Groq
+  thread  → copies that land in the same worker share one call
+  file    → copies share one call across workers too (flock + result file)
+
+    python benchmarks/bench_singleflight.py --workers 4 --threads 4 --burst 16 --bursts 5
+"""
+import argparse, json, os, subprocess, sys, tempfile, threading, time
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+from load_test import percentile, wait_ready
+from bench_worker_memory import children
+
+MODES = ("off", "thread", "file")
+
+
+def burst(url, message, size) -> list:
+    """`size` identical requests released together; returns their latencies."""
+    gate, out = threading.Barrier(size), []
+
+    def one():
+        gate.wait()
+        t0 = time.perf_counter()
+        httpx.post(url, json={"message": message}, headers={"Connection": "close"}, timeout=60)
+        out.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=one) for _ in range(size)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+
+def run_mode(mode, args, env, stub_url) -> dict:
+    env  = {**env, "MEDBOT_SINGLEFLIGHT": mode,
+            "MEDBOT_SINGLEFLIGHT_DIR": tempfile.mkdtemp(prefix="medbot_sf_")}
+    cmd  = ["gunicorn", "-c", "gunicorn.conf.py", "app:app", "-w", str(args.workers),
+            "--threads", str(args.threads), "-b", f"127.0.0.1:{args.port}", "--timeout", "120"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(f"http://127.0.0.1:{args.port}/api/models", timeout=120)
+        while len(children(proc.pid)) < args.workers:
+            time.sleep(0.05)
+        latencies, calls = [], []
+        for i in range(args.bursts):
+            before = httpx.get(f"{stub_url}/stub/stats").json()["completions"]
+            latencies += burst(f"http://127.0.0.1:{args.port}/api/chat", f"{args.message} (burst {i})", args.burst)
+            calls.append(httpx.get(f"{stub_url}/stub/stats").json()["completions"] - before)
+        ms = lambda q: round(percentile(latencies, q) * 1000, 1)
+        return {"llm_calls_per_burst": round(sum(calls) / len(calls), 2), "p50_ms": ms(50), "p99_ms": ms(99)}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers",   type=int, default=4)
+    ap.add_argument("--threads",   type=int, default=4, help="gunicorn threads per worker")
+    ap.add_argument("--burst",     type=int, default=16, help="identical requests per burst")
+    ap.add_argument("--bursts",    type=int, default=5)
+    ap.add_argument("--message",   default="what are the symptoms of diabetes")
+    ap.add_argument("--latency",   type=float, default=0.5, help="stub time to answer (s)")
+    ap.add_argument("--port",      type=int, default=8400)
+    ap.add_argument("--stub-port", type=int, default=8960)
+    ap.add_argument("--json",      help="write the report to this file")
+    args = ap.parse_args()
+
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "stub_llm.py"),
+                             "--port", str(args.stub_port), "--latency", str(args.latency), "--tokens", "40",
+                             "--token-rate", "1e9"], stdout=subprocess.DEVNULL)
+    env = {**os.environ, "GROQ_BASE_URL": stub_url, "GROQ_API_KEY": "stub", "MEDBOT_CACHE": "off",
+           "MEDBOT_PROMPT_LOG": "0"}
+    try:
+        wait_ready(f"{stub_url}/health")
+        report = {"config": vars(args), "modes": {}}
+        print(f"👯 bursts of {args.burst} identical chats, {args.workers} workers × {args.threads} threads, stub {args.latency}s\n")
+        print(f"{'mode':>7} {'LLM calls/burst':>16} {'p50 ms':>8} {'p99 ms':>8}")
+        for mode in MODES:
+            row = report["modes"][mode] = run_mode(mode, args, env, stub_url)
+            print(f"{mode:>7} {row['llm_calls_per_burst']:16.2f} {row['p50_ms']:8.1f} {row['p99_ms']:8.1f}")
+    finally:
+        stub.terminate()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Model start-up benchmark — joblib pickles vs the memory-mapped compact artifact
+==============================================================================
+For each format (MEDBOT_MODEL_FORMAT=pickle | compact):
+  • cold start: fresh interpreter → import + load models + first prediction (ms)
+  • RSS of that interpreter after loading
+  • fork sharing: a parent loads once, forks N "workers" that each classify the
+    INTENTS corpus, and every worker reports its Private (unshared) and PSS memory
+    from /proc/self/smaps_rollup — the per-worker cost that actually adds up.
+
+Linux only (reads /proc). Run after `python train.py`:
+    python benchmarks/bench_startup.py --workers 4
+"""
+import argparse, json, os, subprocess, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+MODELS = os.path.join(ROOT, "models")
+
+
+def load(fmt):
+    """Exactly what app.py does at import for each MEDBOT_MODEL_FORMAT."""
+    if fmt == "compact":
+        from compact_model import load_compact
+        return load_compact(os.path.join(MODELS, "compact"))
+    import joblib
+    return tuple(joblib.load(os.path.join(MODELS, n)) for n in ("best_model.pkl", "label_encoder.pkl", "knowledge.pkl"))
+
+
+def corpus():
+    from knowledge_base import INTENTS
+    return [p for i in INTENTS for p in i["patterns"]]
+
+
+def proc_kb(path, fields):
+    out = {}
+    with open(path) as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in fields:
+                out[key] = int(rest.split()[0])
+    return out
+
+
+def child_cold(fmt):
+    t0 = time.perf_counter()
+    model, _, _ = load(fmt)
+    model.predict_proba(["what is normal blood pressure"])
+    elapsed = time.perf_counter() - t0
+    rss = proc_kb("/proc/self/status", {"VmRSS"})["VmRSS"]
+    print(json.dumps({"cold_start_ms": round(elapsed * 1000, 1), "rss_kb": rss}))
+
+
+def child_fork(fmt, workers):
+    model, _, _ = load(fmt)
+    messages = corpus()
+    pipes = []
+    for _ in range(workers):
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            for m in messages:   # one request at a time, like a sync worker
+                model.predict_proba([m])
+            mem = proc_kb("/proc/self/smaps_rollup", {"Rss", "Pss", "Private_Clean", "Private_Dirty"})
+            os.write(w, json.dumps(mem).encode())
+            os._exit(0)
+        os.close(w)
+        pipes.append((pid, r))
+    reports = []
+    for pid, r in pipes:
+        reports.append(json.loads(os.read(r, 4096)))
+        os.waitpid(pid, 0)
+    avg = lambda k: round(sum(x[k] for x in reports) / len(reports))
+    print(json.dumps({"workers": workers, "worker_rss_kb": avg("Rss"), "worker_pss_kb": avg("Pss"),
+                      "worker_private_kb": avg("Private_Clean") + avg("Private_Dirty")}))
+
+
+def run_child(*args):
+    out = subprocess.run([sys.executable, __file__, "--child", *args], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--formats", nargs="+", default=["pickle", "compact"])
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--repeat",  type=int, default=3)
+    ap.add_argument("--json",    help="write the report to this file")
+    ap.add_argument("--child",   nargs="+", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        mode, fmt, *rest = args.child
+        return child_cold(fmt) if mode == "cold" else child_fork(fmt, int(rest[0]))
+
+    report = {}
+    for fmt in args.formats:
+        colds = [run_child("cold", fmt) for _ in range(args.repeat)]
+        best  = min(colds, key=lambda c: c["cold_start_ms"])
+        report[fmt] = {**best, **run_child("fork", fmt, str(args.workers))}
+        r = report[fmt]
+        print(f"🚀 {fmt:8} cold start {r['cold_start_ms']:7.1f} ms | RSS {r['rss_kb'] / 1024:6.1f} MiB | "
+              f"per worker ({r['workers']}×): private {r['worker_private_kb'] / 1024:5.1f} MiB, "
+              f"PSS {r['worker_pss_kb'] / 1024:5.1f} MiB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
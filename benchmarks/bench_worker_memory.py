@@ -0,0 +1,107 @@
+"""
+Per-worker memory under gunicorn — plain fork vs preload + gc.freeze()
+=====================================================================
+Boots gunicorn with N sync workers in three ways:
+  baseline        → gunicorn app:app, no config            (every worker imports and loads the models)
+  preload         → gunicorn --preload app:app             (master loads once, GC free to touch everything)
+  preload_freeze  → gunicorn -c gunicorn.conf.py app:app   (master loads once, gc.freeze() before fork)
+then warms every worker with classification traffic (so refcount writes and GC
+passes have had their chance to dirty shared pages) and reads
+/proc/<pid>/smaps_rollup for the master and each worker:
+  USS = Private_Clean + Private_Dirty  → memory that would be freed if the worker exited
+  PSS = shared pages split evenly       → fair share; sum(PSS) ≈ real total footprint
+
+Linux only. Run after `python train.py`:
+    python benchmarks/bench_worker_memory.py --workers 4 [--model-format compact]
+"""
+import argparse, json, os, subprocess, sys, time
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from knowledge_base import INTENTS
+
+MODES = {   # "-c /dev/null" skips the auto-loaded ./gunicorn.conf.py
+    "baseline":       ["gunicorn", "-c", "/dev/null", "app:app"],
+    "preload":        ["gunicorn", "-c", "/dev/null", "--preload", "app:app"],
+    "preload_freeze": ["gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+}
+
+
+def smaps(pid):
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                out[key] = int(rest.split()[0])
+    return {"rss_kb": out["Rss"], "pss_kb": out["Pss"], "uss_kb": out["Private_Clean"] + out["Private_Dirty"]}
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def measure(mode, args, env):
+    cmd  = MODES[mode] + ["-w", str(args.workers), "-b", f"127.0.0.1:{args.port}", "--timeout", "120"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{args.port}"
+    try:
+        deadline = time.time() + 120
+        while len(children(proc.pid)) < args.workers or not _up(base):
+            if time.time() > deadline:
+                raise RuntimeError(f"{mode}: gunicorn did not start")
+            time.sleep(0.3)
+
+        patterns = [p for i in INTENTS for p in i["patterns"]]
+        with httpx.Client(timeout=60) as http:   # new connection per round → spread over workers
+            for _ in range(args.rounds):
+                for chunk in range(0, len(patterns), 20):
+                    http.post(f"{base}/api/classify/batch", json={"messages": patterns[chunk:chunk + 20]},
+                              headers={"Connection": "close"})
+        time.sleep(1)
+
+        workers = [smaps(pid) for pid in children(proc.pid)]
+        avg     = lambda k: round(sum(w[k] for w in workers) / len(workers))
+        return {"master": smaps(proc.pid), "workers": len(workers),
+                "worker_uss_kb": avg("uss_kb"), "worker_pss_kb": avg("pss_kb"), "worker_rss_kb": avg("rss_kb"),
+                "total_pss_kb": smaps(proc.pid)["pss_kb"] + sum(w["pss_kb"] for w in workers)}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def _up(base):
+    try:
+        return httpx.get(f"{base}/api/models", timeout=1).status_code == 200
+    except httpx.HTTPError:
+        return False
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers",      type=int, default=4)
+    ap.add_argument("--rounds",       type=int, default=5, help="passes over the INTENTS corpus")
+    ap.add_argument("--port",         type=int, default=8200)
+    ap.add_argument("--model-format", default=os.environ.get("MEDBOT_MODEL_FORMAT", "pickle"))
+    ap.add_argument("--json",         help="write the report to this file")
+    args = ap.parse_args()
+
+    env    = {**os.environ, "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "bench"),
+              "MEDBOT_MODEL_FORMAT": args.model_format}
+    report = {}
+    for mode in MODES:
+        r = report[mode] = measure(mode, args, env)
+        print(f"🧠 {mode:14} ({r['workers']} workers, {args.model_format}) "
+              f"per worker: USS {r['worker_uss_kb'] / 1024:6.1f} MiB | PSS {r['worker_pss_kb'] / 1024:6.1f} MiB | "
+              f"RSS {r['worker_rss_kb'] / 1024:6.1f} MiB   total PSS {r['total_pss_kb'] / 1024:6.1f} MiB")
+    saved = report["baseline"]["total_pss_kb"] - report["preload_freeze"]["total_pss_kb"]
+    print(f"\n💾 preload + gc.freeze saves {saved / 1024:.1f} MiB in total across {args.workers} workers")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+MedBot load test — sync (gunicorn app:app) vs async (uvicorn asgi:app)
+======================================================================
+Starts the local stub LLM (benchmarks/stub_llm.py), boots one server process
+per mode pointed at it, and drives POST /api/chat at increasing concurrency.
+For every level it reports throughput, p50/p99 latency and error/503 counts,
+then the highest concurrency each mode sustained within the p99 SLO.
+
+Every request must reach the LLM: the response cache, single-flight and the
+knowledge-base fast path are off (as in suite.py), and each virtual user keeps
+one conversation session instead of starting a new one per request.
+
+Run:  python benchmarks/load_test.py --levels 1 8 32 128 --duration 10 --latency 0.5
+"""
+import argparse, asyncio, json, os, random, subprocess, sys, time
+from collections import Counter
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from knowledge_base import INTENTS
+
+SERVERS = {
+    "sync":  lambda port, workers: ["gunicorn", "app:app", "-w", str(workers), "-b", f"127.0.0.1:{port}",
+                                    "--timeout", "120"],
+    "async": lambda port, workers: ["uvicorn", "asgi:app", "--workers", str(workers), "--port", str(port),
+                                    "--log-level", "warning"],
+}
+
+
+def corpus():
+    return [p for i in INTENTS for p in i["patterns"]]
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def wait_ready(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def drive(url, concurrency, duration, messages, timeout):
+    """Keep `concurrency` chats in flight for `duration` seconds; return per-request samples."""
+    samples, routes = [], Counter()
+    limits  = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as http:
+        stop = time.perf_counter() + duration
+
+        async def user():
+            session = None
+            while time.perf_counter() < stop:
+                t0   = time.perf_counter()
+                body = {"message": random.choice(messages), **({"session_id": session} if session else {})}
+                try:
+                    r = await http.post(url, json=body)
+                    status = r.status_code if "Something went wrong" not in r.text else 599
+                    if status == 200:
+                        reply   = r.json()
+                        session = reply.get("session_id") or session
+                        routes[reply.get("route") or "-"] += 1
+                except (httpx.HTTPError, ValueError):
+                    status = 0
+                samples.append((status, time.perf_counter() - t0))
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    return samples, routes, time.perf_counter() - t0
+
+
+def summarize(samples, elapsed):
+    ok = [lat for status, lat in samples if status == 200]
+    return {
+        "requests":   len(samples),
+        "ok":         len(ok),
+        "shed_503":   sum(1 for s, _ in samples if s == 503),
+        "errors":     sum(1 for s, _ in samples if s not in (200, 503)),
+        "throughput": round(len(ok) / elapsed, 2),
+        "p50_ms":     round(percentile(ok, 50) * 1000, 1) if ok else None,
+        "p99_ms":     round(percentile(ok, 99) * 1000, 1) if ok else None,
+    }
+
+
+def run_mode(mode, args, env):
+    port = args.port + (1 if mode == "async" else 0)
+    proc = subprocess.Popen(SERVERS[mode](port, args.workers), cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(f"http://127.0.0.1:{port}/api/models")
+        levels = []
+        for c in args.levels:
+            samples, routes, elapsed = asyncio.run(drive(f"http://127.0.0.1:{port}/api/chat", c, args.duration,
+                                                 corpus(), args.timeout))
+            row = {"concurrency": c, **summarize(samples, elapsed), "routes": dict(routes)}
+            levels.append(row)
+            print(f"  {mode:5} c={c:<4} {row['throughput']:>8} req/s  p50 {row['p50_ms']} ms  "
+                  f"p99 {row['p99_ms']} ms  503 {row['shed_503']}  err {row['errors']}  "
+                  f"{' '.join(f'{k}={v}' for k, v in sorted(routes.items()))}")
+        return levels
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def sustained(levels, slo_ms):
+    good = [r["concurrency"] for r in levels
+            if r["errors"] == 0 and r["shed_503"] == 0 and r["p99_ms"] is not None and r["p99_ms"] <= slo_ms]
+    return max(good, default=0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--modes",      nargs="+", default=["sync", "async"], choices=list(SERVERS))
+    ap.add_argument("--levels",     nargs="+", type=int, default=[1, 8, 32, 128])
+    ap.add_argument("--duration",   type=float, default=10)
+    ap.add_argument("--workers",    type=int, default=1, help="server processes per mode")
+    ap.add_argument("--port",       type=int, default=8100)
+    ap.add_argument("--stub-port",  type=int, default=8900)
+    ap.add_argument("--latency",    type=float, default=0.5, help="stub time-to-first-token (s)")
+    ap.add_argument("--tokens",     type=int, default=120)
+    ap.add_argument("--token-rate", type=float, default=400)
+    ap.add_argument("--timeout",    type=float, default=60)
+    ap.add_argument("--slo-ms",     type=float, default=3000, help="p99 bound for 'sustained'")
+    ap.add_argument("--json",       help="write the report to this file")
+    args = ap.parse_args()
+
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "stub_llm.py"),
+                             "--port", str(args.stub_port), "--latency", str(args.latency),
+                             "--tokens", str(args.tokens), "--token-rate", str(args.token_rate)],
+                            stdout=subprocess.DEVNULL)
+    env = {**os.environ, "GROQ_BASE_URL": f"http://127.0.0.1:{args.stub_port}", "GROQ_API_KEY": "stub",
+           "MEDBOT_CACHE": "off", "MEDBOT_SINGLEFLIGHT": "off", "MEDBOT_FASTPATH": "off", "MEDBOT_PROMPT_LOG": "0"}
+    try:
+        wait_ready(f"http://127.0.0.1:{args.stub_port}/health")
+        report = {"config": vars(args), "modes": {}}
+        for mode in args.modes:
+            print(f"\n📈 {mode} ({args.workers} process)")
+            levels = run_mode(mode, args, env)
+            report["modes"][mode] = {"levels": levels, "sustained_concurrency": sustained(levels, args.slo_ms)}
+    finally:
+        stub.terminate()
+
+    print("\n🏁 Sustained concurrent chats per process (no errors, p99 ≤ %d ms):" % args.slo_ms)
+    for mode, r in report["modes"].items():
+        print(f"   {mode:5} → {r['sustained_concurrency']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Local stand-in for the Groq chat-completions API
+================================================
+Speaks just enough of the OpenAI-compatible protocol that `groq.Groq` uses
+(POST /openai/v1/chat/completions, blocking or `stream=True`), with a
+configurable time-to-first-token and token rate, so app.py can be load-tested
+without network access or an API key.
+
+Fault injection: --slow-rate of the requests wait --slow-latency extra seconds
+and --fail-rate of them answer 500. --capacity caps the completions served at
+once, like a provider's concurrency limit: the others wait for a free slot. POST /stub/config with a JSON object of the
+same fields (e.g. {"fail_rate": 1}) changes them while the stub runs.
+GET /stub/stats returns how many completions were requested so far.
+
+Run:  python benchmarks/stub_llm.py --port 8900 --latency 0.5 --tokens 120 --token-rate 200
+Then: GROQ_BASE_URL=http://127.0.0.1:8900 GROQ_API_KEY=stub gunicorn app:app
+"""
+import argparse, json, random, threading, time, uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORD = "health "
+
+
+class StubConfig:
+    latency      = 0.5     # seconds before the first token
+    tokens       = 120     # completion length in tokens
+    token_rate   = 200.0   # tokens per second after the first one
+    slow_rate    = 0.0     # share of requests that get slow_latency on top
+    slow_latency = 0.0
+    fail_rate    = 0.0     # share of requests answered with HTTP 500
+    capacity     = 0       # completions served at once, 0 = unlimited
+    active       = 0
+    completions  = 0       # requests served so far (GET /stub/stats)
+
+
+COUNTER_LOCK = threading.Lock()
+SLOTS        = threading.Condition()
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = StubConfig
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/stub/stats":
+            return self._send_json(200, {"completions": self.config.completions})
+        self._send_json(200, {"status": "ok"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        cfg  = self.config
+        if self.path == "/stub/config":
+            for key, value in body.items():
+                if hasattr(StubConfig, key):
+                    setattr(cfg, key, type(getattr(StubConfig, key))(value))
+            with SLOTS:
+                SLOTS.notify_all()   # a raised capacity lets waiting completions through
+            return self._send_json(200, {k: getattr(cfg, k) for k in vars(StubConfig) if not k.startswith("_")})
+        if not self.path.endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "not found"}})
+        with COUNTER_LOCK:
+            cfg.completions += 1
+        with SLOTS:
+            SLOTS.wait_for(lambda: not cfg.capacity or cfg.active < cfg.capacity)
+            cfg.active += 1
+        try:
+            self._complete(body, cfg)
+        finally:
+            with SLOTS:
+                cfg.active -= 1
+                SLOTS.notify()
+
+    def _complete(self, body, cfg):
+        time.sleep(cfg.latency + (cfg.slow_latency if random.random() < cfg.slow_rate else 0))
+        if random.random() < cfg.fail_rate:
+            return self._send_json(500, {"error": {"message": "injected failure", "type": "internal_server_error"}})
+        if body.get("stream"):
+            return self._stream(body, cfg)
+
+        time.sleep(cfg.tokens / cfg.token_rate)
+        self._send_json(200, {
+            "id":      f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object":  "chat.completion",
+            "created": int(time.time()),
+            "model":   body.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": WORD * cfg.tokens}}],
+            "usage":   {"prompt_tokens": 0, "completion_tokens": cfg.tokens, "total_tokens": cfg.tokens},
+        })
+
+    def _stream(self, body, cfg):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        for i in range(cfg.tokens):
+            if i:
+                time.sleep(1 / cfg.token_rate)
+            chunk = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": body.get("model", "stub"),
+                     "choices": [{"index": 0, "delta": {"content": WORD}, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads     = True
+    request_queue_size = 1024   # the default of 5 resets connections under load-test bursts
+
+    def handle_error(self, request, client_address):
+        pass   # clients that time out and hang up are expected (bench_resilience.py)
+
+
+def serve(port=8900, latency=0.5, tokens=120, token_rate=200.0, background=False,
+          slow_rate=0.0, slow_latency=0.0, fail_rate=0.0, capacity=0):
+    """Start the stub server; with background=True return it running on a daemon thread."""
+    config = type("Config", (StubConfig,), {"latency": latency, "tokens": tokens, "token_rate": token_rate,
+                                            "slow_rate": slow_rate, "slow_latency": slow_latency,
+                                            "fail_rate": fail_rate, "capacity": capacity})
+    handler = type("Handler", (StubLLMHandler,), {"config": config})
+    server = StubServer(("127.0.0.1", port), handler)
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    print(f"🧪 Stub LLM on http://127.0.0.1:{port} | latency {latency}s | {tokens} tokens @ {token_rate}/s")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port",         type=int,   default=8900)
+    ap.add_argument("--latency",      type=float, default=0.5)
+    ap.add_argument("--tokens",       type=int,   default=120)
+    ap.add_argument("--token-rate",   type=float, default=200.0)
+    ap.add_argument("--slow-rate",    type=float, default=0.0)
+    ap.add_argument("--slow-latency", type=float, default=0.0)
+    ap.add_argument("--fail-rate",    type=float, default=0.0)
+    ap.add_argument("--capacity",     type=int,   default=0)
+    a = ap.parse_args()
+    serve(a.port, a.latency, a.tokens, a.token_rate, slow_rate=a.slow_rate, slow_latency=a.slow_latency,
+          fail_rate=a.fail_rate, capacity=a.capacity)
@@ -0,0 +1,236 @@
+"""
+MedBot end-to-end benchmark suite — one reproducible JSON report per commit
+==========================================================================
+Boots the local stub LLM (benchmarks/stub_llm.py) and gunicorn with app.py
+pointed at it, then measures:
+  startup     → seconds from launch until every worker is up and /api/models answers
+  chat        → POST /api/chat at each --levels concurrency (session-less messages)
+  models      → GET /api/models at each concurrency
+  memory      → RSS / PSS / USS of the master and each worker after the load
+  classifier  → app.detect_intent() called directly from 1..N threads (in-process)
+Throughput and p50/p95/p99 latency are reported per scenario and level.
+
+Messages are sampled from INTENTS patterns, a share of them with synthetic
+typos (swapped, dropped or doubled letters), from a fixed --seed, so two runs
+on different commits replay the same traffic. The response cache is off by
+default so every chat is classified and either answered from the knowledge
+base or sent to the stub.
+
+    python benchmarks/suite.py --json bench.json
+    python benchmarks/suite.py --json new.json --baseline bench.json   # exit 1 on regression
+
+Linux only (reads /proc). Run after `python train.py`.
+"""
+import argparse, asyncio, json, os, platform, random, subprocess, sys, time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+from knowledge_base import INTENTS
+from load_test import percentile, wait_ready
+from bench_worker_memory import smaps, children
+
+
+# ── Corpus ──────────────────────────────────────────────────────────────────────
+def typo(text: str, rng: random.Random) -> str:
+    if len(text) < 4:
+        return text
+    i    = rng.randrange(len(text) - 1)
+    kind = rng.choice(("swap", "drop", "double"))
+    if kind == "swap":
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    if kind == "drop":
+        return text[:i] + text[i + 1:]
+    return text[:i] + text[i] + text[i:]
+
+
+def make_corpus(n: int, typo_rate: float, seed: int) -> list:
+    rng      = random.Random(seed)
+    patterns = [p for i in INTENTS for p in i["patterns"]]
+    return [typo(p, rng) if rng.random() < typo_rate else p for p in (rng.choice(patterns) for _ in range(n))]
+
+
+# ── Load driver ─────────────────────────────────────────────────────────────────
+def latency_summary(ok: list, elapsed: float) -> dict:
+    pct = lambda q: round(percentile(ok, q) * 1000, 2) if ok else None
+    return {"throughput": round(len(ok) / elapsed, 2), "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99)}
+
+
+async def drive(method: str, url: str, concurrency: int, duration: float, messages: list, seed: int):
+    """Keep `concurrency` requests in flight for `duration` seconds."""
+    samples, routes = [], Counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as http:
+        stop = time.perf_counter() + duration
+
+        async def user(rng):
+            while time.perf_counter() < stop:
+                t0 = time.perf_counter()
+                try:
+                    if method == "GET":
+                        r = await http.get(url)
+                    else:
+                        r = await http.post(url, json={"message": rng.choice(messages)})
+                        routes[r.json().get("route", "none") if r.status_code == 200 else "none"] += 1
+                    status = r.status_code if "Something went wrong" not in r.text else 599
+                except httpx.HTTPError:
+                    status = 0
+                samples.append((status, time.perf_counter() - t0))
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(user(random.Random(seed * 1000 + i)) for i in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    ok      = [lat for status, lat in samples if status == 200]
+    return {"concurrency": concurrency, "requests": len(samples), "errors": len(samples) - len(ok),
+            **latency_summary(ok, elapsed), **({"routes": dict(routes)} if routes else {})}
+
+
+# ── Scenarios ───────────────────────────────────────────────────────────────────
+def run_server(args, env, messages) -> dict:
+    cmd  = ["gunicorn", "-c", "gunicorn.conf.py", "app:app", "-w", str(args.workers),
+            "-b", f"127.0.0.1:{args.port}", "--timeout", "120"]
+    base = f"http://127.0.0.1:{args.port}"
+    t0   = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(f"{base}/api/models", timeout=120)
+        while len(children(proc.pid)) < args.workers:
+            time.sleep(0.05)
+        report = {"startup_s": round(time.perf_counter() - t0, 3)}
+        print(f"🚀 gunicorn, {args.workers} worker(s) ready in {report['startup_s']:.2f} s")
+
+        for name, method, path in (("chat", "POST", "/api/chat"), ("models", "GET", "/api/models")):
+            report[name] = []
+            for c in args.levels:
+                row = asyncio.run(drive(method, base + path, c, args.duration, messages, args.seed))
+                report[name].append(row)
+                print(f"   {name:6} c={c:<4} {row['throughput']:>9} req/s  p50 {row['p50_ms']} ms  "
+                      f"p95 {row['p95_ms']} ms  p99 {row['p99_ms']} ms  err {row['errors']}")
+
+        workers = [smaps(pid) for pid in children(proc.pid)]
+        report["memory"] = {"master": smaps(proc.pid), "workers": workers,
+                            "worker_rss_kb": round(sum(w["rss_kb"] for w in workers) / len(workers)),
+                            "worker_uss_kb": round(sum(w["uss_kb"] for w in workers) / len(workers))}
+        print(f"🧠 per worker: RSS {report['memory']['worker_rss_kb'] / 1024:.1f} MiB | "
+              f"USS {report['memory']['worker_uss_kb'] / 1024:.1f} MiB")
+        return report
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run_classifier(args, messages) -> list:
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    import app
+    app.detect_intents(messages[:10])   # warm-up
+    rows = []
+    for c in args.levels:
+        latencies = []
+
+        def classify(message):
+            t0 = time.perf_counter()
+            app.detect_intent(message)
+            latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(c) as pool:
+            list(pool.map(classify, messages[:args.classify_messages]))
+        row = {"concurrency": c, "requests": len(latencies), **latency_summary(latencies, time.perf_counter() - t0)}
+        rows.append(row)
+        print(f"   classify c={c:<4} {row['throughput']:>9} msg/s  p50 {row['p50_ms']} ms  p99 {row['p99_ms']} ms")
+    return rows
+
+
+# ── Regression check ────────────────────────────────────────────────────────────
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Human-readable regressions beyond `tolerance` (relative) against a previous report."""
+    out = []
+
+    def check(label, new, old, higher_is_worse):
+        if new is None or old in (None, 0):
+            return
+        change = new / old - 1
+        if (change if higher_is_worse else -change) > tolerance:
+            out.append(f"{label}: {old} → {new} ({change:+.0%})")
+
+    check("startup_s", report["server"]["startup_s"], baseline["server"]["startup_s"], True)
+    check("worker_rss_kb", report["server"]["memory"]["worker_rss_kb"],
+          baseline["server"]["memory"]["worker_rss_kb"], True)
+    for scenario in ("chat", "models", "classifier"):
+        new_rows = report["server"].get(scenario) if scenario != "classifier" else report["classifier"]
+        old_rows = baseline["server"].get(scenario) if scenario != "classifier" else baseline["classifier"]
+        old_by_c = {r["concurrency"]: r for r in old_rows or []}
+        for row in new_rows or []:
+            old = old_by_c.get(row["concurrency"])
+            if old:
+                check(f"{scenario} c={row['concurrency']} throughput", row["throughput"], old["throughput"], False)
+                check(f"{scenario} c={row['concurrency']} p99_ms", row["p99_ms"], old["p99_ms"], True)
+    return out
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--levels",            nargs="+", type=int, default=[1, 4, 16])
+    ap.add_argument("--duration",          type=float, default=5, help="seconds per HTTP level")
+    ap.add_argument("--workers",           type=int, default=2)
+    ap.add_argument("--messages",          type=int, default=2000, help="corpus size")
+    ap.add_argument("--typo-rate",         type=float, default=0.3)
+    ap.add_argument("--classify-messages", type=int, default=1000, help="messages per classifier level")
+    ap.add_argument("--seed",              type=int, default=0)
+    ap.add_argument("--port",              type=int, default=8300)
+    ap.add_argument("--stub-port",         type=int, default=8940)
+    ap.add_argument("--latency",           type=float, default=0.2, help="stub time-to-first-token (s)")
+    ap.add_argument("--tokens",            type=int, default=120)
+    ap.add_argument("--token-rate",        type=float, default=400)
+    ap.add_argument("--cache",             default="off", help="MEDBOT_CACHE for the server")
+    ap.add_argument("--json",              help="write the report to this file")
+    ap.add_argument("--baseline",          help="previous report to compare against")
+    ap.add_argument("--tolerance",         type=float, default=0.15, help="relative change counted as regression")
+    args = ap.parse_args()
+
+    messages = make_corpus(args.messages, args.typo_rate, args.seed)
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "stub_llm.py"),
+                             "--port", str(args.stub_port), "--latency", str(args.latency),
+                             "--tokens", str(args.tokens), "--token-rate", str(args.token_rate)],
+                            stdout=subprocess.DEVNULL)
+    env = {**os.environ, "GROQ_BASE_URL": f"http://127.0.0.1:{args.stub_port}", "GROQ_API_KEY": "stub",
+           "MEDBOT_CACHE": args.cache, "MEDBOT_PROMPT_LOG": "0"}
+    try:
+        wait_ready(f"http://127.0.0.1:{args.stub_port}/health")
+        server = run_server(args, env, messages)
+    finally:
+        stub.terminate()
+
+    print("🔬 classifier, in-process")
+    report = {"commit": git_commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+              "config": vars(args), "server": server, "classifier": run_classifier(args, messages)}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 report → {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        print(f"\n📊 vs {args.baseline} (commit {baseline.get('commit')}, tolerance {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"   ⚠️  {line}")
+        if regressions:
+            sys.exit(1)
+        print("   ✅ no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+MedBot — Cost-aware Stage 1 cascade (Naive Bayes first, escalate when unsure)
+============================================================================
+The calibrated SVM is the most accurate Stage 1 model but also the slowest to
+score (three LinearSVC heads + their calibrators per message). MultinomialNB
+scores the same TF-IDF rows with one matrix product. The cascade lets NB answer
+every message whose top-2 probability margin is at least `margin`, and only
+re-scores the rest with the escalation target:
+
+    best     → the production model (best_model.pkl)
+    ensemble → the mean of the NB, LR and SVM probabilities
+
+train.py picks the target and the margin from out-of-fold probabilities: the
+smallest margin (least traffic escalated) whose cascade accuracy stays within
+--cascade-tolerance of the best single model, saved under "cascade" in
+model_meta.json. All tfidf candidates share one fitted vectorizer, so the
+cascade scores the rows app.vectorize() already produced.
+
+NB's probabilities are much sharper than the calibrated SVM's, and the
+ensemble's sharper too, while the routing thresholds (fast path, LLM hints, KB
+fallbacks) are set on the best model's scale, whichever target escalation
+uses. train.py records quantile maps from the first model's top probability
+("confidence_map") and, with the ensemble target, from the ensemble's
+("escalate_map") to the best model's; gate() puts every row on the best
+model's scale before any threshold sees it.
+
+Config (environment):
+  MEDBOT_CASCADE         1 → classify with the cascade (tfidf engine, pickle format only) (default 0)
+  MEDBOT_CASCADE_MARGIN  override the trained escalation margin
+"""
+
+import os, threading
+import numpy as np
+
+
+def top2_margin(proba: np.ndarray) -> np.ndarray:
+    """Top-1 minus top-2 probability of every row."""
+    top2 = np.partition(proba, -2, axis=1)[:, -2:]
+    return top2[:, 1] - top2[:, 0]
+
+
+# ── Tuning (train.py) ─────────────────────────────────────────────────────────
+def escalation_curve(first: np.ndarray, escalate: np.ndarray, y: np.ndarray):
+    """
+    (margins, accuracy, escalated share) for every distinct threshold: escalating
+    the rows whose `first` margin is below margins[i] gives accuracy[i].
+    """
+    margin  = top2_margin(first)
+    order   = np.argsort(margin, kind="stable")
+    m       = margin[order]
+    right   = (first.argmax(axis=1) == y)[order]
+    gain    = (escalate.argmax(axis=1) == y)[order].astype(int) - right
+    correct = right.sum() + np.concatenate([[0], np.cumsum(gain)])   # [k] = k lowest-margin rows escalated
+    cut     = np.flatnonzero(np.diff(m) > 0) + 1                       # where the margin changes
+    k       = np.concatenate([[0], cut, [len(m)]])
+    margins = np.concatenate([[0.0], (m[cut - 1] + m[cut]) / 2, [m[-1] + 1e-6]])
+    return margins, correct[k] / len(y), k / len(y)
+
+
+def confidence_map(first: np.ndarray, target: np.ndarray, points: int = 101) -> dict:
+    """Quantiles of two models' top probabilities: np.interp(p, first, target) maps `first`'s scale onto `target`'s."""
+    q = np.linspace(0, 1, points)
+    return {"first":  np.round(np.quantile(first.max(axis=1), q), 6).tolist(),
+            "target": np.round(np.quantile(target.max(axis=1), q), 6).tolist()}
+
+
+def tune_cascade(oof: dict, y: np.ndarray, first: str, best: str, tolerance: float) -> dict:
+    """
+    oof: candidate name → out-of-fold probabilities (n, classes). Returns the
+    model_meta["cascade"] entry: escalation target, margin and the OOF accuracy
+    and escalated share it gives, next to the best single model's accuracy, and
+    the confidence maps onto the best model's scale (first → best, and
+    ensemble → best when the ensemble is the target).
+    """
+    best_acc = float(np.mean(oof[best].argmax(axis=1) == y))
+    targets  = {"best": oof[best], "ensemble": np.mean(list(oof.values()), axis=0)}
+    options  = {}
+    for target, proba in targets.items():
+        margins, acc, share = escalation_curve(oof[first], proba, y)
+        ok = np.flatnonzero(acc >= best_acc - tolerance)
+        i  = ok[0] if len(ok) else int(np.argmax(acc))
+        options[target] = {"margin": round(float(margins[i]), 6), "accuracy": round(float(acc[i]), 4),
+                           "escalation_rate": round(float(share[i]), 4), "within_tolerance": bool(len(ok))}
+    pick = min(options, key=lambda t: (not options[t]["within_tolerance"], options[t]["escalation_rate"],
+                                       -options[t]["accuracy"]))
+    spec = {"first": first, "target": pick, "tolerance": tolerance, "best_accuracy": round(best_acc, 4),
+            "first_accuracy": round(float(np.mean(oof[first].argmax(axis=1) == y)), 4),
+            **options[pick], "options": options, "confidence_map": confidence_map(oof[first], oof[best])}
+    if pick == "ensemble":
+        spec["escalate_map"] = confidence_map(targets["ensemble"], oof[best])
+    return spec
+
+
+# ── Serving (app.py) ──────────────────────────────────────────────────────────
+class Cascade:
+    """predict_proba(X) → (proba, model name per row) on vectorized rows."""
+
+    def __init__(self, first, escalate: list, margin: float, first_name: str, escalate_name: str,
+                 blend_first: bool = False, confidence_map: dict = None, escalate_map: dict = None):
+        self.first         = first        # classifier (no vectorizer)
+        self.escalate      = escalate     # classifiers whose probabilities are averaged
+        self.blend_first   = blend_first  # ensemble: average the first model's probabilities in too
+        self.margin        = margin
+        self.first_name    = first_name
+        self.escalate_name = escalate_name
+        self.scale         = confidence_map   # {"first": [...], "target": [...]} top-probability quantiles
+        self.escalate_map  = escalate_map     # the same for escalated rows, when they are not on the best model's scale
+        self.messages      = 0
+        self.escalated     = 0
+        self._lock         = threading.Lock()
+
+    @classmethod
+    def from_env(cls, meta: dict, load_model):
+        """None unless MEDBOT_CASCADE=1 and train.py recorded a cascade; loads the pickles it names."""
+        if os.environ.get("MEDBOT_CASCADE", "0") != "1":
+            return None
+        spec     = meta.get("cascade")
+        ensemble = spec is not None and spec["target"] == "ensemble"
+        if spec is None or "confidence_map" not in spec or (ensemble and "escalate_map" not in spec):
+            print("⚠️  MEDBOT_CASCADE=1 but model_meta.json has no cascade (or not its confidence maps) — "
+                  "re-run train.py; using the single model")
+            return None
+        files    = spec["files"]
+        names    = [n for n in files if n != spec["first"]] if ensemble else [meta["best_model"]]
+        margin   = float(os.environ.get("MEDBOT_CASCADE_MARGIN", spec["margin"]))
+        return cls(load_model(files[spec["first"]])[-1], [load_model(files[n])[-1] for n in names], margin,
+                   spec["first"], "Ensemble (NB + LR + SVM)" if ensemble else meta["best_model"], ensemble,
+                   spec["confidence_map"], spec.get("escalate_map"))
+
+    def predict_proba(self, X):
+        proba = self.first.predict_proba(X)
+        low   = np.flatnonzero(top2_margin(proba) < self.margin)
+        if len(low):
+            rows       = X[low]
+            scores     = [clf.predict_proba(rows) for clf in self.escalate]
+            proba[low] = np.mean(scores + [proba[low]] * self.blend_first, axis=0)
+        with self._lock:
+            self.messages  += X.shape[0]
+            self.escalated += len(low)
+        used = np.full(X.shape[0], self.first_name, dtype=object)
+        used[low] = self.escalate_name
+        return proba, used.tolist()
+
+    def gate(self, p: np.ndarray, used: list) -> np.ndarray:
+        """Probabilities `p` (one per row, any shape (n, ...)) with every row mapped onto the best model's scale."""
+        p     = np.array(p, dtype=float)
+        first = np.asarray(used) == self.first_name
+        for rows, scale in ((first, self.scale), (~first, self.escalate_map)):
+            if scale is not None and rows.any():
+                p[rows] = np.interp(p[rows], scale["first"], scale["target"])
+        return p
+
+    def stats(self) -> dict:
+        return {"first": self.first_name, "escalate_to": self.escalate_name, "margin": self.margin,
+                "messages": self.messages, "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / self.messages, 4) if self.messages else 0.0}
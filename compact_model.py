@@ -0,0 +1,262 @@
+"""
+MedBot — Compact, memory-mapped model artifact
+==============================================
+Pickled scikit-learn pipelines are rebuilt object by object in every gunicorn
+worker: a Python dict for the TF-IDF vocabulary, float64 coefficient matrices,
+three calibrated SVMs. This module exports the fitted production pipeline as
+flat arrays and serves predictions straight from read-only memory maps, so
+workers share the same page-cache pages after fork and start in milliseconds.
+
+models/compact/
+  meta.json        → format version, classifier kind, analyzer settings, fallback tag
+  vocab.npy        → sorted fixed-width unicode array of n-grams   (searchsorted lookup)
+  columns.npy      → int32 feature column for each sorted vocab entry
+  idf.npy          → float32 idf vector
+  coef.npy         → float32 (n_heads, n_features, n_classes) — transposed for row gathers
+  intercept.npy    → float32 (n_heads, n_classes)
+  calib_a/b.npy    → float32 sigmoid calibration per head and class (calibrated SVM only)
+  present.npy      → bool (n_heads, n_classes): class seen by that calibration fold
+  labels.npy       → intent tag per probability column
+  responses.bin    → every knowledge-base response, UTF-8, back to back
+  responses.npy    → int64 byte offsets into responses.bin (n_responses + 1)
+  intents.json     → {tag: [first_response, count]}
+                     (the last three are left out when app.py reads responses
+                     from the SQLite store, MEDBOT_KNOWLEDGE=sqlite)
+
+Supported classifiers: CalibratedClassifierCV(LinearSVC) with sigmoid
+calibration, LogisticRegression and MultinomialNB, each behind a char_wb
+TfidfVectorizer — i.e. every candidate train.py produces.
+"""
+
+import os, re, json, mmap
+from collections.abc import Mapping
+import numpy as np
+
+FORMAT_VERSION = 1
+RESPONSE_FILES = ("responses.bin", "responses.npy", "intents.json")
+_WHITE_SPACES  = re.compile(r"\s\s+")
+
+
+# ── Export (train.py) ───────────────────────────────────────────────────────────
+def _heads(clf, n_classes: int) -> dict:
+    """Flatten the fitted classifier into per-head linear arrays."""
+    name = type(clf).__name__
+    if name == "CalibratedClassifierCV" and clf.method == "sigmoid":
+        coefs, intercepts, a, b, present = [], [], [], [], []
+        for cc in clf.calibrated_classifiers_:
+            est  = cc.estimator
+            cols = np.searchsorted(cc.classes, est.classes_)
+            coef = np.zeros((est.coef_.shape[1], n_classes)); coef[:, cols] = est.coef_.T
+            inter = np.zeros(n_classes);  inter[cols] = est.intercept_
+            ca    = np.zeros(n_classes);  ca[cols]    = [c.a_ for c in cc.calibrators]
+            cb    = np.zeros(n_classes);  cb[cols]    = [c.b_ for c in cc.calibrators]
+            mask  = np.zeros(n_classes, dtype=bool); mask[cols] = True
+            coefs.append(coef); intercepts.append(inter); a.append(ca); b.append(cb); present.append(mask)
+        return {"kind": "calibrated_svm", "coef": np.stack(coefs), "intercept": np.stack(intercepts),
+                "calib_a": np.stack(a), "calib_b": np.stack(b), "present": np.stack(present)}
+    if name == "LogisticRegression":
+        return {"kind": "logistic", "coef": clf.coef_.T[None], "intercept": clf.intercept_[None]}
+    if name == "MultinomialNB":
+        return {"kind": "naive_bayes", "coef": clf.feature_log_prob_.T[None], "intercept": clf.class_log_prior_[None]}
+    raise ValueError(f"compact export does not support {name}")
+
+
+def export_responses(intent_map, out_dir: str):
+    """
+    Knowledge base: one contiguous UTF-8 blob + offsets, written as it is read
+    (see ResponseBlob). intent_map is a {tag: [responses]} mapping or any
+    iterable of (tag, [responses]) pairs, e.g. KnowledgeStore.iter_items().
+    """
+    items = intent_map.items() if isinstance(intent_map, Mapping) else intent_map
+    index, offsets = {}, [0]
+    with open(os.path.join(out_dir, "responses.bin"), "wb") as f:
+        for tag, responses in items:
+            index[tag] = [len(offsets) - 1, len(responses)]
+            for r in responses:
+                offsets.append(offsets[-1] + f.write(r.encode("utf-8")))
+    np.save(os.path.join(out_dir, "responses.npy"), np.array(offsets, dtype=np.int64))
+    with open(os.path.join(out_dir, "intents.json"), "w") as f:
+        json.dump(index, f)
+
+
+def export_compact(pipe, label_encoder, intent_map, fallback: str, out_dir: str):
+    """
+    Write the fitted TF-IDF pipeline + knowledge base as a memory-mappable
+    directory; intent_map=None → the model only (stale response files are removed).
+    """
+    tfidf, clf = pipe.named_steps["tfidf"], pipe.named_steps["clf"]
+    if tfidf.analyzer != "char_wb" or tfidf.strip_accents or not tfidf.lowercase or tfidf.norm != "l2":
+        raise ValueError("compact export expects a lowercase, l2-normalized char_wb TfidfVectorizer")
+    if len(clf.classes_) < 3:
+        raise ValueError("compact export expects a multi-class model")
+
+    os.makedirs(out_dir, exist_ok=True)
+    save = lambda name, arr: np.save(os.path.join(out_dir, name), arr)
+
+    terms = sorted(tfidf.vocabulary_)
+    save("vocab.npy",   np.array(terms))
+    save("columns.npy", np.array([tfidf.vocabulary_[t] for t in terms], dtype=np.int32))
+    save("idf.npy",     tfidf.idf_.astype(np.float32))
+
+    heads = _heads(clf, len(clf.classes_))
+    for key in ("coef", "intercept", "calib_a", "calib_b"):
+        if key in heads:
+            save(f"{key}.npy", np.ascontiguousarray(heads[key], dtype=np.float32))
+    if "present" in heads:
+        save("present.npy", heads["present"])
+    save("labels.npy", label_encoder.classes_[clf.classes_])
+    if intent_map is not None:
+        export_responses(intent_map, out_dir)
+    else:
+        for name in RESPONSE_FILES:
+            if os.path.exists(os.path.join(out_dir, name)):
+                os.remove(os.path.join(out_dir, name))
+
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump({"format": FORMAT_VERSION, "kind": heads["kind"], "fallback": fallback,
+                   "ngram_range": list(tfidf.ngram_range), "sublinear_tf": bool(tfidf.sublinear_tf),
+                   "n_features": int(len(tfidf.idf_)), "n_classes": int(len(clf.classes_))}, f, indent=2)
+
+
+# ── Inference (app.py) ──────────────────────────────────────────────────────────
+def char_wb_ngrams(text: str, min_n: int, max_n: int) -> list:
+    """Same n-grams as TfidfVectorizer(analyzer="char_wb") on already-lowercased text."""
+    ngrams = []
+    for w in _WHITE_SPACES.sub(" ", text).split():
+        w = f" {w} "
+        for n in range(min_n, max_n + 1):
+            if len(w) <= n:
+                ngrams.append(w)   # a short word is counted once
+                break
+            ngrams.extend(w[i:i + n] for i in range(len(w) - n + 1))
+    return ngrams
+
+
+class CompactModel:
+    """Duck-types the parts of the sklearn Pipeline that app.py uses (classes_, predict_proba)."""
+
+    def __init__(self, path: str):
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode="r")
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta["format"] != FORMAT_VERSION:
+            raise ValueError(f"unsupported compact model format {self.meta['format']}")
+
+        self.kind      = self.meta["kind"]
+        self.vocab     = load("vocab.npy")
+        self.columns   = load("columns.npy")
+        self.idf       = load("idf.npy")
+        self.coef      = load("coef.npy")
+        self.intercept = load("intercept.npy")
+        if self.kind == "calibrated_svm":
+            self.calib_a = load("calib_a.npy")
+            self.calib_b = load("calib_b.npy")
+            self.present = load("present.npy")
+        self.labels    = load("labels.npy")
+        self.classes_  = np.arange(len(self.labels))
+        self.min_n, self.max_n = self.meta["ngram_range"]
+
+    def _features(self, texts: list):
+        """Sparse TF-IDF rows as (row_starts, cols, weights); rows are l2-normalized."""
+        grams, doc_ids = [], []
+        for i, text in enumerate(texts):
+            g = char_wb_ngrams(text.lower(), self.min_n, self.max_n)
+            grams.extend(g)
+            doc_ids.extend([i] * len(g))
+        if not grams:
+            return np.zeros(len(texts) + 1, dtype=np.int64), np.zeros(0, np.int32), np.zeros(0, np.float32)
+
+        grams = np.array(grams)
+        pos   = np.searchsorted(self.vocab, grams).clip(max=len(self.vocab) - 1)
+        hit   = self.vocab[pos] == grams
+        keys  = np.asarray(doc_ids, dtype=np.int64)[hit] * len(self.idf) + self.columns[pos[hit]]
+        keys, counts = np.unique(keys, return_counts=True)
+
+        docs, cols = np.divmod(keys, len(self.idf))
+        tf = np.log(counts, dtype=np.float32) + 1 if self.meta["sublinear_tf"] else counts.astype(np.float32)
+        w  = tf * self.idf[cols]
+        starts = np.searchsorted(docs, np.arange(len(texts) + 1))
+        w     /= np.sqrt(np.bincount(docs, weights=w * w, minlength=len(texts)))[docs]
+        return starts, cols.astype(np.int32), w.astype(np.float32)
+
+    def transform(self, texts: list):
+        """TF-IDF matrix as scipy CSR (used by the response cache's similarity lookup)."""
+        from scipy.sparse import csr_matrix
+        starts, cols, w = self._features(texts)
+        return csr_matrix((w, cols, starts), shape=(len(texts), len(self.idf)))
+
+    def decision_function(self, texts: list) -> np.ndarray:
+        """(n_heads, n_samples, n_classes) raw linear scores."""
+        return self._scores(*self._features(texts))
+
+    def _scores(self, starts, cols, w) -> np.ndarray:
+        """Per head, sparse rows @ coef[h]: reads only the touched coef rows, never an (nnz × classes) copy."""
+        from scipy.sparse import csr_matrix
+        n_heads, n_features, n_classes = self.coef.shape
+        X      = csr_matrix((w, cols, starts), shape=(len(starts) - 1, n_features))
+        scores = np.empty((n_heads, X.shape[0], n_classes), dtype=np.float32)
+        for h in range(n_heads):
+            scores[h] = X @ self.coef[h]
+        return scores + self.intercept[:, None, :]
+
+    def predict_proba(self, texts: list) -> np.ndarray:
+        return self._proba(self.decision_function(texts))
+
+    def predict_proba_features(self, X) -> np.ndarray:
+        """predict_proba for rows already produced by transform()."""
+        return self._proba(self._scores(X.indptr, X.indices, X.data))
+
+    def _proba(self, scores: np.ndarray) -> np.ndarray:
+        scores = scores.astype(np.float64)
+        if self.kind == "calibrated_svm":
+            proba = 1.0 / (1.0 + np.exp(self.calib_a[:, None, :] * scores + self.calib_b[:, None, :]))
+            proba = proba * self.present[:, None, :]
+            denom = proba.sum(axis=2, keepdims=True)
+            proba = np.divide(proba, denom, out=np.full_like(proba, 1 / proba.shape[2]), where=denom != 0)
+            return proba.mean(axis=0)
+        scores = scores[0] - scores[0].max(axis=1, keepdims=True)
+        proba  = np.exp(scores)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+
+class CompactLabels:
+    """Stands in for the fitted LabelEncoder."""
+
+    def __init__(self, labels):
+        self.classes_ = labels
+
+    def inverse_transform(self, idx):
+        return self.classes_[np.asarray(idx)]
+
+
+class ResponseBlob(Mapping):
+    """Read-only {tag: [responses]} view decoded on demand from the memory-mapped blob."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "intents.json")) as f:
+            self._index = json.load(f)
+        self._offsets = np.load(os.path.join(path, "responses.npy"), mmap_mode="r")
+        with open(os.path.join(path, "responses.bin"), "rb") as f:
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def __getitem__(self, tag):
+        first, count = self._index[tag]
+        bounds = self._offsets[first:first + count + 1].tolist()
+        return [self._blob[s:e].decode("utf-8") for s, e in zip(bounds, bounds[1:])]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+def load_compact(path: str, responses: bool = True):
+    """
+    → (model, label_encoder, knowledge) with the same interfaces app.py gets
+    from the pickles; responses=False → knowledge is None (read from elsewhere).
+    """
+    model = CompactModel(path)
+    if not responses:
+        return model, CompactLabels(model.labels), None
+    return model, CompactLabels(model.labels), {"intent_map": ResponseBlob(path), "fallback": model.meta["fallback"]}
@@ -0,0 +1,42 @@
+"""
+MedBot — production gunicorn settings (preload & fork)
+======================================================
+Start:  gunicorn -c gunicorn.conf.py app:app
+
+The master imports app.py once (preload_app), so best_model, label_encoder,
+knowledge and model_meta are loaded a single time and inherited by every
+worker through fork. To keep those inherited pages shared (copy-on-write),
+the cyclic GC is kept away from them:
+
+  1. gc.disable() while the master imports the app, so no collection runs
+     and touches the freshly loaded objects' GC headers,
+  2. gc.freeze() just before each fork, moving every object the master owns
+     into the permanent generation that collections never scan,
+  3. gc.enable() in the worker, which then collects only its own objects.
+
+With MEDBOT_FAST_START=1 preload is turned off instead: app.py then loads
+the models on a background warm-up thread, and a thread started in the master
+would not survive the fork. Each worker imports the light half of app.py,
+serves "/", "/chat" and /api/models at once and warms itself; /api/chat
+answers 503 until /api/ready does. Boot is faster, but each worker holds
+a private copy of the models.
+
+Bind address (PORT) and worker count (WEB_CONCURRENCY) are read from the
+environment by gunicorn itself. Verify the savings with
+    python benchmarks/bench_worker_memory.py --workers 4
+"""
+
+import gc, os
+
+preload_app = os.environ.get("MEDBOT_FAST_START", "0") != "1"
+
+gc.disable()
+
+
+def pre_fork(server, worker):
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
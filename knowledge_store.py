@@ -0,0 +1,208 @@
+"""
+MedBot — Indexed on-disk knowledge store (SQLite) with an LRU of hot intents
+============================================================================
+knowledge.pkl holds every response of every intent as one pickled dict, loaded
+in full by each worker. That is fine for ~40 intents, not for a catalogue of
+tens of thousands of intents with long answers. The store keeps the catalogue
+in one SQLite file instead:
+
+  intents   (id, tag UNIQUE)                       → tag lookups through its unique index
+  patterns  (intent_id, pos, text)  clustered on (intent_id, pos)
+  responses (intent_id, pos, text)  indexed on   (intent_id, pos)
+  meta      (key, value)                           → fallback tag, format version
+
+Workers open it read-only and memory-map it, so only the pages of intents
+that are actually asked for are read, and they are shared through the page
+cache. A small in-process LRU keeps the hot intents' responses decoded:
+hints(tag) fetches just the first two responses (what Stage 2 sends the LLM),
+store[tag] all of them (knowledge-base answers, fallbacks).
+
+train.py builds models/knowledge.db from knowledge_base.INTENTS (or copies
+the store given with --store) and streams its patterns from it; responses
+are never loaded to train.
+
+train.py only writes the pickled copies (knowledge.pkl, compact/responses.*)
+for the pickle backend and removes stale ones otherwise. An app left on
+"pickle" after a MEDBOT_KNOWLEDGE=sqlite training run therefore finds them
+missing: from_env() then opens knowledge.db with a warning instead of letting
+the load fail.
+
+Config (environment):
+  MEDBOT_KNOWLEDGE          pickle | sqlite — where app.py reads responses from (default pickle)
+  MEDBOT_KNOWLEDGE_CACHE    LRU entries (an intent's hints and its full list are one each) (default 1024)
+"""
+
+import os, sqlite3, threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from itertools import groupby
+
+FORMAT_VERSION = 1
+_SCHEMA = """
+CREATE TABLE meta      (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE intents   (id INTEGER PRIMARY KEY, tag TEXT NOT NULL UNIQUE);
+CREATE TABLE patterns  (intent_id INTEGER NOT NULL, pos INTEGER NOT NULL, text TEXT NOT NULL,
+                        PRIMARY KEY (intent_id, pos)) WITHOUT ROWID;
+CREATE TABLE responses (intent_id INTEGER NOT NULL, pos INTEGER NOT NULL, text TEXT NOT NULL);
+"""
+_INDEXES = "CREATE UNIQUE INDEX responses_by_intent ON responses (intent_id, pos);"
+_BATCH   = 5000
+
+
+# ── Build (train.py, benchmarks) ──────────────────────────────────────────────
+def build_store(path: str, intents, fallback: str = "fallback") -> int:
+    """
+    Write `intents` (any iterable of {"tag", "patterns", "responses"} — consumed
+    once, never held) to a new store at `path`, atomically replacing an old one.
+    Returns the number of intents written.
+    """
+    tmp = f"{path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    try:
+        db.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;" + _SCHEMA)
+        intent_rows, pattern_rows, response_rows, count = [], [], [], 0
+
+        def flush():
+            db.executemany("INSERT INTO intents VALUES (?, ?)", intent_rows)
+            db.executemany("INSERT INTO patterns VALUES (?, ?, ?)", pattern_rows)
+            db.executemany("INSERT INTO responses VALUES (?, ?, ?)", response_rows)
+            intent_rows.clear(); pattern_rows.clear(); response_rows.clear()
+
+        for count, intent in enumerate(intents, 1):
+            intent_rows.append((count, intent["tag"]))
+            pattern_rows.extend((count, pos, text) for pos, text in enumerate(intent["patterns"]))
+            response_rows.extend((count, pos, text) for pos, text in enumerate(intent["responses"]))
+            if len(intent_rows) >= _BATCH:
+                flush()
+        flush()
+        db.executemany("INSERT INTO meta VALUES (?, ?)", [("format", str(FORMAT_VERSION)), ("fallback", fallback)])
+        db.executescript(_INDEXES + "ANALYZE;")
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmp, path)
+    return count
+
+
+def copy_store(src: str, dst: str):
+    """Consistent copy of a store (SQLite online backup), atomically replacing dst."""
+    tmp    = f"{dst}.tmp-{os.getpid()}"
+    source = sqlite3.connect(f"file:{src}?mode=ro", uri=True)
+    target = sqlite3.connect(tmp)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    os.replace(tmp, dst)
+
+
+# ── Read ──────────────────────────────────────────────────────────────────────
+class KnowledgeStore(Mapping):
+    """
+    Read-only {tag: [responses]} view of a store, like knowledge.pkl's
+    intent_map: store[tag], store.get(tag), iteration over tags. Adds
+    hints(tag) and the streaming readers train.py uses.
+    """
+
+    def __init__(self, path: str, cache_size: int = 1024):
+        self.path       = path
+        self.cache_size = cache_size
+        self.hits       = 0
+        self.misses     = 0
+        self._lru       = OrderedDict()   # (tag, limit) → tuple of responses
+        self._lock      = threading.Lock()
+        self._local     = threading.local()
+        meta            = dict(self._db().execute("SELECT key, value FROM meta"))
+        if int(meta.get("format", 0)) != FORMAT_VERSION:
+            raise ValueError(f"{path}: knowledge store format {meta.get('format')}, expected {FORMAT_VERSION}")
+        self.fallback   = meta["fallback"]
+        self._len       = self._db().execute("SELECT count(*) FROM intents").fetchone()[0]
+
+    @classmethod
+    def from_env(cls, path: str, copies: tuple = ()):
+        """
+        None unless MEDBOT_KNOWLEDGE=sqlite, or unless one of `copies` (the
+        files the pickle backend would load) is missing and the store exists.
+        """
+        backend = os.environ.get("MEDBOT_KNOWLEDGE", "pickle").lower()
+        if backend != "sqlite":
+            missing = [copy for copy in copies if not os.path.exists(copy)]
+            if not missing or not os.path.exists(path):
+                return None
+            print(f"⚠️  MEDBOT_KNOWLEDGE={backend} but {os.path.basename(missing[0])} is missing "
+                  f"(train.py ran with MEDBOT_KNOWLEDGE=sqlite) — reading responses from {path}")
+        return cls(path, cache_size=int(os.environ.get("MEDBOT_KNOWLEDGE_CACHE", 1024)))
+
+    def _db(self) -> sqlite3.Connection:
+        """One read-only connection per thread and process (connections must not cross a fork)."""
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            db.execute("PRAGMA mmap_size=1073741824")   # read through the page cache, no private copies
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _responses(self, tag: str, limit: int = -1) -> tuple:
+        key = (tag, limit)
+        with self._lock:
+            hit = self._lru.get(key)
+            if hit is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return hit
+            self.misses += 1
+        rows = self._db().execute(
+            "SELECT r.text FROM intents i JOIN responses r ON r.intent_id = i.id "
+            "WHERE i.tag = ? ORDER BY r.pos LIMIT ?", (tag, limit)).fetchall()
+        found = tuple(text for text, in rows)
+        if not found and self._db().execute("SELECT 1 FROM intents WHERE tag = ?", (tag,)).fetchone() is None:
+            return None
+        with self._lock:
+            self._lru[key] = found
+            if len(self._lru) > self.cache_size:
+                self._lru.popitem(last=False)
+        return found
+
+    def hints(self, tag: str, n: int = 2) -> tuple:
+        """First n responses of tag (of the fallback intent for an unknown tag) — the LLM hints."""
+        found = self._responses(tag, n)
+        if found is None:
+            found = self._responses(self.fallback, n) or ()
+        return found
+
+    def __getitem__(self, tag):
+        found = self._responses(tag)
+        if found is None:
+            raise KeyError(tag)
+        return list(found)
+
+    def __iter__(self):
+        return (tag for tag, in self._db().execute("SELECT tag FROM intents ORDER BY id"))
+
+    def __len__(self):
+        return self._len
+
+    # ── Streaming readers (train.py) ────────────────────────────────────────
+    def iter_patterns(self):
+        """(tag, pattern) in catalogue order, read lazily from a cursor."""
+        return iter(self._db().execute(
+            "SELECT i.tag, p.text FROM patterns p JOIN intents i ON i.id = p.intent_id ORDER BY p.intent_id, p.pos"))
+
+    def iter_intents(self):
+        """{"tag", "patterns"} one intent at a time — the shape train_cache fingerprints."""
+        for tag, rows in groupby(self.iter_patterns(), key=lambda row: row[0]):
+            yield {"tag": tag, "patterns": [text for _, text in rows]}
+
+    def iter_items(self):
+        """(tag, [responses]) one intent at a time, bypassing the LRU."""
+        rows = self._db().execute(
+            "SELECT i.tag, r.text FROM responses r JOIN intents i ON i.id = r.intent_id ORDER BY r.intent_id, r.pos")
+        for tag, group in groupby(rows, key=lambda row: row[0]):
+            yield tag, [text for _, text in group]
+
+    def stats(self) -> dict:
+        return {"intents": self._len, "cached": len(self._lru), "cache_size": self.cache_size,
+                "hits": self.hits, "misses": self.misses, "bytes": os.path.getsize(self.path)}
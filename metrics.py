@@ -0,0 +1,225 @@
+"""
+MedBot — Lightweight in-process metrics
+=======================================
+Fixed-bucket histograms cheap enough to update on the hot path (one bisect and
+two additions under a lock). Values follow Prometheus conventions: durations in
+seconds, bucket bounds are inclusive upper limits ("le").
+
+Registry collects named histograms and counters (plus any component's own
+Histogram), times pipeline stages with `with registry.stage("llm"): ...`,
+remembers the current request's stage durations for a Server-Timing header and
+renders everything in the Prometheus text exposition format (/api/metrics).
+Histograms are cumulative since process start; take rates/quantiles over a
+window in Prometheus (rate(..._bucket[5m])).
+"""
+
+import os, bisect, threading, contextvars
+from time import perf_counter
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.003, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS    = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+TOKEN_BUCKETS   = (64, 128, 256, 384, 512, 768, 1024, 1536, 2048, 3072, 4096, 8192)
+PERCENT_BUCKETS = (10, 20, 30, 40, 50, 60, 70, 80, 90, 100)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)   # last slot is +Inf
+        self.count  = 0
+        self.sum    = 0.0
+        self._lock  = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count     += 1
+            self.sum       += value
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding the q-th observation (None when empty)."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank, seen = q * total, 0
+        for bound, n in zip(self.bounds + (float("inf"),), counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def cumulative(self) -> list:
+        """[(le, cumulative count), ...] ending with ("+Inf", count)."""
+        with self._lock:
+            counts = list(self.counts)
+        out, seen = [], 0
+        for bound, n in zip(self.bounds + ("+Inf",), counts):
+            seen += n
+            out.append((bound, seen))
+        return out
+
+    def snapshot(self) -> dict:
+        return {
+            "count":   self.count,
+            "sum":     round(self.sum, 6),
+            "mean":    round(self.sum / self.count, 6) if self.count else None,
+            "p50":     self.quantile(0.50),
+            "p90":     self.quantile(0.90),
+            "p99":     self.quantile(0.99),
+            "buckets": self.cumulative(),
+        }
+
+
+# ── Registry + stage timers ─────────────────────────────────────────────────────
+_request_stages = contextvars.ContextVar("medbot_request_stages", default=None)
+
+
+def _series(name: str, labels: dict) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def _fmt(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _StageTimer:
+    __slots__ = ("registry", "stage", "t0")
+
+    def __init__(self, registry, stage: str):
+        self.registry = registry
+        self.stage    = stage
+
+    def __enter__(self):
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe_stage(self.stage, perf_counter() - self.t0, failed=exc_type is not None)
+        return False
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+class Registry:
+    """
+    Named metrics for one process. Series are created on first use:
+      histogram(name, help, buckets, **labels) → Histogram
+      inc(name, help, by, **labels)            → counter
+      attach(name, help, histogram, **labels)  → expose a Histogram owned elsewhere
+      collector(fn)                            → fn() → [(name, type, help, labels, value)] at scrape time
+    """
+
+    def __init__(self, enabled: bool = True, server_timing: bool = False):
+        self.enabled       = enabled
+        self.server_timing = server_timing
+        self._meta         = {}   # name → (type, help)
+        self._histograms   = {}   # (name, labels tuple) → Histogram
+        self._counters     = {}   # (name, labels tuple) → float
+        self._collectors   = []
+        self._stages       = {}   # stage → its medbot_stage_seconds Histogram (hot-path shortcut)
+        self._lock         = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(enabled       = os.environ.get("MEDBOT_METRICS", "1") == "1",
+                   server_timing = os.environ.get("MEDBOT_SERVER_TIMING", "0") == "1")
+
+    # ── Series ──────────────────────────────────────────────────────────────
+    def histogram(self, name: str, help: str, buckets=LATENCY_BUCKETS, **labels) -> Histogram:
+        key  = (name, tuple(labels.items()))
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(key, Histogram(buckets))
+                self._meta.setdefault(name, ("histogram", help))
+        return hist
+
+    def attach(self, name: str, help: str, histogram: Histogram, **labels):
+        with self._lock:
+            self._histograms[(name, tuple(labels.items()))] = histogram
+            self._meta.setdefault(name, ("histogram", help))
+
+    def inc(self, name: str, help: str, by: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + by
+            self._meta.setdefault(name, ("counter", help))
+
+    def collector(self, fn):
+        self._collectors.append(fn)
+
+    # ── Stage timers ────────────────────────────────────────────────────────
+    def stage(self, name: str):
+        """Context manager timing one pipeline stage (a shared no-op when disabled)."""
+        return _StageTimer(self, name) if self.enabled else _NO_TIMER
+
+    def observe_stage(self, name: str, seconds: float, failed: bool = False):
+        if not self.enabled:
+            return
+        hist = self._stages.get(name)
+        if hist is None:
+            hist = self._stages[name] = self.histogram(
+                "medbot_stage_seconds", "Time spent in each request pipeline stage.", stage=name)
+        hist.observe(seconds)
+        if failed:
+            self.inc("medbot_stage_errors_total", "Exceptions raised inside a pipeline stage.", stage=name)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    def begin_request(self):
+        """Start collecting this request's stage durations (per thread / asyncio task)."""
+        _request_stages.set({} if self.enabled and self.server_timing else None)
+
+    def server_timing_header(self):
+        """`Server-Timing` value for the current request, or None when disabled/empty."""
+        stages = _request_stages.get()
+        if not stages:
+            return None
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items())
+
+    # ── Exposition ──────────────────────────────────────────────────────────
+    def render(self) -> str:
+        """Prometheus text format 0.0.4."""
+        with self._lock:
+            meta       = dict(self._meta)
+            histograms = list(self._histograms.items())
+            counters   = list(self._counters.items())
+        samples = {}   # name → [lines]
+        for (name, labels), hist in histograms:
+            labels = dict(labels)
+            lines  = samples.setdefault(name, [])
+            for le, count in hist.cumulative():
+                lines.append(f"{_series(name + '_bucket', {**labels, 'le': le})} {count}")
+            lines.append(f"{_series(name + '_sum', labels)} {_fmt(round(hist.sum, 6))}")
+            lines.append(f"{_series(name + '_count', labels)} {hist.count}")
+        for (name, labels), value in counters:
+            samples.setdefault(name, []).append(f"{_series(name, dict(labels))} {_fmt(value)}")
+        for fn in self._collectors:
+            for name, kind, help, labels, value in fn():
+                meta.setdefault(name, (kind, help))
+                samples.setdefault(name, []).append(f"{_series(name, labels)} {_fmt(value)}")
+
+        out = []
+        for name in sorted(samples):
+            kind, help = meta[name]
+            out += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", *samples[name]]
+        return "\n".join(out) + "\n"
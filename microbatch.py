@@ -0,0 +1,102 @@
+"""
+MedBot — Micro-batching scheduler for Stage 1
+=============================================
+Concurrent requests in one process each pay the fixed per-call overhead of the
+scikit-learn pipeline (input validation, TF-IDF transform, three calibrated
+SVMs). The MicroBatcher collects single-message calls that arrive within a
+short window (or until max_batch items are waiting), runs them as ONE batched
+call and hands every caller its own result.
+
+Worth enabling when a process serves requests concurrently: gthread workers
+(`gunicorn app:app -k gthread --threads 16`) or the ASGI mode in asgi.py.
+With plain sync workers there is never a second caller to batch with.
+
+Config (environment):
+  MEDBOT_MICROBATCH            1 to enable (default off)
+  MEDBOT_MICROBATCH_WINDOW_MS  how long the first item waits for company (default 3)
+  MEDBOT_MICROBATCH_MAX        flush as soon as this many items are queued (default 32)
+"""
+
+import os, time, threading
+from concurrent.futures import Future
+
+from metrics import Histogram, SIZE_BUCKETS
+
+
+class MicroBatcher:
+    """
+    batch_fn(list_of_items) → list_of_results (same order). The background
+    thread is started on first use, so it is created in the process that uses
+    it (safe with gunicorn --preload forking).
+    """
+
+    def __init__(self, batch_fn, window: float = 0.003, max_batch: int = 32):
+        self.batch_fn   = batch_fn
+        self.window     = window
+        self.max_batch  = max_batch
+        self.queue_wait = Histogram()
+        self.batch_size = Histogram(SIZE_BUCKETS)
+        self._pending   = []               # [(item, future, enqueued_at)]
+        self._cond      = threading.Condition()
+        self._pid       = None
+
+    @classmethod
+    def from_env(cls, batch_fn):
+        if os.environ.get("MEDBOT_MICROBATCH", "0").lower() not in ("1", "true", "yes", "on"):
+            return None
+        return cls(batch_fn,
+                   window    = float(os.environ.get("MEDBOT_MICROBATCH_WINDOW_MS", 3)) / 1000,
+                   max_batch = int(os.environ.get("MEDBOT_MICROBATCH_MAX", 32)))
+
+    def enqueue(self, item) -> Future:
+        """Queue one item; the returned Future resolves when its batch has run."""
+        future = Future()
+        with self._cond:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="microbatcher", daemon=True).start()
+            self._pending.append((item, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def submit(self, item):
+        """Blocking convenience wrapper around enqueue()."""
+        return self.enqueue(item).result()
+
+    def _take_batch(self) -> list:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0][2] + self.window
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            return batch
+
+    def _run(self):
+        while True:
+            batch   = self._take_batch()
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait.observe(started - enqueued)
+            self.batch_size.observe(len(batch))
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms":          self.window * 1000,
+            "max_batch":          self.max_batch,
+            "queued":             len(self._pending),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+            "batch_size":         self.batch_size.snapshot(),
+        }
@@ -0,0 +1,173 @@
+"""
+MedBot — Pattern vector index (nearest training patterns as evidence)
+=====================================================================
+Every pattern in INTENTS is vectorized once with the production Stage 1
+vectorizer (L2-normalized TF-IDF char-grams) and kept as a sparse matrix.
+A message's nearest patterns come back with each classification as evidence
+("you said X; the closest example we know is Y, intent Z, cosine 0.71"), and
+when the classifier is unsure they vote on the intent:
+
+    refined = (1 - weight) · classifier proba + weight · similarity-weighted neighbour votes
+
+for messages below the refine confidence whose best neighbour reaches
+min_similarity. Confident classifications are left exactly as they were.
+Refinement is off by default (weight 0): with each message's own source
+pattern held out of the index, votes took the unsure messages from 87% to
+66% accurate (bench_pattern_index.py). Routing gates never see the blend
+either way: app.py keeps the classifier's confidence as "gate_confidence".
+
+Search:
+  exact → up to exact_max patterns: the query's posting lists in the
+          transposed (inverted) pattern matrix are summed with bincount
+  ann   → above that: patterns are projected to `dim` dimensions (truncated
+          SVD), grouped into √n k-means clusters and stored cluster by cluster;
+          a query scans the `nprobe` closest clusters in the projection and
+          re-scores the best `candidates` exactly on the sparse vectors
+
+Config (environment):
+  MEDBOT_PATTERN_INDEX      on | off                                       (default on)
+  MEDBOT_INDEX_K            nearest patterns returned per message          (default 3)
+  MEDBOT_INDEX_REFINE       refine classifications below this confidence % (default: the LLM hint threshold)
+  MEDBOT_INDEX_WEIGHT       share of the refined distribution from neighbour votes, 0 = off (default 0)
+  MEDBOT_INDEX_MIN_SIM      cosine the best neighbour needs before it may vote     (default 0.5)
+  MEDBOT_INDEX_EXACT_MAX    largest index searched exactly                  (default 10000)
+  MEDBOT_INDEX_NPROBE       clusters scanned per query in ann mode          (default 8)
+"""
+
+import os, time
+import numpy as np
+
+
+class PatternIndex:
+    """
+    search(Q, k) → (ids, sims), both (rows of Q, k), for messages already
+    vectorized (Q = vectorize(texts), the matrix Stage 1 classifies); ids index
+    `patterns`, -1 where fewer than k patterns share a feature with the message.
+    """
+
+    def __init__(self, vectorize, patterns: list, labels, exact_max: int = 10000, nprobe: int = 8,
+                 dim: int = 64, candidates: int = 64, refine_below: float = 25.0, weight: float = 0.0,
+                 min_similarity: float = 0.5, seed: int = 0):
+        self.vectorize      = vectorize
+        self.patterns       = list(patterns)
+        self.labels         = np.asarray(labels, dtype=np.int32)   # pattern → classifier proba column
+        self.nprobe         = nprobe
+        self.candidates     = candidates
+        self.refine_below   = refine_below
+        self.weight         = weight
+        self.min_similarity = min_similarity
+        self.queries        = 0
+        self.refined        = 0
+
+        started    = time.perf_counter()
+        self.X     = vectorize([p.lower().strip() for p in self.patterns]).tocsr().astype(np.float32)
+        self.X.sort_indices()
+        self.mode  = "exact" if len(self.patterns) <= exact_max else "ann"
+        if self.mode == "exact":
+            self.XT = self.X.T.tocsr()
+            self.df = np.diff(self.XT.indptr)
+        else:
+            self._build_ann(dim, seed)
+        self.build_seconds = time.perf_counter() - started
+
+    @classmethod
+    def from_env(cls, vectorize, patterns: list, labels, refine_below: float = 25.0):
+        if os.environ.get("MEDBOT_PATTERN_INDEX", "on").lower() == "off":
+            return None
+        return cls(vectorize, patterns, labels,
+                   exact_max      = int(os.environ.get("MEDBOT_INDEX_EXACT_MAX", 10000)),
+                   nprobe         = int(os.environ.get("MEDBOT_INDEX_NPROBE", 8)),
+                   refine_below   = float(os.environ.get("MEDBOT_INDEX_REFINE", refine_below)),
+                   weight         = float(os.environ.get("MEDBOT_INDEX_WEIGHT", 0)),
+                   min_similarity = float(os.environ.get("MEDBOT_INDEX_MIN_SIM", 0.5)))
+
+    # ── Build (ann) ─────────────────────────────────────────────────────────
+    def _build_ann(self, dim: int, seed: int):
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.decomposition import TruncatedSVD
+
+        n, rng = self.X.shape[0], np.random.RandomState(seed)
+        sample = lambda size: rng.choice(n, min(n, size), replace=False)
+        svd    = TruncatedSVD(min(dim, self.X.shape[1] - 1), algorithm="randomized", n_iter=3,
+                              random_state=seed).fit(self.X[sample(20000)])
+        self.P = np.ascontiguousarray(svd.components_.T, dtype=np.float32)   # feature → projection row
+        E      = np.asarray(self.X @ self.P, dtype=np.float32)
+        E     /= np.maximum(np.linalg.norm(E, axis=1, keepdims=True), 1e-12)
+
+        nlist  = max(1, int(np.sqrt(n)))
+        kmeans = MiniBatchKMeans(nlist, n_init=1, max_iter=20, batch_size=4096,
+                                 random_state=seed).fit(E[sample(nlist * 50)])
+        cluster        = kmeans.predict(E)
+        self.order     = np.argsort(cluster, kind="stable")                 # cluster-major row order
+        self.E         = np.ascontiguousarray(E[self.order])
+        self.bounds    = np.searchsorted(cluster[self.order], np.arange(nlist + 1))
+        self.centroids = kmeans.cluster_centers_.astype(np.float32)
+
+    # ── Search ──────────────────────────────────────────────────────────────
+    def search(self, Q, k: int = 3):
+        Q    = Q.tocsr()
+        n    = Q.shape[0]
+        ids  = np.full((n, k), -1, dtype=np.int64)
+        sims = np.zeros((n, k), dtype=np.float32)
+        find = self._exact if self.mode == "exact" else self._ann
+        for i in range(n):
+            a, b        = Q.indptr[i], Q.indptr[i + 1]
+            cand, score = find(Q.indices[a:b], Q.data[a:b].astype(np.float32))
+            if len(cand) > k:
+                top = np.argpartition(score, -k)[-k:]
+                cand, score = cand[top], score[top]
+            order = np.argsort(-score, kind="stable")
+            ids[i, :len(cand)], sims[i, :len(cand)] = cand[order], score[order]
+        self.queries += n
+        return ids, sims
+
+    def _exact(self, cols, weights):
+        """Every pattern sharing a feature with the query, with its cosine: walk the query's posting lists."""
+        starts, lens = self.XT.indptr[cols], self.df[cols]
+        postings     = np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(lens.sum())
+        scores       = np.bincount(self.XT.indices[postings], self.XT.data[postings] * np.repeat(weights, lens),
+                                   minlength=self.X.shape[0])
+        ids = np.flatnonzero(scores)
+        return ids, scores[ids].astype(np.float32)
+
+    def _ann(self, cols, weights):
+        """(candidate pattern ids, exact cosine) for one query given as sparse (cols, weights)."""
+        if not len(cols):
+            return np.zeros(0, np.int64), np.zeros(0, np.float32)
+        qe     = weights @ self.P[cols]
+        scores = self.centroids @ qe
+        probe  = np.argpartition(scores, -self.nprobe)[-self.nprobe:] if self.nprobe < len(scores) else range(len(scores))
+        spans  = [(self.bounds[c], self.bounds[c + 1]) for c in probe]
+        approx = np.concatenate([self.E[a:b] @ qe for a, b in spans])
+        ids    = np.concatenate([self.order[a:b] for a, b in spans])
+        if len(ids) > self.candidates:
+            ids = ids[np.argpartition(approx, -self.candidates)[-self.candidates:]]
+        dense = np.zeros(self.X.shape[1], dtype=np.float32)
+        dense[cols] = weights
+        return ids, self.X[ids] @ dense
+
+    # ── Refinement ──────────────────────────────────────────────────────────
+    def refine(self, proba: np.ndarray, ids: np.ndarray, sims: np.ndarray):
+        """
+        Blend neighbour votes into the rows of `proba` (n, classes) whose top
+        probability is below refine_below and whose best neighbour reaches
+        min_similarity. Returns (proba, mask of refined rows); proba is copied if changed.
+        """
+        mask = (proba.max(axis=1) * 100 < self.refine_below) & (sims[:, 0] >= self.min_similarity)
+        if self.weight <= 0 or not mask.any():
+            mask[:] = False
+            return proba, mask
+        rows  = np.flatnonzero(mask)
+        votes = np.zeros((len(rows), proba.shape[1]))
+        valid = ids[rows] >= 0
+        r, j  = np.nonzero(valid)
+        np.add.at(votes, (r, self.labels[ids[rows][r, j]]), sims[rows][r, j])
+        votes /= votes.sum(axis=1, keepdims=True)
+        proba  = proba.copy()
+        proba[rows] = (1 - self.weight) * proba[rows] + self.weight * votes
+        self.refined += len(rows)
+        return proba, mask
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "patterns": len(self.patterns), "build_ms": round(self.build_seconds * 1000, 1),
+                "queries": self.queries, "refined": self.refined}
@@ -0,0 +1,185 @@
+"""
+MedBot — Prompt budget & history compaction
+===========================================
+Every Stage 2 request used to carry the full system prompt, the ML context
+block and the last 10 raw history turns, so input tokens (and Groq latency and
+cost) grew with every long doctor answer in the conversation. build_messages()
+now goes through PromptBudget, which:
+
+  1. keeps the newest MEDBOT_RECENT_TURNS turns verbatim and cuts older
+     assistant turns down to their leading sentences (MEDBOT_SUMMARY_TOKENS)
+  2. drops knowledge-base hints that repeat each other or were already said
+     in the conversation
+  3. leaves out the ML block when the classifier confidence is low
+  4. if the estimate is still over MEDBOT_PROMPT_BUDGET: drops the oldest
+     turns, then the hints, then the ML block — never the system prompt or the
+     patient's new message
+
+Token counts are estimated locally (no tokenizer download, ~microseconds per
+prompt) and logged per request together with the uncompacted count.
+
+Config (environment):
+  MEDBOT_PROMPT_BUDGET    estimated input tokens per LLM request, 0 = no limit (default 1500)
+  MEDBOT_HISTORY_TURNS    history turns considered at all                   (default 10)
+  MEDBOT_RECENT_TURNS     newest turns kept verbatim                        (default 2)
+  MEDBOT_SUMMARY_TOKENS   size older assistant turns are cut to             (default 60)
+  MEDBOT_ML_CONTEXT_MIN   confidence (%) below which the ML block is omitted (default 25)
+  MEDBOT_PROMPT_LOG       1 → one log line per request on stderr            (default 1)
+"""
+
+import os, re, logging, threading
+from functools import lru_cache
+from metrics import Histogram, TOKEN_BUCKETS
+from routing import gate_confidence
+
+log = logging.getLogger("medbot.prompt")
+
+_PIECES    = re.compile(r"[A-Za-z]+|\d{1,3}|\S")
+_SENTENCES = re.compile(r"(?<=[.!?])\s+")
+_NORM      = re.compile(r"\W+")
+MESSAGE_OVERHEAD = 4   # role + delimiters per chat message
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap BPE-style estimate: one token per word (plus one per further 10
+    letters), per group of up to 3 digits and per other symbol. Errs on the
+    high side for non-English text and emoji, which is the safe side for a budget.
+    """
+    n = 0
+    for piece in _PIECES.findall(text):
+        n += 1 + len(piece) // 10 if piece[0].isalpha() else 1
+    return n
+
+
+def messages_tokens(messages: list) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+
+def summarize(text: str, max_tokens: int) -> str:
+    """Leading sentences of `text` that fit in max_tokens (words if even the first does not)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    out, used = [], 0
+    for sentence in _SENTENCES.split(text.strip()):
+        cost = estimate_tokens(sentence)
+        if used + cost > max_tokens:
+            break
+        out.append(sentence)
+        used += cost
+    if not out:
+        words, used = [], 0
+        for word in text.split():
+            used += estimate_tokens(word)
+            if used > max_tokens:
+                break
+            words.append(word)
+        return " ".join(words) + " …"
+    return " ".join(out) + " …"
+
+
+@lru_cache(maxsize=2048)   # KB hints repeat on every request for their intent
+def _norm(text: str) -> str:
+    return _NORM.sub(" ", text.lower()).strip()
+
+
+def dedupe_hints(hints: list, turns: list) -> list:
+    """Hints that are neither repeated in `hints` nor already present in an assistant turn."""
+    said = [_norm(t["content"]) for t in turns if t["role"] == "assistant"]
+    out, seen = [], set()
+    for hint in hints:
+        key = _norm(hint)
+        if key and key not in seen and not any(key in s for s in said):
+            out.append(hint)
+            seen.add(key)
+    return out
+
+
+class PromptBudget:
+    """Builds the chat-completion message list inside a token budget."""
+
+    def __init__(self, budget: int = 1500, history_turns: int = 10, recent_turns: int = 2,
+                 summary_tokens: int = 60, ml_min_confidence: float = 25.0, log_requests: bool = True):
+        self.budget            = budget
+        self.history_turns     = history_turns
+        self.recent_turns      = recent_turns
+        self.summary_tokens    = summary_tokens
+        self.ml_min_confidence = ml_min_confidence
+        self.log_requests      = log_requests
+        self.requests = self.over_budget = self.raw_tokens = self.sent_tokens = 0
+        self.tokens   = Histogram(TOKEN_BUCKETS)
+        self._lock    = threading.Lock()
+        if log_requests and not log.handlers:
+            log.addHandler(logging.StreamHandler())
+            log.setLevel(logging.INFO)
+            log.propagate = False
+
+    @classmethod
+    def from_env(cls, ml_min_confidence: float = 25.0):
+        env = os.environ.get
+        return cls(budget            = int(env("MEDBOT_PROMPT_BUDGET", 1500)),
+                   history_turns     = int(env("MEDBOT_HISTORY_TURNS", 10)),
+                   recent_turns      = int(env("MEDBOT_RECENT_TURNS", 2)),
+                   summary_tokens    = int(env("MEDBOT_SUMMARY_TOKENS", 60)),
+                   ml_min_confidence = float(env("MEDBOT_ML_CONTEXT_MIN", ml_min_confidence)),
+                   log_requests      = env("MEDBOT_PROMPT_LOG", "1") == "1")
+
+    def build(self, user_message: str, history: list, ml_result: dict, system_prompt, system_tokens=None) -> list:
+        """
+        `system_prompt(ml_result, hints)` renders the system message; hints=None
+        means "no ML context block at all". `system_tokens(ml_result, hints)`, if
+        given, returns its estimated size without rendering (see prompt_table.py).
+        """
+        def system_size(hints):
+            if system_tokens is not None:
+                return system_tokens(ml_result, hints) + MESSAGE_OVERHEAD
+            return messages_tokens([{"role": "system", "content": system_prompt(ml_result, hints)}])
+
+        turns = [{"role": t["role"], "content": t["content"]} for t in history[-self.history_turns:]
+                 if t.get("role") in ("user", "assistant") and t.get("content")]
+        user  = {"role": "user", "content": user_message}
+        hints = ml_result["top_responses"] if gate_confidence(ml_result) >= self.ml_min_confidence else None
+        raw   = system_size(hints) + messages_tokens([*turns, user])
+
+        cut   = len(turns) - self.recent_turns
+        turns = [{"role": t["role"], "content": summarize(t["content"], self.summary_tokens)}
+                 if t["role"] == "assistant" and i < cut else t for i, t in enumerate(turns)]
+        if hints is not None:
+            hints = dedupe_hints(hints, turns)
+
+        sizes  = [messages_tokens([t]) for t in turns]
+        tokens = system_size(hints) + sum(sizes) + messages_tokens([user])
+        if self.budget:
+            while tokens > self.budget and turns:
+                turns.pop(0)
+                tokens -= sizes.pop(0)
+            for smaller in ([], None):
+                if tokens <= self.budget or hints is None:
+                    break
+                tokens += system_size(smaller) - system_size(hints)
+                hints   = smaller
+        messages = [{"role": "system", "content": system_prompt(ml_result, hints)}, *turns, user]
+
+        with self._lock:
+            self.requests    += 1
+            self.raw_tokens  += raw
+            self.sent_tokens += tokens
+            self.over_budget += bool(self.budget and tokens > self.budget)
+        self.tokens.observe(tokens)
+        if self.log_requests:
+            log.info("🧮 prompt %d tokens (uncompacted %d, -%d%%) | history %d→%d turns | ml %s",
+                     tokens, raw, round(100 * (1 - tokens / raw)) if raw else 0,
+                     min(len(history), self.history_turns), len(turns),
+                     "off" if hints is None else f"{len(hints)} hint(s)")
+        return messages
+
+    def stats(self) -> dict:
+        return {
+            "budget":          self.budget,
+            "requests":        self.requests,
+            "over_budget":     self.over_budget,
+            "raw_tokens":      self.raw_tokens,
+            "sent_tokens":     self.sent_tokens,
+            "saved_ratio":     round(1 - self.sent_tokens / self.raw_tokens, 4) if self.raw_tokens else 0.0,
+            "prompt_tokens":   self.tokens.snapshot(),
+        }
@@ -0,0 +1,91 @@
+"""
+MedBot — Precomputed per-intent system prompts
+==============================================
+The system prompt depends only on the detected intent, its knowledge-base
+hints, the model name and the confidence. Rebuilding it for every request was
+cheap, but re-estimating its ~2 KB for the token budget (twice per request) was
+not. PromptTable renders each (intent, hints) head once, keeps its token count
+next to it, and appends only the model and confidence lines per request. The
+model stays out of the head: under the cascade it changes from row to row, and
+a head per (intent, model) would miss the heads warm() rendered.
+
+Layout — longest-possible byte-identical prefix, for upstream prompt caching:
+
+  SYSTEM_PROMPT_BASE                            ← identical on every request
+  --- INTERNAL ML CONTEXT ... ---               ← identical per intent + hints
+  intent, knowledge-base hints
+  • Model Used / ML Classifier Confidence       ← the only per-request bytes
+
+Heads for every intent's default hints are rendered at startup (warm()); heads
+for deduplicated hint subsets are memoized on first use, up to max_entries.
+"""
+
+import threading
+from itertools import islice
+from prompt_budget import estimate_tokens
+
+ML_CONTEXT_HEAD = """
+
+--- INTERNAL ML CONTEXT (do NOT mention to patient) ---
+Use this context to give a more targeted, medically accurate response. \
+If the intent doesn't match the patient's actual message, trust the message itself.
+The patient's message has been classified by your internal ML diagnostic system:
+  • Detected Medical Intent : {intent}
+  • Knowledge Base Hints    :
+{hints}
+"""
+REQUEST_LINES = """  • Model Used              : {model} (TF-IDF features)
+  • ML Classifier Confidence: {confidence}%"""
+
+
+class PromptTable:
+    """(tag, hints) → (prompt head, its estimated tokens), memoized."""
+
+    def __init__(self, base: str, max_entries: int = 4096):
+        self.base        = base
+        self.base_tokens = estimate_tokens(base)
+        self.max_entries = max_entries
+        self.hits        = 0
+        self.misses      = 0
+        self._entries    = {}
+        self._lock       = threading.Lock()
+
+    def _entry(self, tag: str, hints: tuple):
+        key   = (tag, hints)
+        entry = self._entries.get(key)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            return entry
+        head  = self.base + ML_CONTEXT_HEAD.format(intent=tag.replace("_", " ").title(),
+                                                   hints="\n".join(f"- {h}" for h in hints) or "  (none)")
+        entry = (head, estimate_tokens(head))
+        with self._lock:
+            self.misses += 1
+            if len(self._entries) < self.max_entries:
+                self._entries[key] = entry
+        return entry
+
+    def render(self, ml_result: dict, hints) -> str:
+        """Full system prompt; hints=None → base prompt without the ML block."""
+        if hints is None:
+            return self.base
+        head, _ = self._entry(ml_result["tag"], tuple(hints))
+        return head + REQUEST_LINES.format(model=ml_result["model_used"], confidence=ml_result["confidence"])
+
+    def tokens(self, ml_result: dict, hints) -> int:
+        """Estimated tokens of render(ml_result, hints), without re-scanning the text."""
+        if hints is None:
+            return self.base_tokens
+        _, head_tokens = self._entry(ml_result["tag"], tuple(hints))
+        return head_tokens + estimate_tokens(REQUEST_LINES.format(model=ml_result["model_used"],
+                                                                  confidence=ml_result["confidence"]))
+
+    def warm(self, tags, hints_for):
+        """Render the default-hints head of every intent up front (before the gunicorn fork), up to max_entries."""
+        for tag in islice(tags, self.max_entries):
+            self._entry(tag, hints_for(tag))
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "base_bytes": len(self.base.encode())}
@@ -0,0 +1,319 @@
+"""
+MedBot — Deadlines, retries, hedging and a circuit breaker for Stage 2
+======================================================================
+The Groq call used to run with no deadline of its own. When the upstream
+slowed down, every worker sat in it, and the request only failed once the
+hang was over. LLMGuard wraps each call:
+
+  deadline   → the whole call (retries and hedges included) must finish within
+               MEDBOT_LLM_DEADLINE; each attempt gets MEDBOT_LLM_ATTEMPT_TIMEOUT
+               or whatever is left, if less
+  retries    → up to MEDBOT_LLM_RETRIES more attempts on timeouts, connection
+               errors, 429 and 5xx, after a full-jitter backoff
+  hedging    → if an attempt is still running after the MEDBOT_LLM_HEDGE
+               percentile of recent successful latencies, one more request is
+               sent and whichever answers first wins
+  breaker    → after MEDBOT_BREAKER_FAILURES calls in a row fail, the breaker
+               opens and calls fail at once for MEDBOT_BREAKER_COOLDOWN seconds.
+               One probe call is then let through, and its result closes or
+               re-opens the breaker. Only upstream trouble counts as a failure
+               (the retryable errors above); a client error such as a 400
+               propagates without touching the breaker.
+
+A call that is refused or gives up raises LLMUnavailable. app.py answers it
+with the knowledge-base response for the detected intent (route "fallback").
+
+Config (environment):
+  MEDBOT_LLM_DEADLINE        seconds for the whole call, retries included  (default 20)
+  MEDBOT_LLM_ATTEMPT_TIMEOUT seconds for one attempt                       (default 10)
+  MEDBOT_LLM_RETRIES         extra attempts after a retryable failure      (default 2)
+  MEDBOT_LLM_BACKOFF         base backoff in seconds, doubled per retry    (default 0.25)
+  MEDBOT_LLM_HEDGE           latency percentile that triggers a hedge, 0 = off (default 0)
+  MEDBOT_LLM_HEDGE_MIN_MS    never hedge earlier than this                 (default 500)
+  MEDBOT_BREAKER_FAILURES    consecutive failures that open the breaker, 0 = off (default 5)
+  MEDBOT_BREAKER_COOLDOWN    seconds the breaker stays open                (default 30)
+
+The sync path hedges with a small thread pool; an abandoned attempt cannot be
+cancelled there and runs until its own timeout. The async path (acall)
+cancels it.
+"""
+
+import os, time, random, asyncio, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from metrics import Histogram
+
+
+class LLMUnavailable(Exception):
+    """The LLM call was refused by the open breaker or failed every attempt."""
+
+    def __init__(self, reason: str, cause: BaseException = None):
+        super().__init__(f"LLM unavailable ({reason})" + (f": {cause}" if cause else ""))
+        self.reason = reason   # breaker_open | deadline | failed
+        self.cause  = cause
+
+
+# ── Circuit breaker ─────────────────────────────────────────────────────────────
+class CircuitBreaker:
+    """closed → (N consecutive failures) → open → (cooldown) → half_open → one probe → closed | open"""
+
+    def __init__(self, failures: int = 5, cooldown: float = 30.0):
+        self.failures  = failures
+        self.cooldown  = cooldown
+        self.state     = "closed"
+        self.opened    = 0      # times the breaker has opened
+        self._streak   = 0
+        self._open_at  = 0.0
+        self._probing  = False
+        self._lock     = threading.Lock()
+
+    def allow(self) -> bool:
+        if not self.failures:
+            return True
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._open_at >= self.cooldown:
+                self.state = "half_open"
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state, self._streak, self._probing = "closed", 0, False
+
+    def release(self):
+        """The call ended with no verdict on the upstream (a client error): free the probe slot, keep the state."""
+        with self._lock:
+            self._probing = False
+
+    def failure(self):
+        if not self.failures:
+            return
+        with self._lock:
+            self._streak += 1
+            if self.state == "half_open" or self._streak >= self.failures:
+                if self.state != "open":
+                    self.opened += 1
+                self.state, self._open_at, self._probing = "open", time.monotonic(), False
+
+    def info(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._streak, "opened": self.opened,
+                "failures_to_open": self.failures, "cooldown_s": self.cooldown}
+
+
+# ── Guard ───────────────────────────────────────────────────────────────────────
+class LLMGuard:
+    """
+    call(fn) runs fn(timeout) → result; fn must give up after `timeout` seconds
+    (pass it to the HTTP client). acall(fn) does the same with an async fn.
+    hedge=False skips hedging for calls whose loser could not be cleaned up
+    (an opened stream).
+    Exceptions in `retry_on` (and timeouts) are retried and, once the call
+    gives up, count as a breaker failure; anything else propagates unchanged
+    and leaves the breaker alone.
+    """
+
+    def __init__(self, deadline: float = 20.0, attempt_timeout: float = 10.0, retries: int = 2,
+                 backoff: float = 0.25, hedge: float = 0.0, hedge_min: float = 0.5,
+                 breaker: CircuitBreaker = None, retry_on: tuple = ()):
+        self.deadline        = deadline
+        self.attempt_timeout = attempt_timeout
+        self.retries         = retries
+        self.backoff         = backoff
+        self.hedge           = hedge
+        self.hedge_min       = hedge_min
+        self.breaker         = breaker or CircuitBreaker(0)
+        self.retry_on        = (TimeoutError, asyncio.TimeoutError, *retry_on)
+        self.latency         = Histogram()
+        self.counts          = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "rejected": 0, "failed": 0}
+        self._recent         = deque(maxlen=256)   # successful attempt latencies, for the hedge delay
+        self._lock           = threading.Lock()
+        self._pool           = None
+        self._pool_pid       = None
+
+    @classmethod
+    def from_env(cls, retry_on: tuple):
+        env = os.environ.get
+        return cls(deadline        = float(env("MEDBOT_LLM_DEADLINE", 20)),
+                   attempt_timeout = float(env("MEDBOT_LLM_ATTEMPT_TIMEOUT", 10)),
+                   retries         = int(env("MEDBOT_LLM_RETRIES", 2)),
+                   backoff         = float(env("MEDBOT_LLM_BACKOFF", 0.25)),
+                   hedge           = float(env("MEDBOT_LLM_HEDGE", 0)),
+                   hedge_min       = float(env("MEDBOT_LLM_HEDGE_MIN_MS", 500)) / 1000,
+                   breaker         = CircuitBreaker(int(env("MEDBOT_BREAKER_FAILURES", 5)),
+                                                    float(env("MEDBOT_BREAKER_COOLDOWN", 30))),
+                   retry_on        = retry_on)
+
+    # ── Bookkeeping ─────────────────────────────────────────────────────────
+    def _count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def _succeeded(self, seconds: float):
+        self._recent.append(seconds)
+        self.latency.observe(seconds)
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None (hedging off / not enough samples yet)."""
+        if not self.hedge or len(self._recent) < 20:
+            return None
+        ordered = sorted(self._recent)
+        return max(ordered[min(len(ordered) - 1, int(self.hedge / 100 * len(ordered)))], self.hedge_min)
+
+    def _budget(self, end: float) -> float:
+        """Timeout for an attempt starting now."""
+        left = end - time.monotonic()
+        if left <= 0:
+            raise TimeoutError("LLM deadline exceeded")
+        return min(left, self.attempt_timeout)
+
+    def _sleep_for(self, attempt: int) -> float:
+        return random.uniform(0, self.backoff * 2 ** attempt)   # full jitter
+
+    def _admit(self):
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise LLMUnavailable("breaker_open")
+
+    def _give_up(self, reason: str, cause: BaseException):
+        self._count("failed")
+        if not isinstance(cause, self.retry_on):   # e.g. a 400: the upstream answered, the request was wrong
+            self.breaker.release()
+            raise cause
+        self.breaker.failure()
+        raise LLMUnavailable(reason, cause)
+
+    # ── Sync ────────────────────────────────────────────────────────────────
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool_pid != os.getpid():   # created in the worker, never inherited through fork
+            self._pool, self._pool_pid = ThreadPoolExecutor(16, thread_name_prefix="llm-hedge"), os.getpid()
+        return self._pool
+
+    def _timed(self, fn, timeout: float):
+        t0     = time.monotonic()
+        result = fn(timeout)
+        return result, time.monotonic() - t0
+
+    def _attempt(self, fn, end: float, hedge: bool):
+        """One attempt, hedged once if it outlives hedge_delay(). → result"""
+        delay = self.hedge_delay() if hedge else None
+        budget = self._budget(end)
+        if delay is None or budget <= delay:
+            result, seconds = self._timed(fn, budget)
+            self._succeeded(seconds)
+            return result
+
+        pool    = self._executor()
+        stop    = time.monotonic() + budget
+        futures = {pool.submit(self._timed, fn, budget)}
+        backup  = None
+        if not wait(futures, timeout=delay)[0]:
+            self._count("hedges")
+            backup = pool.submit(self._timed, fn, self._budget(end))
+            futures.add(backup)
+            stop   = max(stop, time.monotonic() + self._budget(end))
+        error = None
+        while futures:
+            done, futures = wait(futures, timeout=max(stop - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError("LLM deadline exceeded")
+            for future in done:
+                if future.exception() is None:
+                    result, seconds = future.result()
+                    self._succeeded(seconds)
+                    if future is backup:
+                        self._count("hedge_wins")
+                    return result
+                error = future.exception()
+        raise error
+
+    def call(self, fn, hedge: bool = True):
+        self._admit()
+        end, error = time.monotonic() + self.deadline, None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                pause = self._sleep_for(attempt - 1)
+                if time.monotonic() + pause >= end:
+                    break
+                self._count("retries")
+                time.sleep(pause)
+            try:
+                result = self._attempt(fn, end, hedge)
+                self.breaker.success()
+                return result
+            except self.retry_on as e:
+                error = e
+            except Exception as e:
+                self._give_up("failed", e)
+        self._give_up("deadline" if time.monotonic() >= end else "failed", error)
+
+    # ── Async ───────────────────────────────────────────────────────────────
+    async def _atimed(self, fn, timeout: float):
+        t0     = time.monotonic()
+        result = await asyncio.wait_for(fn(timeout), timeout)
+        return result, time.monotonic() - t0
+
+    async def _aattempt(self, fn, end: float, hedge: bool):
+        delay  = self.hedge_delay() if hedge else None
+        budget = self._budget(end)
+        stop   = time.monotonic() + budget
+        first  = asyncio.ensure_future(self._atimed(fn, budget))
+        tasks  = {first}
+        try:
+            if delay is not None and budget > delay:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self._count("hedges")
+                    budget = self._budget(end)
+                    tasks.add(asyncio.ensure_future(self._atimed(fn, budget)))
+                    stop   = max(stop, time.monotonic() + budget)
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, timeout=max(stop - time.monotonic(), 0),
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise TimeoutError("LLM deadline exceeded")
+                for task in done:
+                    if task.exception() is None:
+                        result, seconds = task.result()
+                        self._succeeded(seconds)
+                        if task is not first:
+                            self._count("hedge_wins")
+                        return result
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def acall(self, fn, hedge: bool = True):
+        self._admit()
+        end, error = time.monotonic() + self.deadline, None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                pause = self._sleep_for(attempt - 1)
+                if time.monotonic() + pause >= end:
+                    break
+                self._count("retries")
+                await asyncio.sleep(pause)
+            try:
+                result = await self._aattempt(fn, end, hedge)
+                self.breaker.success()
+                return result
+            except self.retry_on as e:
+                error = e
+            except Exception as e:
+                self._give_up("failed", e)
+        self._give_up("deadline" if time.monotonic() >= end else "failed", error)
+
+    def stats(self) -> dict:
+        delay = self.hedge_delay()
+        return {**self.counts, "breaker": self.breaker.info(), "deadline_s": self.deadline,
+                "attempt_timeout_s": self.attempt_timeout, "retries_max": self.retries,
+                "hedge_percentile": self.hedge or None, "hedge_delay_ms": round(delay * 1000, 1) if delay else None,
+                "latency": {k: v for k, v in self.latency.snapshot().items() if k != "buckets"}}
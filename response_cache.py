@@ -0,0 +1,292 @@
+"""
+MedBot — LLM Response Cache
+===========================
+Sits in front of the Stage 2 Groq call. Near-identical questions ("normal blood
+pressure", "what is normal bp") already land in the same intent, so a finished
+completion is stored under
+
+    key = sha1(intent tag | hash of the recent history | normalized message)
+
+and replayed for the next patient who asks the same thing in the same context.
+On an exact-key miss the cache can optionally compare the message against the
+newest entries of the same (intent, history) bucket by TF-IDF cosine similarity.
+Character n-grams barely see "30" vs "300" or "safe" vs "unsafe", so a fuzzy
+hit also needs the same numbers and the same negations (no, not, never, -n't,
+un-/non- words) as the cached message; it stays off unless
+MEDBOT_CACHE_SIMILARITY is set.
+
+Backends:
+  MemoryBackend → per-process OrderedDict with LRU + TTL eviction and a byte cap
+  SQLiteBackend → one shared file, so every gunicorn worker sees every hit
+
+Config (environment):
+  MEDBOT_CACHE             memory | sqlite | off        (default memory)
+  MEDBOT_CACHE_PATH        SQLite file                  (default <tmp>/medbot_response_cache.db)
+  MEDBOT_CACHE_TTL         seconds an answer stays valid (default 3600)
+  MEDBOT_CACHE_MAX_BYTES   size cap across all entries  (default 32 MiB)
+  MEDBOT_CACHE_SIMILARITY  cosine threshold for fuzzy hits (e.g. 0.92), 0 disables (default 0)
+"""
+
+import os, re, time, json, sqlite3, hashlib, tempfile, threading
+from collections import OrderedDict
+from itertools import islice
+
+HISTORY_WINDOW     = 10     # same window build_messages() sends to the LLM
+SIMILAR_CANDIDATES = 64     # newest entries of a bucket compared on an exact miss
+VECTOR_CACHE       = 4096   # candidate vectors kept between lookups
+
+_PUNCT     = re.compile(r"[^\w\s]")
+_SPACES    = re.compile(r"\s+")
+_DIGITS    = re.compile(r"\d+")
+NEGATIONS  = frozenset("no not never none nothing nobody without cannot cant dont doesnt didnt isnt arent "
+                       "wasnt werent wont shouldnt couldnt wouldnt t".split())   # "don't" normalizes to "don t"
+
+
+def normalize(message: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return _SPACES.sub(" ", _PUNCT.sub(" ", message.lower())).strip()
+
+
+def fuzzy_guard(text: str) -> tuple:
+    """Numbers and negation words of a normalized message: a fuzzy hit must match them exactly."""
+    words = text.split()
+    return (_DIGITS.findall(text),
+            frozenset(w for w in words if w in NEGATIONS or (w.startswith(("un", "non")) and len(w) > 4)))
+
+
+def history_hash(history: list) -> str:
+    """Stable digest of the history turns that would reach the LLM."""
+    turns = [(t.get("role"), t.get("content")) for t in history[-HISTORY_WINDOW:]
+             if t.get("role") in ("user", "assistant") and t.get("content")]
+    return hashlib.sha1(json.dumps(turns, ensure_ascii=False).encode()).hexdigest()[:16]
+
+
+# ── Backends ────────────────────────────────────────────────────────────────────
+class MemoryBackend:
+    """In-process LRU with per-entry TTL and a total byte cap."""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl       = ttl
+        self.nbytes    = 0
+        self.evictions = 0
+        self._entries  = OrderedDict()   # key → (bucket, text, value, size, expires_at)
+        self._buckets  = {}              # bucket → {key: text}
+        self._lock     = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[4] < time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key: str, bucket: str, text: str, value: str):
+        size = len(key) + len(text.encode()) + len(value.encode())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (bucket, text, value, size, time.time() + self.ttl)
+            self._buckets.setdefault(bucket, {})[key] = text
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def bucket(self, bucket: str, limit: int = SIMILAR_CANDIDATES) -> dict:
+        """{key: text} of the newest `limit` entries of a bucket."""
+        with self._lock:
+            return dict(islice(reversed(self._buckets.get(bucket, {}).items()), limit))
+
+    def _drop(self, key: str):
+        bucket, _, _, size, _ = self._entries.pop(key)
+        self.nbytes -= size
+        keys = self._buckets.get(bucket)
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._buckets[bucket]
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._entries), "bytes": self.nbytes,
+                    "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+class SQLiteBackend:
+    """Shared-file LRU: every worker reads and writes the same table (WAL mode)."""
+
+    def __init__(self, path: str, max_bytes: int, ttl: float):
+        self.path      = path
+        self.max_bytes = max_bytes
+        self.ttl       = ttl
+        self.evictions = 0
+        self._local    = threading.local()
+        with self._conn() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS response_cache (
+                              key TEXT PRIMARY KEY, bucket TEXT, text TEXT, value TEXT,
+                              size INTEGER, expires REAL, last_used REAL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS response_cache_bucket ON response_cache(bucket)")
+            db.execute("CREATE INDEX IF NOT EXISTS response_cache_lru ON response_cache(last_used)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and per process: a handle opened in a preloading
+        # gunicorn master must never be reused by the forked workers.
+        if getattr(self._local, "pid", None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return self._local.db
+
+    def get(self, key: str):
+        db  = self._conn()
+        now = time.time()
+        row = db.execute("SELECT value, expires FROM response_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            return None
+        db.execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key: str, bucket: str, text: str, value: str):
+        size = len(key) + len(text.encode()) + len(value.encode())
+        if size > self.max_bytes:
+            return
+        db  = self._conn()
+        now = time.time()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (key, bucket, text, value, size, now + self.ttl, now))
+            db.execute("DELETE FROM response_cache WHERE expires < ?", (now,))
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+            while total > self.max_bytes:
+                victim = db.execute("SELECT key, size FROM response_cache ORDER BY last_used LIMIT 1").fetchone()
+                db.execute("DELETE FROM response_cache WHERE key = ?", (victim[0],))
+                total -= victim[1]
+                self.evictions += 1
+
+    def bucket(self, bucket: str, limit: int = SIMILAR_CANDIDATES) -> dict:
+        """{key: text} of the `limit` most recently used entries of a bucket."""
+        rows = self._conn().execute("SELECT key, text FROM response_cache WHERE bucket = ? AND expires >= ? "
+                                    "ORDER BY last_used DESC LIMIT ?", (bucket, time.time(), limit)).fetchall()
+        return dict(rows)
+
+    def info(self) -> dict:
+        entries, nbytes = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache").fetchone()
+        return {"backend": "sqlite", "path": self.path, "entries": entries, "bytes": nbytes,
+                "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+# ── Cache front-end ─────────────────────────────────────────────────────────────
+class ResponseCache:
+    """
+    Exact-key lookup first; then, if `vectorize` is given and similarity > 0,
+    the most similar of the newest SIMILAR_CANDIDATES cached messages in the
+    same (intent, history) bucket that has the same numbers and negations.
+    `vectorize` maps a list of strings to L2-normalized sparse rows (e.g. the
+    TF-IDF step of the production pipeline); candidate rows are kept in an LRU,
+    so a miss only vectorizes the message and entries it has not seen yet.
+    """
+
+    def __init__(self, backend, vectorize=None, similarity: float = 0.0):
+        self.backend    = backend
+        self.vectorize  = vectorize
+        self.similarity = similarity
+        self.hits = self.similar_hits = self.misses = self.stores = 0
+        self._vectors = OrderedDict()   # entry key → its 1-row vector
+        self._lock    = threading.Lock()
+
+    @classmethod
+    def from_env(cls, vectorize=None):
+        kind      = os.environ.get("MEDBOT_CACHE", "memory").lower()
+        ttl       = float(os.environ.get("MEDBOT_CACHE_TTL", 3600))
+        max_bytes = int(os.environ.get("MEDBOT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+        if kind == "off":
+            return None
+        if kind == "sqlite":
+            path    = os.environ.get("MEDBOT_CACHE_PATH",
+                                     os.path.join(tempfile.gettempdir(), "medbot_response_cache.db"))
+            backend = SQLiteBackend(path, max_bytes, ttl)
+        else:
+            backend = MemoryBackend(max_bytes, ttl)
+        return cls(backend, vectorize, float(os.environ.get("MEDBOT_CACHE_SIMILARITY", 0)))
+
+    @staticmethod
+    def _bucket(tag: str, history: list) -> str:
+        return f"{tag}:{history_hash(history)}"
+
+    @staticmethod
+    def _key(bucket: str, text: str) -> str:
+        return hashlib.sha1(f"{bucket}\x1f{text}".encode()).hexdigest()
+
+    def get(self, message: str, tag: str, history: list):
+        """Return a cached answer for this (message, intent, history) or None."""
+        text   = normalize(message)
+        bucket = self._bucket(tag, history)
+        value  = self.backend.get(self._key(bucket, text))
+        kind   = "hits"
+
+        if value is None and self.vectorize is not None and self.similarity > 0:
+            guard      = fuzzy_guard(text)
+            candidates = {k: t for k, t in self.backend.bucket(bucket).items() if fuzzy_guard(t) == guard}
+            if candidates:
+                keys  = list(candidates)
+                query, rows = self._vectorize(text, keys, candidates)
+                sims  = (rows @ query.T).toarray().ravel()
+                best  = int(sims.argmax())
+                if sims[best] >= self.similarity:
+                    value = self.backend.get(keys[best])
+                    kind  = "similar_hits"
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                setattr(self, kind, getattr(self, kind) + 1)
+        return value
+
+    def _vectorize(self, text: str, keys: list, candidates: dict):
+        """(message row, candidate rows): candidates already seen come from the LRU."""
+        from scipy.sparse import vstack
+        with self._lock:
+            cached = {k: self._vectors[k] for k in keys if k in self._vectors}
+            for k in cached:
+                self._vectors.move_to_end(k)
+        fresh = [k for k in keys if k not in cached]
+        vecs  = self.vectorize([text] + [candidates[k] for k in fresh])
+        with self._lock:
+            for i, k in enumerate(fresh, 1):
+                cached[k] = self._vectors[k] = vecs[i]
+            while len(self._vectors) > VECTOR_CACHE:
+                self._vectors.popitem(last=False)
+        return vecs[0], vstack([cached[k] for k in keys], format="csr")
+
+    def put(self, message: str, tag: str, history: list, response: str):
+        text   = normalize(message)
+        bucket = self._bucket(tag, history)
+        self.backend.put(self._key(bucket, text), bucket, text, response)
+        with self._lock:
+            self.stores += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            **self.backend.info(),
+            "hits":         self.hits,
+            "similar_hits": self.similar_hits,
+            "misses":       self.misses,
+            "stores":       self.stores,
+            "hit_rate":     round((self.hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+            "similarity":   self.similarity,
+        }
@@ -0,0 +1,192 @@
+"""
+MedBot — Confidence-gated knowledge-base fast path
+==================================================
+Greetings, thanks, "who are you" and emergencies already have a canonical
+answer in knowledge_base.py, yet every message used to pay a full Llama 3.3 70B
+round trip. After Stage 1, a message whose intent is on the allow-list and
+whose classification is clear enough is answered straight from
+knowledge["intent_map"] — no network, well under a millisecond — which also
+gets the emergency instructions to the patient immediately.
+
+A message takes the fast path when, for its top intent,
+    confidence          >= the intent's threshold   (percent)
+    confidence - second >= the intent's margin       (percentage points)
+and, for the social intents (greeting, thanks, who_are_you), the message is
+nothing but social talk: at most MEDBOT_FASTPATH_MAX_WORDS words, no digits,
+and every word taken from those intents' own training patterns (plus a few
+fillers such as "there", "so", "much"). Classifier confidence alone is not
+enough: "good morning, my chest hurts" scores Greeting at ~41%, and a canned
+"Hello!" must never answer a symptom.
+
+Every answer reports its route:  kb → fast path | cache → response cache | llm → Groq
+                                 | fallback → KB answer because Groq is unavailable (resilience.py)
+
+The thresholds come from train.py (tune_fast_path → model_meta.json "fast_path"),
+out of fold on the production model's scale. Per intent, the minimum confidence
+and margin are the FASTPATH_QUANTILE of its own correctly classified held-out
+patterns, raised just above every held-out pattern of another intent that was
+classified as it (for a social intent only those the content guard would let
+through): none of those misfires would have been answered from the KB. An
+intent the model never gets right out of fold (emergency, with one-off
+patterns) gets both gates above its misfires. Without tuned thresholds —
+models trained before this, or MEDBOT_ENGINE=hashed, whose scale differs —
+the fast path falls back to DEFAULT_ALLOW, which demands near certainty.
+
+Config (environment):
+  MEDBOT_FASTPATH            off, or comma-separated tag:threshold[:margin], overriding the tuned
+                             thresholds (default: model_meta.json "fast_path", else
+                             greeting:85,thanks:85,who_are_you:85,emergency:85)
+  MEDBOT_FASTPATH_MARGIN     margin for entries that do not set one (default 50)
+  MEDBOT_FASTPATH_MAX_WORDS  longest message a social intent may answer (default 6)
+"""
+
+import os, re, threading
+from metrics import Histogram
+
+DEFAULT_ALLOW = "greeting:85,thanks:85,who_are_you:85,emergency:85"
+SOCIAL_TAGS   = ("greeting", "thanks", "who_are_you")
+FILLERS       = frozenset("there so much very lot a the again dear dr medbot bot ok okay please".split())
+_WORDS        = re.compile(r"[a-z]+|\d")
+ROUTES        = ("kb", "cache", "llm", "fallback", "shed")
+
+
+def gate_confidence(ml_result: dict) -> float:
+    """
+    Confidence the routing gates compare against: the classifier's own, never
+    the pattern-index blend, and on the calibrated model's scale even when the
+    cascade's NB stage answered (see app.detect_intents). Refinement may pick a
+    better label for an unsure message, but it must not make that message look
+    sure enough to skip the LLM.
+    """
+    return ml_result.get("gate_confidence", ml_result["confidence"])
+
+
+def words(message: str) -> list:
+    """Lowercase words ("what's" → "whats"); every digit is a word of its own."""
+    return _WORDS.findall(message.lower().replace("'", "").replace("’", ""))
+
+
+class FastPath:
+    """Allow-list of intents that may be answered from the knowledge base."""
+
+    def __init__(self, rules: dict, max_words: int = 6):
+        self.rules      = rules   # tag → (min confidence %, min margin over the runner-up)
+        self.max_words  = max_words
+        self.vocabulary = set()   # words social messages may use (learn_social)
+
+    @classmethod
+    def from_env(cls, tuned: dict = None):
+        """tuned: model_meta["fast_path"] (tune_fast_path); MEDBOT_FASTPATH, when set, takes precedence."""
+        max_words = int(os.environ.get("MEDBOT_FASTPATH_MAX_WORDS", 6))
+        spec      = os.environ.get("MEDBOT_FASTPATH")
+        if spec is None and tuned:
+            return cls({tag: (r["min_confidence"], r["min_margin"]) for tag, r in tuned["rules"].items()}, max_words)
+        spec = (spec if spec is not None else DEFAULT_ALLOW).strip()
+        if spec.lower() in ("", "off", "0"):
+            return None
+        margin = float(os.environ.get("MEDBOT_FASTPATH_MARGIN", 50))
+        rules  = {}
+        for entry in spec.split(","):
+            tag, threshold, *rest = entry.strip().split(":")
+            rules[tag] = (float(threshold), float(rest[0]) if rest else margin)
+        return cls(rules, max_words)
+
+    def learn_social(self, patterns):
+        """Vocabulary of the social intents, from (pattern, tag) pairs. Until then they never take the fast path."""
+        self.vocabulary = {w for pattern, tag in patterns if tag in SOCIAL_TAGS for w in words(pattern)} | FILLERS
+
+    def social_only(self, message: str) -> bool:
+        found = words(message)
+        return 0 < len(found) <= self.max_words and all(w in self.vocabulary for w in found)
+
+    def accepts(self, ml_result: dict, message: str = None) -> bool:
+        rule = self.rules.get(ml_result["tag"])
+        if rule is None or ml_result.get("refined"):
+            return False
+        if ml_result["tag"] in SOCIAL_TAGS and (message is None or not self.social_only(message)):
+            return False
+        top3       = ml_result["top3"]
+        confidence = gate_confidence(ml_result)
+        margin     = ml_result.get("gate_margin", confidence - (top3[1][1] if len(top3) > 1 else 0.0))
+        return confidence >= rule[0] and margin >= rule[1]
+
+    def answer(self, ml_result: dict, intent_map, message: str = None) -> str:
+        """Canonical knowledge-base answer, or None when the message must go to the LLM."""
+        if not self.accepts(ml_result, message):
+            return None
+        responses = intent_map.get(ml_result["tag"])
+        return responses[0] if responses else None
+
+    def info(self) -> dict:
+        return {tag: {"min_confidence": c, "min_margin": m, "social": tag in SOCIAL_TAGS}
+                for tag, (c, m) in self.rules.items()}
+
+
+# ── Tuning (train.py) ─────────────────────────────────────────────────────────
+FASTPATH_QUANTILE = 0.10   # share of an intent's correctly classified held-out patterns the gates may turn away
+STEP              = 0.1    # how far above the highest misfire a gate is set (percentage points)
+
+
+def tune_fast_path(oof, y, classes, texts, tags=None, quantile: float = FASTPATH_QUANTILE) -> dict:
+    """
+    Per-intent fast-path gates from out-of-fold probabilities of the production
+    model (oof: samples × classes, y: true column, texts: the patterns). Intents
+    the model never predicts out of fold are left out (DEFAULT_ALLOW applies).
+    """
+    import numpy as np   # train.py only; app.py imports routing at start-up
+
+    tags  = tags or [entry.split(":")[0] for entry in DEFAULT_ALLOW.split(",")]
+    guard = FastPath({})
+    guard.learn_social(zip(texts, (classes[i] for i in y)))
+    social_only = np.array([guard.social_only(text) for text in texts])
+
+    top2       = np.sort(oof, axis=1)[:, -2:] * 100
+    confidence = top2[:, 1]
+    margin     = top2[:, 1] - top2[:, 0]
+    predicted  = oof.argmax(axis=1)
+
+    def floor(values):     # lets all but the lowest `quantile` of the hits through
+        return float(np.quantile(values, quantile)) if len(values) else 0.0
+
+    def ceiling(values):   # keeps every misfire out
+        return float(values.max()) + STEP if len(values) else 0.0
+
+    rules = {}
+    for tag in tags:
+        if tag not in classes:
+            continue
+        column  = list(classes).index(tag)
+        hits    = (predicted == column) & (y == column)
+        misfire = (predicted == column) & (y != column)
+        if tag in SOCIAL_TAGS:
+            misfire &= social_only
+        if not hits.any() and not misfire.any():
+            continue
+        rules[tag] = {
+            "min_confidence": round(max(floor(confidence[hits]), ceiling(confidence[misfire])), 1),
+            "min_margin":     round(floor(margin[hits]) if hits.any() else ceiling(margin[misfire]), 1),
+            "oof_hits":       int(hits.sum()),
+            "oof_misfires":   int(misfire.sum()),
+            "patterns":       int((y == column).sum()),
+        }
+    return {"quantile": quantile, "rules": rules}
+
+
+class RouteStats:
+    """Per-route request counters and end-to-end latency histograms."""
+
+    def __init__(self):
+        self.latency = {route: Histogram() for route in ROUTES}
+        self.errors  = 0
+        self._lock   = threading.Lock()
+
+    def record(self, route: str, seconds: float):
+        self.latency[route].observe(seconds)
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> dict:
+        return {"errors": self.errors,
+                **{route: {k: v for k, v in h.snapshot().items() if k != "buckets"} for route, h in self.latency.items()}}
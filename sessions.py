@@ -0,0 +1,187 @@
+"""
+MedBot — Server-side conversation sessions
+==========================================
+The chat client used to POST its whole history with every message, so payloads
+and JSON parse time grew with the conversation. Now /api/chat (and the stream
+route) hand out a session id and keep the last N turns of each conversation on
+the server; the client sends only {"message", "session_id"}.
+
+A session is a ring buffer of (role, content) pairs — older turns fall off
+once N is reached, which is all build_messages() would ever send anyway.
+
+Stores:
+  MemorySessions → per-process OrderedDict, LRU by last use + idle TTL + max sessions
+  SQLiteSessions → one shared file so any gunicorn worker can continue any session
+
+Config (environment):
+  MEDBOT_SESSIONS            memory | sqlite | off        (default memory, sqlite when WEB_CONCURRENCY > 1)
+  MEDBOT_SESSION_PATH        SQLite file                  (default <tmp>/medbot_sessions.db)
+  MEDBOT_SESSION_TURNS       turns kept per session       (default 10)
+  MEDBOT_SESSION_TTL         idle seconds before a session expires (default 3600)
+  MEDBOT_SESSION_MAX         sessions kept per store      (default 10000)
+  MEDBOT_SESSION_TURN_BYTES  longer turns are cut to this many UTF-8 bytes (default 8192)
+  MEDBOT_SESSION_MAX_BYTES   memory store: total turn bytes before LRU eviction (default 64 MiB)
+
+With several workers and the memory store, a session only exists in the worker
+that created it, so more than one worker selects the SQLite store unless
+MEDBOT_SESSIONS says otherwise. A session can still be lost (expired, evicted,
+restarted worker): a client that sends "can_resend": true is then asked to
+resend its own copy of the history (SessionLost, see app.open_session) instead
+of getting an answer without context; other clients get a new session, flagged
+"session_restarted": true.
+"""
+
+import os, json, time, uuid, sqlite3, tempfile, threading
+from collections import OrderedDict, deque
+
+
+class SessionLost(Exception):
+    """The request names a session this store no longer has; the client should resend its history."""
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _turns(pairs) -> list:
+    return [{"role": role, "content": content} for role, content in pairs]
+
+
+def clip(text: str, max_bytes: int) -> str:
+    """text cut to at most max_bytes of UTF-8, never inside a character."""
+    data = text.encode()
+    return text if len(data) <= max_bytes else data[:max_bytes].decode(errors="ignore")
+
+
+# ── Stores ──────────────────────────────────────────────────────────────────────
+class MemorySessions:
+    """In-process LRU of ring buffers with an idle TTL, a session cap and a byte cap."""
+
+    def __init__(self, turns: int, ttl: float, max_sessions: int, turn_bytes: int = 8192,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.turns        = turns
+        self.ttl          = ttl
+        self.max_sessions = max_sessions
+        self.turn_bytes   = turn_bytes
+        self.max_bytes    = max_bytes
+        self.nbytes       = 0
+        self.evictions    = 0
+        self._sessions    = OrderedDict()   # id → (deque[(role, content)], expires_at, bytes)
+        self._lock        = threading.Lock()
+
+    def history(self, session_id: str):
+        """Turns of a live session (oldest first), or None if unknown/expired."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                self._drop(session_id)
+                return None
+            self._sessions.move_to_end(session_id)
+            return _turns(entry[0])
+
+    def append(self, session_id: str, *turns):
+        """Add (role, content) turns, creating the session if needed; each turn is clipped to turn_bytes."""
+        turns = [(role, clip(content, self.turn_bytes)) for role, content in turns]
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            ring  = entry[0] if entry is not None else deque(maxlen=self.turns)
+            if entry is not None:
+                self._drop(session_id)
+            ring.extend(turns)
+            size  = sum(len(content.encode()) for _, content in ring)
+            self._sessions[session_id] = (ring, time.time() + self.ttl, size)
+            self.nbytes += size
+            while len(self._sessions) > self.max_sessions or (self.nbytes > self.max_bytes and len(self._sessions) > 1):
+                self._drop(next(iter(self._sessions)))
+                self.evictions += 1
+
+    def _drop(self, session_id: str):
+        self.nbytes -= self._sessions.pop(session_id)[2]
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions), "max_sessions": self.max_sessions,
+                    "turns": self.turns, "bytes": self.nbytes, "max_bytes": self.max_bytes,
+                    "evictions": self.evictions}
+
+
+class SQLiteSessions:
+    """Shared-file sessions: any worker can continue any conversation (WAL mode)."""
+
+    def __init__(self, path: str, turns: int, ttl: float, max_sessions: int, turn_bytes: int = 8192):
+        self.path         = path
+        self.turns        = turns
+        self.ttl          = ttl
+        self.max_sessions = max_sessions
+        self.turn_bytes   = turn_bytes
+        self.evictions    = 0
+        self._local       = threading.local()
+        with self._conn() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS sessions (
+                              id TEXT PRIMARY KEY, turns TEXT, expires REAL, last_used REAL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_lru ON sessions(last_used)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # Same rule as the response cache: never share a handle across threads or a fork.
+        if getattr(self._local, "pid", None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return self._local.db
+
+    def history(self, session_id: str):
+        db  = self._conn()
+        now = time.time()
+        row = db.execute("SELECT turns, expires FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            return None
+        db.execute("UPDATE sessions SET last_used = ? WHERE id = ?", (now, session_id))
+        return _turns(json.loads(row[0]))
+
+    def append(self, session_id: str, *turns):
+        db  = self._conn()
+        now = time.time()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            row  = db.execute("SELECT turns FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            ring = (json.loads(row[0]) if row else []) + [[role, clip(content, self.turn_bytes)]
+                                                          for role, content in turns]
+            db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                       (session_id, json.dumps(ring[-self.turns:], ensure_ascii=False), now + self.ttl, now))
+            if row is None:
+                db.execute("DELETE FROM sessions WHERE expires < ?", (now,))
+                excess = db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+                if excess > 0:
+                    db.execute("DELETE FROM sessions WHERE id IN "
+                               "(SELECT id FROM sessions ORDER BY last_used LIMIT ?)", (excess,))
+                    self.evictions += excess
+
+    def info(self) -> dict:
+        sessions = self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "sessions": sessions, "max_sessions": self.max_sessions,
+                "turns": self.turns, "evictions": self.evictions}
+
+
+def sessions_from_env():
+    """Session store configured by MEDBOT_SESSIONS (None when disabled)."""
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    kind    = os.environ.get("MEDBOT_SESSIONS", "sqlite" if workers > 1 else "memory").lower()
+    turns   = int(os.environ.get("MEDBOT_SESSION_TURNS", 10))
+    ttl     = float(os.environ.get("MEDBOT_SESSION_TTL", 3600))
+    cap     = int(os.environ.get("MEDBOT_SESSION_MAX", 10000))
+    clip_at = int(os.environ.get("MEDBOT_SESSION_TURN_BYTES", 8192))
+    if kind == "off":
+        return None
+    if kind == "sqlite":
+        path = os.environ.get("MEDBOT_SESSION_PATH", os.path.join(tempfile.gettempdir(), "medbot_sessions.db"))
+        return SQLiteSessions(path, turns, ttl, cap, clip_at)
+    if workers > 1:
+        print(f"⚠️  MEDBOT_SESSIONS=memory with WEB_CONCURRENCY={workers}: a chat that lands on another worker "
+              f"loses its session — use MEDBOT_SESSIONS=sqlite")
+    return MemorySessions(turns, ttl, cap, clip_at, int(os.environ.get("MEDBOT_SESSION_MAX_BYTES", 64 * 1024 * 1024)))
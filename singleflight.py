@@ -0,0 +1,326 @@
+"""
+MedBot — Single-flight coalescing of identical in-flight chats
+==============================================================
+A front desk that double-submits, or a client that retries while the first
+attempt is still running, used to start one Stage 1 + Groq completion per copy.
+Identical concurrent requests now share one:
+
+    key = sha1(normalized message | hash of the history the LLM would see)
+
+  threads → the first request for a key (the leader) runs the pipeline; requests
+            for the same key that arrive in this process before it finishes wait
+            for it and get the same answer
+  file    → as above, and in addition the leader holds an flock() on
+            <dir>/<key>.lock and publishes its answer to <dir>/<key>.json, so a
+            request that arrives in another gunicorn worker waits on the lock
+            and uses that answer instead of calling Groq again
+
+A follower only takes an answer that was finished after it arrived — replaying
+older answers is the response cache's job. If the leader fails (or its worker
+dies, which releases the lock), a waiting follower runs the pipeline itself.
+Within a process, followers get the leader's exception, except for the types
+passed as retry_on: those are the leader's own business (app.py passes Shed,
+since the leader's client may be over its share while the follower's is not),
+so the followers contend again and one of them leads with its own admission.
+
+Streams are coalesced too, within a worker: stream() runs the leader's token
+generator and fans every chunk out to the followers as it arrives (a late
+follower first gets the chunks it missed), so /api/chat/stream makes one Groq
+call per identical in-flight chat. arun() and astream() do the same for
+coroutines and async iterators on the asyncio event loop (asgi.py); there the
+stream is produced by a task of its own, so it survives the leader's client
+disconnecting. In the threaded stream the leader's request drives the
+generator: if that client goes away, followers that have received nothing
+yet lead again, the others get an error. Streams never coalesce across
+workers, even in file mode (a stream cannot be replayed from a result file
+before it is finished).
+
+Config (environment):
+  MEDBOT_SINGLEFLIGHT       off | thread | file           (default thread)
+  MEDBOT_SINGLEFLIGHT_DIR   lock + result files for file mode (default <tmp>/medbot_singleflight)
+  MEDBOT_SINGLEFLIGHT_WAIT  longest a follower waits for a leader in seconds (default 30)
+"""
+
+import os, json, time, fcntl, asyncio, hashlib, tempfile, threading
+from response_cache import normalize, history_hash
+
+POLL        = 0.01   # seconds between flock attempts while another worker leads
+SWEEP_EVERY = 1000   # leaders between sweeps of stale lock/result files
+
+
+def flight_key(message: str, history: list) -> str:
+    return hashlib.sha1(f"{normalize(message)}|{history_hash(history)}".encode()).hexdigest()
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done  = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _Stream:
+    __slots__ = ("chunks", "finished", "error", "changed")
+
+    def __init__(self, changed):
+        self.chunks   = []
+        self.finished = False
+        self.error    = None
+        self.changed  = changed   # threading.Condition | asyncio.Condition
+
+
+class LeaderGone(Exception):
+    """The request driving a coalesced stream went away before the stream ended."""
+
+
+class SingleFlight:
+    """
+    run(key, fn, retry_on) → (value, shared). fn() is called by one leader per key;
+    every concurrent caller with the same key gets its return value (or its
+    exception, unless it is a retry_on type: then the callers run again).
+    With a `directory`, leadership also spans processes and values must be JSON.
+    stream(key, fn, retry_on) → chunks of fn() (a generator), likewise shared;
+    arun / astream are the asyncio versions of run / stream.
+    """
+
+    def __init__(self, directory: str = None, wait: float = 30.0):
+        self.directory = directory
+        self.wait      = wait
+        self.counts    = {"leaders": 0, "coalesced_threads": 0, "coalesced_workers": 0, "coalesced_streams": 0,
+                          "coalesced_tasks": 0, "lock_timeouts": 0, "follower_retries": 0}
+        self._calls    = {}
+        self._streams  = {}   # key → _Stream of the thread leading it
+        self._tasks    = {}   # key → asyncio.Task (arun)
+        self._feeds    = {}   # key → _Stream fed by a producer task (astream)
+        self._lock     = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        mode = os.environ.get("MEDBOT_SINGLEFLIGHT", "thread").lower()
+        if mode == "off":
+            return None
+        directory = None
+        if mode == "file":
+            directory = os.environ.get("MEDBOT_SINGLEFLIGHT_DIR",
+                                       os.path.join(tempfile.gettempdir(), "medbot_singleflight"))
+        return cls(directory, wait=float(os.environ.get("MEDBOT_SINGLEFLIGHT_WAIT", 30)))
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    # ── Threads ─────────────────────────────────────────────────────────────
+    def run(self, key: str, fn, retry_on: tuple = ()):
+        while True:
+            with self._lock:
+                call   = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+            if leader:
+                break
+            self._count("coalesced_threads")
+            call.done.wait()
+            if call.error is None:
+                return call.value, True
+            if not isinstance(call.error, retry_on):
+                raise call.error
+            self._count("follower_retries")
+
+        try:
+            call.value, shared = self._lead(key, fn) if self.directory else (fn(), False)
+            if not shared:
+                self._count("leaders")
+                if self.directory and self.counts["leaders"] % SWEEP_EVERY == 0:
+                    self.sweep()
+            return call.value, shared
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stream(self, key: str, fn, retry_on: tuple = ()):
+        """Generator: the chunks of fn(), produced once per key and replayed to every concurrent caller."""
+        while True:
+            with self._lock:
+                flight = self._streams.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._streams[key] = _Stream(threading.Condition())
+            if leader:
+                break
+            self._count("coalesced_streams")
+            seen = 0
+            while True:
+                with flight.changed:
+                    flight.changed.wait_for(lambda: len(flight.chunks) > seen or flight.finished)
+                    new, finished = flight.chunks[seen:], flight.finished
+                seen += len(new)
+                yield from new
+                if finished:
+                    break
+            if flight.error is None:
+                return
+            if seen or not isinstance(flight.error, (LeaderGone, *retry_on)):
+                raise flight.error
+            self._count("follower_retries")
+
+        self._count("leaders")
+        try:
+            for chunk in fn():
+                with flight.changed:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+                yield chunk
+        except GeneratorExit:
+            flight.error = LeaderGone("the request leading this stream went away")
+            raise
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._streams[key]
+            with flight.changed:
+                flight.finished = True
+                flight.changed.notify_all()
+
+    # ── Event loop ──────────────────────────────────────────────────────────
+    async def arun(self, key: str, fn, retry_on: tuple = ()):
+        """run() for a coroutine function; the leader's task outlives its caller being cancelled."""
+        while True:
+            task = self._tasks.get(key)
+            if task is None:
+                break
+            self._count("coalesced_tasks")
+            try:
+                return await asyncio.shield(task), True
+            except retry_on:
+                self._count("follower_retries")
+
+        self._count("leaders")
+        task = self._tasks[key] = asyncio.ensure_future(fn())
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), False
+
+    def _forget(self, key: str, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()   # retrieved: no "never retrieved" warning when every caller was cancelled
+
+    async def astream(self, key: str, fn, retry_on: tuple = ()):
+        """stream() for an async iterator, produced by a task of its own that every caller reads from."""
+        while True:
+            feed   = self._feeds.get(key)
+            leader = feed is None
+            if leader:
+                self._count("leaders")
+                feed = self._feeds[key] = _Stream(asyncio.Condition())
+                asyncio.ensure_future(self._produce(key, feed, fn))
+            else:
+                self._count("coalesced_streams")
+            seen = 0
+            while True:
+                async with feed.changed:
+                    await feed.changed.wait_for(lambda: len(feed.chunks) > seen or feed.finished)
+                    new, finished = feed.chunks[seen:], feed.finished
+                seen += len(new)
+                for chunk in new:
+                    yield chunk
+                if finished:
+                    break
+            if feed.error is None:
+                return
+            if leader or seen or not isinstance(feed.error, retry_on):
+                raise feed.error
+            self._count("follower_retries")
+
+    async def _produce(self, key: str, feed: _Stream, fn):
+        try:
+            async for chunk in fn():
+                async with feed.changed:
+                    feed.chunks.append(chunk)
+                    feed.changed.notify_all()
+        except Exception as e:
+            feed.error = e
+        except asyncio.CancelledError:
+            feed.error = LeaderGone("the stream's producer was cancelled")
+            raise
+        finally:
+            if self._feeds.get(key) is feed:
+                del self._feeds[key]
+            async with feed.changed:
+                feed.finished = True
+                feed.changed.notify_all()
+
+    # ── Workers ─────────────────────────────────────────────────────────────
+    def _lead(self, key: str, fn):
+        """Take the cross-process lock for `key`, or wait for whoever holds it and reuse its answer."""
+        arrived = time.time()
+        result  = os.path.join(self.directory, key + ".json")
+        fd      = os.open(os.path.join(self.directory, key + ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            deadline = time.monotonic() + self.wait
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:   # stuck leader: give up waiting, answer ourselves
+                        self._count("lock_timeouts")
+                        return fn(), False
+                    time.sleep(POLL)
+            os.utime(fd)   # fresh mtime: sweep() never removes a lock that is in use
+            try:
+                shared = self._read(result, arrived)
+                if shared is not None:
+                    self._count("coalesced_workers")
+                    return shared["value"], True
+                value = fn()
+                self._write(result, value)
+                return value, False
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _read(path: str, arrived: float):
+        try:
+            with open(path) as f:
+                shared = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return shared if shared["finished"] >= arrived else None
+
+    @staticmethod
+    def _write(path: str, value):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"finished": time.time(), "value": value}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def sweep(self, older_than: float = 600.0):
+        """Delete lock/result files of keys nobody has used for `older_than` seconds."""
+        if not self.directory:
+            return
+        cutoff = time.time() - older_than
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return {"mode": "file" if self.directory else "thread", **self.counts,
+                "in_flight": len(self._calls) + len(self._streams) + len(self._tasks) + len(self._feeds)}
@@ -0,0 +1,140 @@
+"""
+MedBot — Render-once pages and precompressed, cache-friendly assets
+===================================================================
+Nothing "/", "/chat", /api/models or static/ send changes while the app runs:
+the pages and /api/models only depend on model_meta, which changes when
+train.py runs and the app restarts. So every such body is built once:
+
+  pages       → index.html / chat.html rendered with model_meta, on first use
+                per SCRIPT_NAME prefix the app is mounted under (page()), so
+                their links and asset URLs carry the prefix (app.py builds the
+                unprefixed ones ahead of time: at import, or on a thread of
+                their own with MEDBOT_FAST_START=1)
+  /api/models → model_meta encoded as JSON
+  static/     → every file, also addressed by a content-hashed URL
+                (/assets/css/style.3f2a1b9c04.css) whose bytes never change
+
+each stored with gzip (level 9) and brotli (quality 11) variants next to the
+identity body. A request gets the smallest variant its Accept-Encoding allows,
+a weak ETag shared by the variants (If-None-Match → 304, no body) and a
+Cache-Control: pages and JSON are revalidated ("no-cache"); hashed static
+URLs are cached for a year ("immutable"). The plain /static/... URLs keep
+working through Flask.
+
+brotli is optional at import: without the package only gzip variants are built.
+
+Config (environment):
+  MEDBOT_ASSETS           on | off — off renders the pages on every request  (default on)
+  MEDBOT_ASSET_MIN_BYTES  bodies smaller than this are not compressed         (default 256)
+"""
+
+import gzip, hashlib, mimetypes, os
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:   # gzip variants only
+    brotli = None
+
+IMMUTABLE  = "public, max-age=31536000, immutable"   # content-hashed URLs
+REVALIDATE = "no-cache"                              # cacheable, but ask (If-None-Match) every time
+MAX_ROOTS  = 8                                       # SCRIPT_NAME prefixes a page is kept rendered for
+
+# (Accept-Encoding header, offered encodings) → chosen encoding. Clients send a handful of distinct
+# headers, and parsing one costs more than serving the precompressed body
+_CHOICE     = {}
+_CHOICE_MAX = 1024
+
+
+def negotiate(offered: tuple):
+    """The best of `offered` for this request's Accept-Encoding, None → identity."""
+    key = (request.headers.get("Accept-Encoding", ""), offered)
+    try:
+        return _CHOICE[key]
+    except KeyError:
+        choice = request.accept_encodings.best_match(offered)
+        if len(_CHOICE) < _CHOICE_MAX:
+            _CHOICE[key] = choice
+        return choice
+
+
+class Asset:
+    """One body with its precompressed variants; response() negotiates the encoding and answers 304s."""
+
+    def __init__(self, body: bytes, mimetype: str, cache_control: str, min_bytes: int = 256):
+        self.mimetype      = mimetype
+        self.cache_control = cache_control
+        self.etag          = hashlib.sha256(body).hexdigest()[:16]
+        self.variants      = {"identity": body}
+        if len(body) >= min_bytes:
+            encoded = {"gzip": gzip.compress(body, 9, mtime=0)}
+            if brotli is not None:
+                encoded["br"] = brotli.compress(body, quality=11)
+            self.variants.update({enc: data for enc, data in encoded.items() if len(data) < len(body)})
+        # Smallest first, so an Accept-Encoding tie goes to the smaller variant
+        self.encodings = tuple(sorted((e for e in self.variants if e != "identity"), key=lambda e: len(self.variants[e])))
+
+    def response(self) -> Response:
+        headers = {"Cache-Control": self.cache_control, "ETag": f'W/"{self.etag}"', "Vary": "Accept-Encoding"}
+        if "If-None-Match" in request.headers and request.if_none_match.contains_weak(self.etag):
+            return Response(status=304, headers=headers)
+        encoding = negotiate(self.encodings)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding or "identity"], mimetype=self.mimetype, headers=headers)
+
+
+class AssetStore:
+    """
+    pages[name] → Asset for pre-encoded bodies (add()); page(name, render) → Asset
+    for a template rendered under this request's SCRIPT_NAME prefix;
+    static[hashed path] → Asset for every file under static_dir, url(path) → its hashed URL.
+    """
+
+    def __init__(self, static_dir: str, min_bytes: int = 256):
+        self.min_bytes = min_bytes
+        self.pages     = {}
+        self.rendered  = {}   # (name, script root) → Asset
+        self.static    = {}
+        self.urls      = {}
+        for root, _, files in os.walk(static_dir):
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                path = os.path.relpath(full, static_dir).replace(os.sep, "/")
+                with open(full, "rb") as f:
+                    asset = Asset(f.read(), mimetypes.guess_type(name)[0] or "application/octet-stream",
+                                  IMMUTABLE, min_bytes)
+                stem, ext = os.path.splitext(path)
+                hashed    = f"{stem}.{asset.etag[:10]}{ext}"
+                self.static[hashed] = asset
+                self.urls[path]     = f"/assets/{hashed}"
+
+    @classmethod
+    def from_env(cls, static_dir: str):
+        if os.environ.get("MEDBOT_ASSETS", "on").lower() == "off":
+            return None
+        return cls(static_dir, int(os.environ.get("MEDBOT_ASSET_MIN_BYTES", 256)))
+
+    def url(self, path: str) -> str:
+        """Hashed URL of static/<path> under this request's prefix (for templates: {{ asset_url('css/style.css') }})."""
+        return request.script_root + self.urls[path]
+
+    def add(self, name: str, body: bytes, mimetype: str, cache_control: str = REVALIDATE) -> Asset:
+        asset = self.pages[name] = Asset(body, mimetype, cache_control, self.min_bytes)
+        return asset
+
+    def page(self, name: str, render) -> Asset:
+        """HTML page `name` for this request's SCRIPT_NAME prefix; render() → its bytes, called once per prefix."""
+        key   = (name, request.script_root)
+        asset = self.rendered.get(key)
+        if asset is None:
+            asset = Asset(render(), "text/html", REVALIDATE, self.min_bytes)
+            if len(self.rendered) < MAX_ROOTS * 2:   # beyond that, an unexpected prefix is rendered per request
+                self.rendered[key] = asset
+        return asset
+
+    def stats(self) -> dict:
+        every = {**self.pages, **{f"{root}/{name}": a for (name, root), a in self.rendered.items()},
+                 **{f"/assets/{k}": v for k, v in self.static.items()}}
+        return {"brotli": brotli is not None,
+                "assets": {name: {enc: len(data) for enc, data in a.variants.items()} for name, a in every.items()}}
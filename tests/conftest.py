@@ -0,0 +1,34 @@
+import os, sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py reads its configuration at import: pin it once for every test that imports it.
+# Groq points at a closed port, so anything that reaches Stage 2 gets route "fallback".
+APP_ENV = {
+    "GROQ_API_KEY":            "test",
+    "GROQ_BASE_URL":           "http://127.0.0.1:9",
+    "MEDBOT_LLM_RETRIES":      "0",
+    "MEDBOT_LLM_DEADLINE":     "2",
+    "MEDBOT_BREAKER_FAILURES": "0",
+    "MEDBOT_PROMPT_LOG":       "0",
+    "MEDBOT_CACHE":            "off",
+    "MEDBOT_SESSIONS":         "memory",
+    "MEDBOT_FAST_START":       "0",
+}
+
+
+@pytest.fixture(scope="session")
+def medbot():
+    """The imported app module (needs the trained models: python train.py)."""
+    if not os.path.exists(os.path.join(ROOT, "models", "model_meta.json")):
+        pytest.skip("models/ not built — run python train.py")
+    os.environ.update(APP_ENV)
+    import app
+    return app
+
+
+@pytest.fixture
+def client(medbot):
+    return medbot.app.test_client()
@@ -0,0 +1,39 @@
+import pytest
+
+
+@pytest.fixture
+def whoami(medbot):
+    def ask(headers=None, remote="10.0.0.1"):
+        with medbot.app.test_request_context(headers=headers or {}, environ_base={"REMOTE_ADDR": remote}):
+            return medbot.client_id()
+    return ask
+
+
+@pytest.fixture
+def behind_router(medbot, monkeypatch):
+    monkeypatch.setattr(medbot, "PROXY_HOPS", 1)
+
+
+def test_header_is_not_trusted_without_a_proxy(whoami):
+    assert whoami({"X-Forwarded-For": "203.0.113.7"}) == "10.0.0.1"
+    assert whoami({"X-Forwarded-For": "198.51.100.2"}, remote="10.0.0.2") == "10.0.0.2"
+
+
+def test_users_behind_the_router_are_told_apart(whoami, behind_router):
+    assert whoami({"X-Forwarded-For": "203.0.113.7"}) == "203.0.113.7"
+    assert whoami({"X-Forwarded-For": "198.51.100.2"}) == "198.51.100.2"
+
+
+def test_forged_hops_are_ignored(whoami, behind_router):
+    assert whoami({"X-Forwarded-For": "1.2.3.4, 203.0.113.7"}) == "203.0.113.7"
+
+
+def test_more_trusted_proxies(whoami, medbot, monkeypatch):
+    monkeypatch.setattr(medbot, "PROXY_HOPS", 2)
+    assert whoami({"X-Forwarded-For": "1.2.3.4, 203.0.113.7, 192.0.2.10"}) == "203.0.113.7"
+    assert whoami({"X-Forwarded-For": "203.0.113.7"}) == "203.0.113.7"
+
+
+def test_direct_connections_use_the_peer_address(whoami, behind_router):
+    assert whoami() == "10.0.0.1"
+    assert whoami({"X-Forwarded-For": " , "}) == "10.0.0.1"
@@ -0,0 +1,57 @@
+import numpy as np
+
+from cascade import Cascade, confidence_map, tune_cascade
+
+
+def test_confidence_map_puts_sharp_probabilities_on_the_target_scale():
+    rng    = np.random.RandomState(0)
+    target = rng.dirichlet([1.0] * 5, 500)            # flat, like the calibrated SVM
+    sharp  = target ** 6
+    sharp /= sharp.sum(axis=1, keepdims=True)         # same ranking, NB-like sharpness
+    scale  = confidence_map(sharp, target)
+    cascade = Cascade(None, [], 0.0, "NB", "SVM", confidence_map=scale)
+
+    p    = sharp.max(axis=1)
+    used = ["NB"] * 250 + ["SVM"] * 250
+    gate = cascade.gate(p, used)
+    assert np.allclose(gate[250:], p[250:])            # rows the target answered are left alone
+    assert np.abs(gate[:250] - target.max(axis=1)[:250]).mean() < 0.05   # rank, not exact, correspondence
+    assert (gate[:250] < p[:250]).mean() > 0.95
+
+
+def test_tune_cascade_maps_onto_the_best_model_whatever_the_target():
+    rng = np.random.RandomState(1)
+    y   = rng.randint(0, 3, 300)
+    oof = {name: rng.dirichlet([1.0] * 3, 300) for name in ("NB", "LR", "SVM")}
+    spec = tune_cascade(oof, y, "NB", "SVM", tolerance=1.0)
+    best = confidence_map(oof["NB"], oof["SVM"])["target"]
+    assert len(spec["confidence_map"]["first"]) == len(spec["confidence_map"]["target"]) == 101
+    assert spec["confidence_map"]["first"] == sorted(spec["confidence_map"]["first"])
+    assert spec["confidence_map"]["target"] == best
+    if spec["target"] == "ensemble":
+        assert spec["escalate_map"]["target"] == best
+    else:
+        assert "escalate_map" not in spec
+
+
+def test_escalated_ensemble_rows_are_mapped_onto_the_best_model_too():
+    rng      = np.random.RandomState(2)
+    best     = rng.dirichlet([1.0] * 5, 500)
+    ensemble = best ** 3
+    ensemble /= ensemble.sum(axis=1, keepdims=True)   # sharper than the best model, like the NB + LR + SVM mean
+    first    = confidence_map(ensemble, best)        # stand-in; only the escalated rows are checked
+    cascade  = Cascade(None, [], 0.0, "NB", "Ensemble", blend_first=True, confidence_map=first,
+                       escalate_map=confidence_map(ensemble, best))
+    p        = ensemble.max(axis=1)
+    gate     = cascade.gate(p, ["Ensemble"] * len(p))
+    assert np.abs(gate - best.max(axis=1)).mean() < 0.05
+    assert np.allclose(Cascade(None, [], 0.0, "NB", "SVM").gate(p, ["SVM"] * len(p)), p)   # the best model: as is
+
+
+def test_without_a_map_the_cascade_is_not_loaded(monkeypatch):
+    monkeypatch.setenv("MEDBOT_CASCADE", "1")
+    meta = {"best_model": "SVM", "cascade": {"first": "NB", "target": "best", "margin": 0.1, "files": {}}}
+    assert Cascade.from_env(meta, load_model=None) is None
+    scale = {"first": [0.0, 1.0], "target": [0.0, 1.0]}
+    meta["cascade"].update(target="ensemble", confidence_map=scale)   # mapped onto the ensemble, not the best model
+    assert Cascade.from_env(meta, load_model=None) is None
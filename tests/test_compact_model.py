@@ -0,0 +1,22 @@
+from compact_model import ResponseBlob, export_responses
+
+CATALOGUE = [("fever", ["Rest and fluids.", "See a doctor above 39 °C."]), ("greeting", ["Hello!"]), ("empty", [])]
+
+
+def test_responses_stream_from_an_iterator(tmp_path):
+    consumed = []
+
+    def rows():
+        for tag, responses in CATALOGUE:
+            consumed.append(tag)
+            yield tag, responses
+
+    export_responses(rows(), str(tmp_path))
+    blob = ResponseBlob(str(tmp_path))
+    assert consumed == ["fever", "greeting", "empty"]
+    assert dict(blob.items()) == dict(CATALOGUE)
+
+
+def test_a_mapping_still_works(tmp_path):
+    export_responses(dict(CATALOGUE), str(tmp_path))
+    assert ResponseBlob(str(tmp_path))["fever"][1] == "See a doctor above 39 °C."
@@ -0,0 +1,23 @@
+from knowledge_store import KnowledgeStore, build_store
+
+INTENTS = [{"tag": "greeting", "patterns": ["hello"], "responses": ["Hello!"]},
+           {"tag": "fallback", "patterns": ["?"], "responses": ["Sorry?"]}]
+
+
+def test_pickle_backend_falls_back_to_the_store_when_its_copy_is_missing(tmp_path, monkeypatch, capsys):
+    monkeypatch.delenv("MEDBOT_KNOWLEDGE", raising=False)
+    db, pkl = str(tmp_path / "knowledge.db"), tmp_path / "knowledge.pkl"
+    assert KnowledgeStore.from_env(db, [str(pkl)]) is None          # no store to fall back to
+    build_store(db, INTENTS)
+    store = KnowledgeStore.from_env(db, [str(pkl)])
+    assert store is not None and store["greeting"] == ["Hello!"]
+    assert "knowledge.pkl is missing" in capsys.readouterr().out
+    pkl.write_bytes(b"")
+    assert KnowledgeStore.from_env(db, [str(pkl)]) is None          # the copy is there: pickle backend
+
+
+def test_sqlite_backend_always_opens_the_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("MEDBOT_KNOWLEDGE", "sqlite")
+    db = str(tmp_path / "knowledge.db")
+    build_store(db, INTENTS)
+    assert KnowledgeStore.from_env(db).fallback == "fallback"
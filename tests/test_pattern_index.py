@@ -0,0 +1,33 @@
+import pytest
+
+from routing import FastPath, gate_confidence
+
+LIFTED = ["hello my face is drooping", "hello, i took too many pills", "hello i cant breathe well"]
+
+
+@pytest.fixture
+def voting(medbot, monkeypatch):
+    """The index with neighbour votes on, as the reviewer measured it."""
+    if medbot.pattern_index is None or medbot.cascade is not None:
+        pytest.skip("needs the pattern index and the single calibrated model")
+    monkeypatch.setattr(medbot.pattern_index, "weight", 0.5)
+    return medbot
+
+
+def test_votes_are_off_by_default(medbot):
+    assert not any(r.get("refined") for r in medbot.detect_intents(LIFTED))
+
+
+@pytest.mark.parametrize("message", LIFTED)
+def test_refined_rows_stay_below_the_routing_gates(voting, message):
+    ml_result = voting.detect_intent(message)
+    assert ml_result["refined"]
+    assert ml_result["confidence"] > ml_result["gate_confidence"]
+    assert gate_confidence(ml_result) < voting.CONFIDENCE_THRESHOLD * 100
+
+    lenient = FastPath({ml_result["tag"]: (0, 0)})
+    lenient.learn_social([("hello my face is drooping i took too many pills cant breathe well", "greeting")])
+    assert not lenient.accepts(ml_result, message)
+
+    messages = voting.prompt_budget.build(message, [], ml_result, voting.build_system_prompt)
+    assert "Knowledge Base Hints" not in messages[0]["content"]
@@ -0,0 +1,41 @@
+import threading
+
+from prompt_table import PromptTable
+
+
+def ml(tag, model, confidence=41.3):
+    return {"tag": tag, "model_used": model, "confidence": confidence}
+
+
+def test_cascade_rows_reuse_the_warmed_head():
+    table = PromptTable("BASE")
+    table.warm(["greeting", "fever"], lambda tag: (f"{tag} hint",))
+    warmed = table.stats()["misses"]
+    nb, svm = ml("fever", "NB"), ml("fever", "SVM (calibrated)")
+    assert table.render(nb, ("fever hint",)) != table.render(svm, ("fever hint",))
+    assert table.render(nb, ("fever hint",)).startswith(table.render(svm, ("fever hint",)).rsplit("Model Used", 1)[0])
+    assert table.stats()["misses"] == warmed
+    assert table.stats()["entries"] == 2
+
+
+def test_tokens_cover_the_per_request_lines():
+    from prompt_budget import estimate_tokens
+    table, row = PromptTable("BASE"), ml("fever", "NB")
+    head, head_tokens = table._entry("fever", ("a",))
+    assert table.tokens(row, ("a",)) == head_tokens + estimate_tokens(table.render(row, ("a",))[len(head):])
+
+
+def test_counters_are_exact_under_concurrency():
+    table = PromptTable("BASE")
+    table.warm(["fever"], lambda tag: ())
+
+    def hammer():
+        for _ in range(2000):
+            table.tokens(ml("fever", "NB"), ())
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert table.stats()["hits"] == 16000 and table.stats()["misses"] == 1
@@ -0,0 +1,167 @@
+import asyncio, time
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, LLMGuard, LLMUnavailable
+
+
+class Upstream:
+    """Fake Groq call: fn(timeout) answers, raises or hangs, one scripted outcome per attempt."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls    = 0
+
+    def __call__(self, timeout):
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if outcome == "hang":          # a client that honours its timeout
+            time.sleep(timeout)
+            raise TimeoutError("attempt timed out")
+        if isinstance(outcome, float):
+            time.sleep(outcome)
+            return "late"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class Status(Exception):
+    """Stand-in for the groq errors LLM_RETRY_ON lists (connection, 429, 5xx)."""
+
+
+def guard(**kwargs):
+    return LLMGuard(**{"deadline": 2.0, "attempt_timeout": 1.0, "retries": 2, "backoff": 0.02,
+                       "retry_on": (Status,), **kwargs})
+
+
+def test_deadline_covers_every_attempt():
+    g, t0 = guard(deadline=0.3, retries=5), time.monotonic()
+    with pytest.raises(LLMUnavailable) as caught:
+        g.call(Upstream("hang"))
+    assert time.monotonic() - t0 < 0.5
+    assert caught.value.reason in ("deadline", "failed")   # "failed" when the next backoff would overrun
+
+
+def test_attempt_timeout_is_the_smaller_of_its_own_and_what_is_left():
+    seen = []
+    guard(deadline=0.5, attempt_timeout=5.0).call(lambda timeout: seen.append(timeout))
+    assert 0.4 < seen[0] <= 0.5
+
+
+def test_retries_back_off_and_then_succeed(monkeypatch):
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)   # longest jittered pause
+    g, upstream, t0 = guard(backoff=0.05), Upstream(Status("503"), Status("503"), "ok"), time.monotonic()
+    assert g.call(upstream) == "ok"
+    assert upstream.calls == 3 and g.counts["retries"] == 2
+    assert time.monotonic() - t0 >= 0.05 + 0.10                                # base, then doubled
+    assert g.breaker.state == "closed"
+
+
+def test_retries_are_bounded():
+    g, upstream = guard(retries=2, breaker=CircuitBreaker(5)), Upstream(Status("500"))
+    with pytest.raises(LLMUnavailable) as caught:
+        g.call(upstream)
+    assert caught.value.reason == "failed" and isinstance(caught.value.cause, Status)
+    assert upstream.calls == 3
+    assert g.breaker.info()["consecutive_failures"] == 1
+
+
+def test_client_errors_propagate_without_touching_the_breaker():
+    g, upstream = guard(breaker=CircuitBreaker(1)), Upstream(ValueError("400 bad request"))
+    with pytest.raises(ValueError):
+        g.call(upstream)
+    assert upstream.calls == 1
+    assert g.breaker.state == "closed" and g.breaker.info()["consecutive_failures"] == 0
+
+
+def test_client_error_on_the_probe_frees_the_probe_slot():
+    breaker = CircuitBreaker(1, cooldown=0.0)
+    breaker.failure()
+    g = guard(breaker=breaker)
+    with pytest.raises(ValueError):
+        g.call(Upstream(ValueError("400")))
+    assert breaker.state == "half_open"
+    assert g.call(Upstream("ok")) == "ok" and breaker.state == "closed"
+
+
+def primed(**kwargs):
+    g = guard(hedge=50, hedge_min=0.02, **kwargs)
+    for _ in range(20):
+        g._succeeded(0.01)
+    return g
+
+
+def test_hedge_fires_and_the_faster_request_wins():
+    g, upstream, t0 = primed(), Upstream(0.5, "fast"), time.monotonic()
+    assert g.call(upstream) == "fast"
+    assert time.monotonic() - t0 < 0.3
+    assert g.counts["hedges"] == 1 and g.counts["hedge_wins"] == 1
+
+
+def test_async_hedge_fires_and_cancels_the_loser():
+    started, cancelled = [], []
+
+    async def upstream(timeout):
+        started.append(timeout)
+        if len(started) == 1:
+            try:
+                await asyncio.sleep(0.5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return "late"
+        return "fast"
+
+    g = primed()
+    assert asyncio.run(g.acall(upstream)) == "fast"
+    assert g.counts["hedges"] == 1 and g.counts["hedge_wins"] == 1 and cancelled
+
+
+def test_async_timeouts_are_retried_then_give_up():
+    async def upstream(timeout):
+        await asyncio.sleep(10)
+
+    g = guard(deadline=0.4, attempt_timeout=0.1, retries=1, breaker=CircuitBreaker(1))
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(g.acall(upstream))
+    assert g.counts["retries"] == 1 and g.breaker.state == "open"
+
+
+def test_breaker_cycles_open_half_open_closed():
+    breaker = CircuitBreaker(2, cooldown=0.05)
+    breaker.failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()                                # one probe at a time
+    breaker.failure()                                         # failed probe → open again
+    assert breaker.state == "open" and breaker.opened == 2
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_open_breaker_refuses_without_calling_upstream():
+    breaker = CircuitBreaker(1, cooldown=60)
+    breaker.failure()
+    g, upstream = guard(breaker=breaker), Upstream("ok")
+    with pytest.raises(LLMUnavailable) as caught:
+        g.call(upstream)
+    assert caught.value.reason == "breaker_open" and upstream.calls == 0
+    assert g.counts["rejected"] == 1
+
+
+def test_api_answers_from_the_kb_while_the_breaker_is_open(client, medbot, monkeypatch):
+    breaker = CircuitBreaker(1, cooldown=60)
+    breaker.failure()
+    g = LLMGuard(breaker=breaker, retry_on=medbot.LLM_RETRY_ON)
+    monkeypatch.setattr(medbot, "llm_guard", g)
+    monkeypatch.setattr(medbot, "fast_path", None)
+    body = client.post("/api/chat", json={"message": "what is a normal blood pressure"}).get_json()
+    assert body["route"] == "fallback"
+    assert medbot.knowledge["intent_map"]["blood_pressure"][0] in body["response"]
+    assert g.counts["rejected"] == 1
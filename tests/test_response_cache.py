@@ -0,0 +1,44 @@
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from response_cache import MemoryBackend, ResponseCache, fuzzy_guard, normalize
+
+CACHED = ["my blood sugar is 300", "can i take 2 paracetamol", "is it safe to take ibuprofen",
+          "i have a fever of 39", "what is a normal blood pressure range"]
+
+
+@pytest.fixture
+def cache():
+    tfidf = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4)).fit(CACHED)
+    cache = ResponseCache(MemoryBackend(1 << 20, 3600), vectorize=tfidf.transform, similarity=0.9)
+    for message in CACHED:
+        cache.put(message, "topic", [], f"answer to {message}")
+    return cache
+
+
+@pytest.mark.parametrize("asked", ["my blood sugar is 30", "can i take 20 paracetamol",
+                                   "is it unsafe to take ibuprofen", "is it not safe to take ibuprofen",
+                                   "i have a fever of 41"])
+def test_no_fuzzy_hit_when_numbers_or_negations_differ(cache, asked):
+    assert cache.get(asked, "topic", []) is None
+    assert cache.similar_hits == 0
+
+
+def test_fuzzy_hit_for_a_harmless_rewording(cache):
+    assert cache.get("what is a normal blood pressure ranges", "topic", []) == \
+        "answer to what is a normal blood pressure range"
+    assert cache.similar_hits == 1
+
+
+def test_exact_hit_ignores_case_and_punctuation(cache):
+    assert cache.get("My blood sugar is 300!", "topic", []) == "answer to my blood sugar is 300"
+
+
+def test_fuzzy_guard_reads_contractions():
+    assert fuzzy_guard(normalize("I don't have a fever")) != fuzzy_guard(normalize("I do have a fever"))
+
+
+def test_fuzzy_matching_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("MEDBOT_CACHE_SIMILARITY", raising=False)
+    monkeypatch.setenv("MEDBOT_CACHE", "memory")
+    assert ResponseCache.from_env(vectorize=lambda texts: None).similarity == 0
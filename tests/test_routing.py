@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from routing import FastPath, tune_fast_path
+
+SOCIAL = [("hello", "greeting"), ("hi", "greeting"), ("good morning", "greeting"),
+          ("thanks", "thanks"), ("thank you", "thanks"), ("who are you", "who_are_you"),
+          ("heart attack now", "emergency"), ("i have a headache", "headache")]
+INTENT_MAP = {"greeting": ["Hello! How can I help?"], "thanks": ["You're welcome!"],
+              "who_are_you": ["I'm MedBot."], "emergency": ["Call your local emergency number now."]}
+
+
+def ml(tag, confidence, second=1.0):
+    return {"tag": tag, "confidence": confidence, "top3": [(tag, confidence), ("other", second)]}
+
+
+@pytest.fixture
+def lenient():
+    """The old, low thresholds: only the content guard stands between a symptom and a canned reply."""
+    fast = FastPath({"greeting": (35, 20), "thanks": (40, 20), "who_are_you": (45, 20), "emergency": (30, 10)})
+    fast.learn_social(SOCIAL)
+    return fast
+
+
+@pytest.mark.parametrize("message, tag, confidence", [
+    ("good morning, my chest hurts",  "greeting", 40.8),
+    ("thanks, i cant breathe well",   "thanks",   46.4),
+    ("hello my face is drooping",     "greeting", 45.5),
+    ("hello, i took too many pills",  "greeting", 44.9),
+    ("hello i cant breathe well",     "greeting", 37.3),
+    ("hi, i took 12 tablets",         "greeting", 99.0),
+])
+def test_social_intent_with_symptom_is_rejected(lenient, message, tag, confidence):
+    assert lenient.answer(ml(tag, confidence), INTENT_MAP, message) is None
+
+
+@pytest.mark.parametrize("message, tag", [("Hello!", "greeting"), ("good morning there", "greeting"),
+                                          ("Thank you so much", "thanks"), ("who are you?", "who_are_you")])
+def test_purely_social_message_is_accepted(lenient, message, tag):
+    assert lenient.answer(ml(tag, 90.0), INTENT_MAP, message) == INTENT_MAP[tag][0]
+
+
+def test_social_intents_need_the_message_and_vocabulary():
+    fast = FastPath({"greeting": (35, 20)})
+    assert not fast.accepts(ml("greeting", 90.0), "hello")      # nothing learned yet
+    fast.learn_social(SOCIAL)
+    assert not fast.accepts(ml("greeting", 90.0))               # no message text
+    assert fast.accepts(ml("greeting", 90.0), "hello")
+
+
+@pytest.fixture
+def no_env(monkeypatch):
+    for name in ("MEDBOT_FASTPATH", "MEDBOT_FASTPATH_MARGIN", "MEDBOT_FASTPATH_MAX_WORDS"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_untuned_defaults_demand_near_certainty(no_env):
+    fast = FastPath.from_env()
+    fast.learn_social(SOCIAL)
+    assert all(threshold >= 85 and margin >= 50 for threshold, margin in fast.rules.values())
+    assert not fast.accepts(ml("greeting", 60.0), "hello")
+    assert not fast.accepts(ml("emergency", 88.0, second=45.0), "heart attack now")
+    assert fast.accepts(ml("emergency", 92.0), "heart attack now")
+
+
+TUNED = {"rules": {"greeting": {"min_confidence": 20.0, "min_margin": 5.0},
+                   "emergency": {"min_confidence": 30.0, "min_margin": 15.0}}}
+
+
+def test_tuned_thresholds_apply_unless_the_environment_sets_them(no_env, monkeypatch):
+    assert FastPath.from_env(TUNED).rules == {"greeting": (20.0, 5.0), "emergency": (30.0, 15.0)}
+    monkeypatch.setenv("MEDBOT_FASTPATH", "greeting:50")
+    assert FastPath.from_env(TUNED).rules == {"greeting": (50.0, 50.0)}
+    monkeypatch.setenv("MEDBOT_FASTPATH", "off")
+    assert FastPath.from_env(TUNED) is None
+
+
+def test_tuning_keeps_every_misfire_out():
+    classes = ["emergency", "greeting", "headache"]
+    texts   = ["hello", "hi", "good morning", "hey", "collapsed", "not breathing", "hello doctor", "head hurts"]
+    y       = np.array([1, 1, 1, 1, 0, 0, 2, 2])
+    oof     = np.array([[.1, .6, .3], [.1, .5, .4], [.1, .4, .5], [.2, .7, .1],   # "good morning" missed
+                        [.5, .2, .3], [.3, .2, .5],                                # "not breathing" missed
+                        [.1, .45, .45], [.55, .05, .4]])                           # misfires
+    rules   = tune_fast_path(oof, y, classes, texts, quantile=0.0)["rules"]
+    assert rules["greeting"]["min_confidence"] == 50.0    # lowest hit; "hello doctor" is not social talk
+    assert rules["greeting"]["min_margin"] == 10.0
+    assert rules["emergency"]["min_confidence"] == 55.1   # raised above "head hurts" (55%), over the hit at 50%
+    assert rules["emergency"]["min_margin"] == 20.0
+    assert "headache" not in rules
+
+
+@pytest.mark.parametrize("message, tag", [("hello", "greeting"), ("good morning", "greeting"), ("thank you so much", "thanks"),
+                                          ("who are you", "who_are_you"), ("someone collapsed", "emergency"),
+                                          ("he is not breathing", "emergency"), ("call an ambulance", "emergency")])
+def test_api_answers_real_social_and_emergency_messages_from_the_kb(client, medbot, message, tag):
+    if medbot.fast_path is None or "fast_path" not in medbot.model_meta:
+        pytest.skip("fast path off, or models trained before the fast-path gates were tuned")
+    body = client.post("/api/chat", json={"message": message}).get_json()
+    assert body["route"] == "kb"
+    assert body["response"] == medbot.knowledge["intent_map"][tag][0]
+
+
+@pytest.mark.parametrize("message", ["good morning, my chest hurts", "thanks, i cant breathe well",
+                                     "hello my face is drooping", "hello, i took too many pills"])
+def test_api_never_answers_symptoms_from_the_fast_path(client, medbot, monkeypatch, message):
+    lenient = FastPath({"greeting": (35, 20), "thanks": (40, 20)})
+    lenient.learn_social(medbot._PATTERNS)
+    monkeypatch.setattr(medbot, "fast_path", lenient)
+    body = client.post("/api/chat", json={"message": message}).get_json()
+    assert body["route"] != "kb"
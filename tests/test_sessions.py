@@ -0,0 +1,105 @@
+import asyncio, json, time
+
+import pytest
+
+from sessions import MemorySessions, SQLiteSessions, clip, sessions_from_env
+
+
+def test_turns_are_clipped_to_the_byte_cap():
+    store = MemorySessions(turns=10, ttl=60, max_sessions=10, turn_bytes=10)
+    store.append("s", ("user", "é" * 20))
+    assert store.history("s")[0]["content"] == "é" * 5
+    assert clip("abcé", 4) == "abc"
+
+
+def test_memory_store_evicts_least_recently_used_past_the_byte_cap():
+    store = MemorySessions(turns=10, ttl=60, max_sessions=100, turn_bytes=100, max_bytes=250)
+    for sid in ("a", "b", "c"):
+        store.append(sid, ("user", "x" * 100))
+    assert store.history("a") is None
+    assert store.history("c") is not None
+    assert store.info()["bytes"] <= 250
+
+
+def test_ring_buffer_bytes_follow_dropped_turns():
+    store = MemorySessions(turns=2, ttl=60, max_sessions=10)
+    for n in range(5):
+        store.append("s", ("user", "x" * 10))
+    assert store.info()["bytes"] == 20
+
+
+def test_several_workers_default_to_the_shared_store(monkeypatch, tmp_path):
+    monkeypatch.delenv("MEDBOT_SESSIONS", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    monkeypatch.setenv("MEDBOT_SESSION_PATH", str(tmp_path / "sessions.db"))
+    assert isinstance(sessions_from_env(), SQLiteSessions)
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert isinstance(sessions_from_env(), MemorySessions)
+
+
+# ── Restart handling (app.open_session) ─────────────────────────────────────────
+HISTORY = [{"role": "user", "content": "I was diagnosed with type 2 diabetes"},
+           {"role": "assistant", "content": "Metformin is usually the first medicine."}]
+
+
+def test_lost_session_asks_a_capable_client_to_resend(client):
+    r = client.post("/api/chat", json={"message": "what dose should I start with?", "session_id": "gone",
+                                       "can_resend": True})
+    assert r.status_code == 409
+    assert r.get_json() == {"session_restarted": True, "resend_history": True}
+
+
+def test_resent_history_seeds_the_new_session(client, medbot):
+    r = client.post("/api/chat", json={"message": "what dose should I start with?", "session_id": "gone",
+                                       "can_resend": True, "history": HISTORY})
+    body = r.get_json()
+    assert r.status_code == 200 and body["session_restarted"] is True
+    turns = medbot.session_store.history(body["session_id"])
+    assert turns[:2] == HISTORY
+    assert turns[2] == {"role": "user", "content": "what dose should I start with?"}
+
+
+def test_lost_session_on_the_stream_route(client):
+    r = client.post("/api/chat/stream", json={"message": "and the dose?", "session_id": "gone", "can_resend": True})
+    assert 'event: meta\ndata: {"session_restarted": true, "resend_history": true}' in r.get_data(as_text=True)
+
+
+def test_older_clients_still_get_a_fresh_session(client):
+    r = client.post("/api/chat", json={"message": "what dose should I start with?", "session_id": "gone"})
+    assert r.status_code == 200 and r.get_json()["session_restarted"] is True
+
+
+# ── ASGI: session I/O off the event loop ─────────────────────────────────────────
+@pytest.mark.parametrize("path", ["/api/chat", "/api/chat/stream"])
+def test_asgi_session_io_does_not_block_the_loop(medbot, monkeypatch, path):
+    asgi = pytest.importorskip("asgi")
+    slow = medbot.open_session
+
+    def contended(data):   # a SQLite writer holding the lock
+        time.sleep(0.3)
+        return slow(data)
+
+    monkeypatch.setattr(medbot, "open_session", contended)
+    body = json.dumps({"message": "hello"}).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.create_task(ticker())
+        await asgi.app({"type": "http", "method": "POST", "path": path, "headers": []}, receive, send)
+        beat.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 15
@@ -0,0 +1,140 @@
+import asyncio, json, threading, time
+import pytest
+
+from admission import Shed
+from singleflight import SingleFlight
+
+
+def concurrently(n, target):
+    results, threads = [None] * n, []
+    for i in range(n):
+        def go(i=i):
+            try:
+                results[i] = target(i)
+            except Exception as e:
+                results[i] = e
+        threads.append(threading.Thread(target=go))
+    for t in threads:
+        t.start()
+        time.sleep(0.02)   # thread 0 leads, the rest arrive while it runs
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_followers_retry_after_the_leader_is_shed():
+    flight, calls = SingleFlight(), []
+
+    def request(i):
+        def pipeline():
+            calls.append(i)
+            time.sleep(0.2)
+            if i == 0:
+                raise Shed("rate_limited", 1)
+            return f"answer for {i}"
+        return flight.run("key", pipeline, retry_on=(Shed,))
+
+    results = concurrently(4, request)
+    assert isinstance(results[0], Shed)
+    assert len(calls) == 2 and calls[0] == 0   # one follower led the retry, the others shared it
+    assert sorted(results[1:], key=lambda r: r[1]) == [(f"answer for {calls[1]}", False)] + \
+                                                       [(f"answer for {calls[1]}", True)] * 2
+    assert flight.counts["follower_retries"] == 3
+
+
+def test_followers_share_other_errors():
+    flight = SingleFlight()
+
+    def request(i):
+        def pipeline():
+            time.sleep(0.2)
+            raise RuntimeError(f"boom {i}")
+        return flight.run("key", pipeline, retry_on=(Shed,))
+
+    results = concurrently(3, request)
+    assert [str(r) for r in results] == ["boom 0"] * 3
+    assert flight.counts["follower_retries"] == 0
+
+
+def test_stream_fans_out_to_followers():
+    flight, calls = SingleFlight(), []
+
+    def request(i):
+        def pipeline():
+            calls.append(i)
+            for word in ("a", "b", "c"):
+                time.sleep(0.05)
+                yield word
+        return list(flight.stream("key", pipeline))
+
+    assert concurrently(3, request) == [["a", "b", "c"]] * 3   # late followers replay what they missed
+    assert calls == [0] and flight.counts["coalesced_streams"] == 2
+
+
+def test_stream_followers_retry_after_the_leader_is_shed():
+    flight, calls = SingleFlight(), []
+
+    def request(i):
+        def pipeline():
+            calls.append(i)
+            time.sleep(0.2)
+            if i == 0:
+                raise Shed("rate_limited", 1)
+            yield f"answer for {i}"
+        return list(flight.stream("key", pipeline, retry_on=(Shed,)))
+
+    results = concurrently(3, request)
+    assert isinstance(results[0], Shed)
+    assert len(calls) == 2 and results[1] == results[2] == [f"answer for {calls[1]}"]
+
+
+def test_async_callers_share_one_call_and_one_stream():
+    flight, calls = SingleFlight(), []
+
+    async def answer():
+        calls.append("answer")
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def fragments():
+        calls.append("stream")
+        for word in ("a", "b"):
+            await asyncio.sleep(0.05)
+            yield word
+
+    async def collect(delay):
+        await asyncio.sleep(delay)
+        return [chunk async for chunk in flight.astream("stream", fragments)]
+
+    async def main():
+        answers = await asyncio.gather(*(flight.arun("answer", answer) for _ in range(3)))
+        streams = await asyncio.gather(collect(0), collect(0.07))   # the second joins after "a"
+        return answers, streams
+
+    answers, streams = asyncio.run(main())
+    assert sorted(answers) == [("ok", False), ("ok", True), ("ok", True)]
+    assert streams == [["a", "b"]] * 2
+    assert calls == ["answer", "stream"]
+
+
+def test_identical_streamed_chats_share_one_llm_call(medbot, monkeypatch):
+    if medbot.single_flight is None:
+        pytest.skip("single-flight off")
+    calls = []
+
+    def stream_llm_response(user_message, history, ml_result):
+        calls.append(user_message)
+        for word in ("Normal ", "is ", "below 120/80."):
+            time.sleep(0.1)
+            yield word
+
+    monkeypatch.setattr(medbot, "stream_llm_response", stream_llm_response)
+    monkeypatch.setattr(medbot, "fast_path", None)
+
+    def request(i):
+        body = medbot.app.test_client().post("/api/chat/stream", json={"message": "what is a normal blood pressure"})
+        return "".join(json.loads(line[6:])["text"] for line in body.get_data(as_text=True).splitlines()
+                       if line.startswith("data: ") and '"text"' in line)
+
+    assert concurrently(3, request) == ["Normal is below 120/80."] * 3
+    assert len(calls) == 1
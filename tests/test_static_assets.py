@@ -0,0 +1,31 @@
+import re
+
+import pytest
+
+
+@pytest.fixture
+def assets(medbot):
+    if medbot.assets is None:
+        pytest.skip("MEDBOT_ASSETS=off")
+    return medbot.assets
+
+
+def links(html: str) -> list:
+    return re.findall(r'(?:href|src)="(/[^"]*)"|fetch\(\'(/[^\']*)\'', html)
+
+
+def test_pages_carry_the_script_name_prefix(client, assets):
+    page = client.get("/", base_url="http://localhost/medbot").get_data(as_text=True)
+    css  = re.search(r'href="([^"]*style[^"]*\.css)"', page).group(1)
+    assert css.startswith("/medbot/assets/css/style.")
+    assert all(url.startswith("/medbot/") for pair in links(page) for url in pair if url)
+    assert client.get(css[len("/medbot"):]).status_code == 200
+
+    chat = client.get("/chat", base_url="http://localhost/medbot").get_data(as_text=True)
+    assert "fetch('/medbot/api/chat/stream'" in chat
+
+
+def test_unprefixed_pages_are_unchanged(client, assets):
+    page = client.get("/").get_data(as_text=True)
+    assert re.search(r'href="/assets/css/style\.[0-9a-f]{10}\.css"', page)
+    assert ("index.html", "") in assets.rendered and ("index.html", "/medbot") in assets.rendered
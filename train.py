@@ -6,114 +6,384 @@ Trains & evaluates 3 ML classifiers:
   3. Logistic Regression                  — Interpretable
 
 Best model (by accuracy) is saved as the production model.
-Run: python train.py
+An alternative "hashed" inference engine (stateless HashingVectorizer + stored
+idf + calibrated LinearSVC, no vocabulary) is trained alongside; start app.py
+with MEDBOT_ENGINE=hashed to use it. Both engines' accuracy, per-message
+latency and size are reported in model_meta.json under "engines".
+
+All three candidates share the same char n-gram TF-IDF settings, so the
+feature matrix of every CV fold is computed once and reused by all of them.
+Feature extraction, the (candidate × fold) CV fits and the final refits run on
+a process pool when --jobs > 1; wall time per stage is written to
+model_meta.json under "timings".
+
+Every run leaves its fitted feature spaces and fold models in
+models/.train_cache; with --incremental, an edit to a few intents only
+re-transforms their patterns and updates the affected fits (see train_cache.py).
+
+The out-of-fold probabilities of the tfidf candidates also tune the Stage 1
+cascade (cascade.py, MEDBOT_CASCADE=1): the smallest Naive Bayes top-2 margin
+below which messages are escalated, such that the cascade's accuracy stays
+within --cascade-tolerance of the best model; saved under "cascade". The best
+model's out-of-fold probabilities also set the knowledge-base fast path's
+per-intent confidence and margin gates (routing.tune_fast_path); saved under
+"fast_path".
+
+The catalogue is read from an indexed SQLite knowledge store (knowledge_store.py):
+models/knowledge.db is built from knowledge_base.INTENTS, or copied from --store
+for catalogues too large for a Python literal. Patterns are streamed from it one
+intent at a time; app.py reads responses from it with MEDBOT_KNOWLEDGE=sqlite.
+Responses are only copied where app.py will look for them, judged by the same
+MEDBOT_KNOWLEDGE the app reads: with "pickle" (the default) knowledge.pkl and
+models/compact/responses.* are written, the latter streamed from the store;
+with "sqlite" neither is (stale copies are removed) and the catalogue is
+never held in memory. An app left on "pickle" then reads knowledge.db, with a
+warning (KnowledgeStore.from_env).
+
+Run: python train.py [--jobs N] [--incremental] [--cascade-tolerance T] [--store PATH]   (N = -1 → one process per CPU)
 """
-import os, json, joblib, numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+import os, json, time, pickle, argparse, joblib, sklearn, numpy as np
+from collections import Counter
+from contextlib import contextmanager
+from joblib import Parallel, delayed
+from scipy.sparse import vstack
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
 from sklearn.svm import LinearSVC
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.linear_model import LogisticRegression
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import cross_val_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.metrics import accuracy_score
 from sklearn.pipeline import Pipeline
-from knowledge_base import INTENTS
-
-os.makedirs("models", exist_ok=True)
-
-# ── Build corpus ──────────────────────────────────────────────────────────────
-corpus, labels = [], []
-for intent in INTENTS:
-    for pattern in intent["patterns"]:
-        corpus.append(pattern.lower())
-        labels.append(intent["tag"])
-
-le = LabelEncoder()
-y  = le.fit_transform(labels)
-
-print(f"\n📊 Dataset: {len(corpus)} samples | {len(le.classes_)} classes\n")
-
-# ── Shared TF-IDF Vectorizer ──────────────────────────────────────────────────
-tfidf = TfidfVectorizer(
-    analyzer      = "char_wb",   # character n-grams — typo tolerant
-    ngram_range   = (2, 4),
-    max_features  = 12000,
-    sublinear_tf  = True,
-    strip_accents = "unicode",
-)
-
-
-# ── Train & Evaluate each model ───────────────────────────────────────────────
-results = {}
-
-# 1. Support Vector Machine (LinearSVC)
-print("Training LinearSVC (SVM)...")
-svm_pipe = Pipeline([
-    ("tfidf", TfidfVectorizer(analyzer="char_wb", ngram_range=(2,4), max_features=12000, sublinear_tf=True)),
-    ("clf",   CalibratedClassifierCV(LinearSVC(C=1.0, max_iter=2000), cv=3)),
-])
-svm_scores = cross_val_score(svm_pipe, corpus, y, cv=5, scoring="accuracy")
-svm_pipe.fit(corpus, y)
-results["SVM (LinearSVC)"] = svm_scores.mean()
-print(f"  ✅ SVM Accuracy: {svm_scores.mean():.3f} ± {svm_scores.std():.3f}")
-
-# 2. Naive Bayes (MultinomialNB)
-print("Training Naive Bayes (MultinomialNB)...")
-nb_pipe = Pipeline([
-    ("tfidf", TfidfVectorizer(analyzer="char_wb", ngram_range=(2,4), max_features=12000, sublinear_tf=True, min_df=1)),
-    ("clf",   MultinomialNB(alpha=0.1)),
-])
-nb_scores = cross_val_score(nb_pipe, corpus, y, cv=5, scoring="accuracy")
-nb_pipe.fit(corpus, y)
-results["Naive Bayes (MultinomialNB)"] = nb_scores.mean()
-print(f"  ✅ NB Accuracy:  {nb_scores.mean():.3f} ± {nb_scores.std():.3f}")
-
-# 3. Logistic Regression
-print("Training Logistic Regression...")
-lr_pipe = Pipeline([
-    ("tfidf", TfidfVectorizer(analyzer="char_wb", ngram_range=(2,4), max_features=12000, sublinear_tf=True)),
-    ("clf",   LogisticRegression(C=5.0, max_iter=1000, solver="lbfgs")),
-])
-lr_scores = cross_val_score(lr_pipe, corpus, y, cv=5, scoring="accuracy")
-lr_pipe.fit(corpus, y)
-results["Logistic Regression"] = lr_scores.mean()
-print(f"  ✅ LR Accuracy:  {lr_scores.mean():.3f} ± {lr_scores.std():.3f}")
-
-# ── Pick best model ───────────────────────────────────────────────────────────
-best_name = max(results, key=results.get)
-best_pipe = {"SVM (LinearSVC)": svm_pipe, "Naive Bayes (MultinomialNB)": nb_pipe, "Logistic Regression": lr_pipe}[best_name]
-
-print(f"\n🏆 Best model: {best_name} ({results[best_name]:.3f} accuracy)")
-
-# ── Save models ───────────────────────────────────────────────────────────────
-intent_map = {i["tag"]: i["responses"] for i in INTENTS}
-fallback_tag = "fallback"
-
-joblib.dump(best_pipe,  "models/best_model.pkl")
-joblib.dump(le,         "models/label_encoder.pkl")
-joblib.dump(svm_pipe,   "models/svm_model.pkl")
-joblib.dump(nb_pipe,    "models/nb_model.pkl")
-joblib.dump(lr_pipe,    "models/lr_model.pkl")
-
-# Save metadata
-meta = {
-    "best_model": best_name,
-    "accuracy": {k: round(v, 4) for k, v in results.items()},
-    "num_intents": len(le.classes_),
-    "num_samples": len(corpus),
-    "classes": le.classes_.tolist(),
+from cascade import tune_cascade
+from compact_model import export_compact
+from knowledge_store import KnowledgeStore, build_store, copy_store
+from routing import tune_fast_path
+from train_cache import TrainCache, VOCAB_DRIFT, intent_fingerprint, sample_ids, unseen_share
+
+HASH_FEATURES = int(os.environ.get("MEDBOT_HASH_FEATURES", 2**14))
+CV_FOLDS      = 5
+KNOWLEDGE     = os.environ.get("MEDBOT_KNOWLEDGE", "pickle").lower()   # where app.py reads responses from
+
+
+# ── Feature extractors ────────────────────────────────────────────────────────
+def make_features(kind: str) -> Pipeline:
+    """Unfitted feature pipeline; "tfidf" is shared by the 3 candidates, "hashed" by the hashed engine."""
+    if kind == "hashed":
+        return Pipeline([
+            ("hash",  HashingVectorizer(analyzer="char_wb", ngram_range=(2,4), n_features=HASH_FEATURES,
+                                        alternate_sign=False, norm=None)),
+            ("tfidf", TfidfTransformer(sublinear_tf=True)),   # stored idf vector; l2 norm as in TfidfVectorizer
+        ])
+    return Pipeline([
+        ("tfidf", TfidfVectorizer(analyzer="char_wb", ngram_range=(2,4), max_features=12000, sublinear_tf=True)),
+    ])
+
+
+# ── Candidates ────────────────────────────────────────────────────────────────
+# name → (feature kind, unfitted classifier, file, short label)
+CANDIDATES = {
+    "SVM (LinearSVC)":             ("tfidf",  CalibratedClassifierCV(LinearSVC(C=1.0, max_iter=2000), cv=3), "svm_model.pkl", "SVM"),
+    "Naive Bayes (MultinomialNB)": ("tfidf",  MultinomialNB(alpha=0.1),                                      "nb_model.pkl",  "NB"),
+    "Logistic Regression":         ("tfidf",  LogisticRegression(C=5.0, max_iter=1000, solver="lbfgs"),      "lr_model.pkl",  "LR"),
+    "SVM (Hashed char n-grams)":   ("hashed", CalibratedClassifierCV(LinearSVC(C=1.0, max_iter=2000), cv=3), "hashed_model.pkl", "Hashed"),
 }
-with open("models/model_meta.json", "w") as f:
-    json.dump(meta, f, indent=2)
-
-joblib.dump({"intent_map": intent_map, "fallback": fallback_tag}, "models/knowledge.pkl")
-
-print("\n✅ Saved:")
-print("   models/best_model.pkl      ← Production model")
-print("   models/svm_model.pkl       ← SVM (LinearSVC)")
-print("   models/nb_model.pkl        ← Naive Bayes")
-print("   models/lr_model.pkl        ← Logistic Regression")
-print("   models/label_encoder.pkl   ← Class labels")
-print("   models/knowledge.pkl       ← Medical responses")
-print("   models/model_meta.json     ← Accuracy report")
-print("\n🎉 Training complete!")
+ENGINE_CANDIDATE = "SVM (Hashed char n-grams)"   # alternative engine, not eligible as best_model
+CASCADE_FIRST    = "Naive Bayes (MultinomialNB)" # answers first in the Stage 1 cascade
+STORE_PATH       = os.path.join("models", "knowledge.db")
+
+
+# ── Pool tasks (module-level so they pickle cheaply) ──────────────────────────
+def fit_features(kind, corpus, train_idx):
+    """Fit on the training rows; return the feature pipeline and the rows of every sample."""
+    feats = make_features(kind)
+    rest  = np.setdiff1d(np.arange(len(corpus)), train_idx)
+    X     = feats.fit_transform([corpus[i] for i in train_idx])
+    if len(rest):
+        X = vstack([X, feats.transform([corpus[i] for i in rest])]).tocsr()
+    return feats, X[np.argsort(np.concatenate([train_idx, rest]))]
+
+
+def fit_model(clf, X, y, train_ids, cached=None, X_test=None, y_test=None):
+    """Fit one (candidate, split), starting from the cached fit when the training set allows.
+    → (fitted classifier, how, test accuracy or None)"""
+    model, how = clone(clf), "refit"
+    if cached is not None and cached[0] == repr(clf):
+        _, old_ids, old = cached
+        added = ~np.isin(train_ids, old_ids)
+        if not added.any() and len(old_ids) == len(train_ids):
+            model, how = old, "reused"
+        elif isinstance(clf, MultinomialNB) and np.isin(old_ids, train_ids).all():
+            model, how = pickle.loads(pickle.dumps(old)).partial_fit(X[added], y[added]), "partial_fit"
+        elif isinstance(clf, LogisticRegression) and np.array_equal(old.classes_, np.unique(y)):
+            model.set_params(warm_start=True)
+            model.coef_, model.intercept_ = old.coef_.copy(), old.intercept_.copy()
+            model.fit(X, y).set_params(warm_start=False)
+            how = "warm_start"
+    if how == "refit":
+        model.fit(X, y)
+    score = accuracy_score(y_test, model.predict(X_test)) if X_test is not None else None
+    return model, how, score
+
+
+def engine_report(pipe, cv_accuracy: float, sample: list, latency_ms: float = None) -> dict:
+    """Accuracy, single-message latency (what /api/chat pays) and serialized size.
+    An incremental run passes the cached latency instead of measuring it again."""
+    if latency_ms is None:
+        pipe.predict_proba(sample[:5])
+        t0 = time.perf_counter()
+        for text in sample:
+            pipe.predict_proba([text])
+        latency_ms = (time.perf_counter() - t0) / len(sample) * 1000
+    return {
+        "cv_accuracy":    round(cv_accuracy, 4),
+        "latency_ms":     round(latency_ms, 3),
+        "model_bytes":    len(pickle.dumps(pipe, protocol=pickle.HIGHEST_PROTOCOL)),
+        "vocabulary_size": len(pipe.named_steps["tfidf"].vocabulary_) if hasattr(pipe.named_steps["tfidf"], "vocabulary_") else 0,
+    }
+
+
+@contextmanager
+def timed(timings: dict, stage: str):
+    """Record the wall time of one training stage as timings["<stage>_s"]."""
+    t0 = time.perf_counter()
+    yield
+    timings[f"{stage}_s"] = round(time.perf_counter() - t0, 3)
+
+
+def training_settings() -> dict:
+    """Everything the cached feature spaces depend on."""
+    return {"sklearn": sklearn.__version__,
+            "features": {kind: repr(make_features(kind)) for kind in ("tfidf", "hashed")}}
+
+
+def main(jobs: int, incremental: bool = False, cascade_tolerance: float = 0.01, store: str = None):
+    os.makedirs("models", exist_ok=True)
+    timings = {}
+    started = time.perf_counter()
+    pool    = Parallel(n_jobs=jobs, backend="loky")
+
+    # ── Knowledge store: the catalogue on disk ────────────────────────────────
+    with timed(timings, "store"):
+        if store:
+            copy_store(store, STORE_PATH)
+        else:
+            from knowledge_base import INTENTS
+            build_store(STORE_PATH, INTENTS)
+        kb = KnowledgeStore(STORE_PATH)
+
+    # ── Build corpus: patterns streamed one intent at a time, responses stay on disk ──
+    corpus, labels, ids, fingerprints = [], [], [], {}
+    for intent in kb.iter_intents():
+        fingerprints[intent["tag"]] = intent_fingerprint(intent)
+        ids += sample_ids([intent])
+        for pattern in intent["patterns"]:
+            corpus.append(pattern.lower())
+            labels.append(intent["tag"])
+    ids = np.array(ids)
+
+    le = LabelEncoder()
+    y  = le.fit_transform(labels)
+
+    print(f"\n📊 Dataset: {len(corpus)} samples | {len(le.classes_)} classes | jobs: {jobs}\n")
+
+    # ── Incremental? Only if the cached feature spaces still fit the data ─────
+    settings = training_settings()
+    cache, reason = TrainCache.load(settings) if incremental else (None, "full run requested")
+    changed  = []
+    if cache is not None:
+        changed = cache.changed_intents(fingerprints)
+        known   = set(cache.state["ids"])
+        added   = [text for text, sid in zip(corpus, ids) if sid not in known]
+        vocab   = cache.state["features"][("tfidf", "full")][0].named_steps["tfidf"]
+        drift   = unseen_share(added, vocab.vocabulary_, vocab.ngram_range)
+        if cache.state["classes"] != le.classes_.tolist():
+            cache, reason = None, "intents were added or removed"
+        elif drift > VOCAB_DRIFT:
+            cache, reason = None, f"{drift:.0%} of the new n-grams are outside the vocabulary"
+    mode = "incremental" if cache is not None else "full"
+    print(f"🔁 Incremental: {len(changed)} changed intent(s) {changed}" if cache is not None
+          else f"🔁 Full rebuild ({reason})")
+
+    kinds = sorted({kind for kind, *_ in CANDIDATES.values()})
+    if cache is not None:
+        fold = cache.folds(ids, CV_FOLDS)
+    else:   # same folds cross_val_score(cv=5) uses for a classifier
+        fold = np.empty(len(corpus), dtype=int)
+        for f, (_, te) in enumerate(StratifiedKFold(n_splits=CV_FOLDS).split(corpus, y)):
+            fold[te] = f
+    folds  = [(np.flatnonzero(fold != f), np.flatnonzero(fold == f)) for f in range(CV_FOLDS)]
+    splits = list(range(CV_FOLDS)) + ["full"]
+
+    # ── Features: once per (kind, fold) + once on the full corpus ─────────────
+    with timed(timings, "features"):
+        keys = [(kind, s) for kind in kinds for s in splits]
+        if cache is not None:
+            features = {key: cache.rows(key, ids, corpus) for key in keys}
+        else:
+            fitted   = pool(delayed(fit_features)(kind, corpus, folds[s][0] if s != "full" else np.arange(len(corpus)))
+                            for kind, s in keys)
+            features = dict(zip(keys, fitted))
+
+    def model_tasks(split_list):
+        tasks = [(name, s) for name in CANDIDATES for s in split_list]
+        out   = pool(
+            delayed(fit_model)(CANDIDATES[name][1], *train_test(name, s),
+                               cache.state["models"].get((name, s)) if cache is not None else None,
+                               *held_out(name, s))
+            for name, s in tasks
+        )
+        return dict(zip(tasks, out))
+
+    def train_test(name, s):
+        X  = features[(CANDIDATES[name][0], s)][1]
+        tr = folds[s][0] if s != "full" else np.arange(len(corpus))
+        return X[tr], y[tr], ids[tr]
+
+    def held_out(name, s):
+        if s == "full":
+            return None, None
+        X = features[(CANDIDATES[name][0], s)][1]
+        return X[folds[s][1]], y[folds[s][1]]
+
+    # ── Cross-validation: every (candidate × fold) is an independent task ─────
+    print("Cross-validating " + ", ".join(CANDIDATES) + "...")
+    with timed(timings, "cross_validation"):
+        models = model_tasks(range(CV_FOLDS))
+    cv = {name: np.array([models[(name, f)][2] for f in range(CV_FOLDS)]) for name in CANDIDATES}
+    for name, (_, _, _, short) in CANDIDATES.items():
+        print(f"  ✅ {short + ' Accuracy:':17} {cv[name].mean():.3f} ± {cv[name].std():.3f}")
+
+    # ── Refit every candidate on the full corpus ──────────────────────────────
+    with timed(timings, "refit"):
+        models.update(model_tasks(["full"]))
+    for (name, _), (clf, _, _) in models.items():
+        if name == ENGINE_CANDIDATE:
+            for cc in clf.calibrated_classifiers_:
+                cc.estimator.sparsify()   # most of the hash buckets are empty → keep coef_ as sparse
+    pipes = {name: Pipeline(features[(kind, "full")][0].steps + [("clf", models[(name, "full")][0])])
+             for name, (kind, *_) in CANDIDATES.items()}
+    fits  = dict(Counter(how for _, how, _ in models.values()))
+    print(f"   fits: {fits}")
+
+    # ── Pick best model ───────────────────────────────────────────────────────
+    results   = {name: cv[name].mean() for name in CANDIDATES if name != ENGINE_CANDIDATE}
+    best_name = max(results, key=results.get)
+    best_pipe = pipes[best_name]
+
+    print(f"\n🏆 Best model: {best_name} ({results[best_name]:.3f} accuracy)")
+
+    # ── Cascade: Naive Bayes first, escalate below a tuned top-2 margin ───────
+    with timed(timings, "cascade"):
+        oof = {name: np.zeros((len(corpus), len(le.classes_))) for name in results}
+        for name in results:
+            for f in range(CV_FOLDS):
+                clf, te = models[(name, f)][0], folds[f][1]
+                oof[name][np.ix_(te, clf.classes_)] = clf.predict_proba(held_out(name, f)[0])
+        cascade = tune_cascade(oof, y, CASCADE_FIRST, best_name, cascade_tolerance)
+        cascade["files"] = {name: CANDIDATES[name][2] for name in results}
+    print(f"🪜 Cascade: NB answers, {cascade['target']} below margin {cascade['margin']:.3f} → "
+          f"{cascade['escalation_rate']:.0%} escalated, out-of-fold accuracy {cascade['accuracy']:.3f} "
+          f"(NB {cascade['first_accuracy']:.3f}, best {cascade['best_accuracy']:.3f}, tolerance {cascade_tolerance})")
+
+    # ── Fast path: per-intent gates on the best model's out-of-fold confidence ──
+    fast_path = tune_fast_path(oof[best_name], y, le.classes_.tolist(), corpus)
+    print("⚡ Fast path: " + (", ".join(f"{tag} ≥{r['min_confidence']:.1f}% (margin {r['min_margin']:.1f})"
+                                      for tag, r in fast_path["rules"].items()) or "no intent qualifies"))
+
+    with timed(timings, "engine_report"):
+        latency_sample = corpus[::max(1, len(corpus) // 100)]
+        latency = cache.state["latency"] if cache is not None else {}
+        engines = {
+            "tfidf":  {"model": best_name, **engine_report(best_pipe, results[best_name], latency_sample,
+                                                           latency.get(best_name))},
+            "hashed": {"model": ENGINE_CANDIDATE, "hash_features": HASH_FEATURES,
+                       **engine_report(pipes[ENGINE_CANDIDATE], cv[ENGINE_CANDIDATE].mean(), latency_sample,
+                                       latency.get(ENGINE_CANDIDATE))},
+        }
+    print("\n⚖️  Engines:")
+    for engine, r in engines.items():
+        print(f"   {engine:6} accuracy {r['cv_accuracy']:.3f} | {r['latency_ms']:.2f} ms/msg | "
+              f"{r['model_bytes'] / 1024:.0f} KiB | vocabulary {r['vocabulary_size']}")
+
+    # ── Save models ───────────────────────────────────────────────────────────
+    fallback_tag = kb.fallback
+    responses    = KNOWLEDGE != "sqlite"   # MEDBOT_KNOWLEDGE=sqlite: app.py reads responses from knowledge.db only
+
+    with timed(timings, "save"):
+        joblib.dump(best_pipe,  "models/best_model.pkl")
+        joblib.dump(le,         "models/label_encoder.pkl")
+        for name, (_, _, filename, _) in CANDIDATES.items():
+            joblib.dump(pipes[name], f"models/{filename}")
+
+        if responses:   # one pickled dict is the format: it is built here as app.py will load it
+            joblib.dump({"intent_map": dict(kb.iter_items()), "fallback": fallback_tag}, "models/knowledge.pkl")
+        elif os.path.exists("models/knowledge.pkl"):
+            os.remove("models/knowledge.pkl")
+
+        # Memory-mappable copy of the production model (+ knowledge base, streamed) for MEDBOT_MODEL_FORMAT=compact
+        export_compact(best_pipe, le, kb.iter_items() if responses else None, fallback_tag, "models/compact")
+
+    with timed(timings, "cache"):
+        TrainCache.save({
+            "settings":     settings,
+            "classes":      le.classes_.tolist(),
+            "fingerprints": fingerprints,
+            "ids":          ids,
+            "fold_of":      dict(zip(ids.tolist(), fold.tolist())),
+            "features":     features,
+            "models":       {key: (repr(CANDIDATES[key[0]][1]), np.sort(train_test(*key)[2]), clf)
+                             for key, (clf, _, _) in models.items()},
+            "latency":      {**latency, **{r["model"]: r["latency_ms"] for r in engines.values()}},
+        })
+
+    timings = {"jobs": jobs, **timings, "total_s": round(time.perf_counter() - started, 3)}
+
+    # Save metadata
+    meta = {
+        "best_model": best_name,
+        "accuracy": {k: round(v, 4) for k, v in results.items()},
+        "num_intents": len(le.classes_),
+        "num_samples": len(corpus),
+        "classes": le.classes_.tolist(),
+        "engines": engines,
+        "cascade": cascade,
+        "fast_path": fast_path,
+        "training": {"mode": mode, "reason": reason if mode == "full" else "",
+                     "changed_intents": changed, "fits": fits},
+        "timings": timings,
+    }
+    with open("models/model_meta.json", "w") as f:
+        json.dump(meta, f, indent=2)
+
+    print("\n⏱️  " + " | ".join(f"{k[:-2]} {v:.2f}s" for k, v in timings.items() if k.endswith("_s")))
+    print("\n✅ Saved:")
+    print("   models/best_model.pkl      ← Production model")
+    print("   models/svm_model.pkl       ← SVM (LinearSVC)")
+    print("   models/nb_model.pkl        ← Naive Bayes")
+    print("   models/lr_model.pkl        ← Logistic Regression")
+    print("   models/hashed_model.pkl    ← Hashed-feature SVM (MEDBOT_ENGINE=hashed)")
+    print("   models/label_encoder.pkl   ← Class labels")
+    if responses:
+        print("   models/knowledge.pkl       ← Medical responses")
+    print("   models/knowledge.db        ← Indexed knowledge store (MEDBOT_KNOWLEDGE=sqlite)")
+    print("   models/model_meta.json     ← Accuracy report")
+    print("   models/compact/            ← Memory-mapped production model" + (" + knowledge" if responses else ""))
+    print("   models/.train_cache/       ← Feature spaces + fold fits for --incremental")
+    print("\n🎉 Training complete!")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Train and evaluate the MedBot intent classifiers.")
+    ap.add_argument("--jobs", type=int, default=int(os.environ.get("MEDBOT_TRAIN_JOBS", 1)),
+                    help="worker processes for feature extraction, CV and refits (-1 = all CPUs)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="reuse models/.train_cache and only update what the changed intents invalidate")
+    ap.add_argument("--cascade-tolerance", type=float, default=float(os.environ.get("MEDBOT_CASCADE_TOLERANCE", 0.01)),
+                    help="accuracy the NB-first cascade may give up against the best model (0.01 = 1 point)")
+    ap.add_argument("--store", default=os.environ.get("MEDBOT_KNOWLEDGE_DB"),
+                    help="train from this knowledge store (see knowledge_store.py) instead of knowledge_base.INTENTS")
+    args = ap.parse_args()
+    main(args.jobs, args.incremental, args.cascade_tolerance, args.store)
@@ -0,0 +1,115 @@
+"""
+MedBot — Incremental training cache (python train.py --incremental)
+===================================================================
+A full train.py run stores what it computed under models/.train_cache/:
+
+  state.joblib
+    settings      → sklearn version, feature settings and classifier params it was built with
+    fingerprints  → {tag: sha1 of the intent's patterns}
+    ids           → stable id of every training sample, in corpus order
+    fold_of       → {sample id: CV fold}
+    features      → {(kind, split): (fitted feature pipeline, rows of every sample)}
+    models        → {(candidate, split): (params, sorted training ids, fitted classifier)}
+    latency       → {candidate: latency_ms} as measured for the engines report
+
+split is a fold number or "full". Editing one intent only adds and removes the
+samples of that intent, so the next --incremental run keeps every fitted feature
+space, transforms the new samples with it, and for each (candidate, split):
+  reused       → the training ids are unchanged, only the fold is re-scored
+  partial_fit  → samples were only added: MultinomialNB.partial_fit on the new rows
+  warm_start   → LogisticRegression starts from the cached coefficients
+  refit        → everything else (liblinear's LinearSVC cannot warm start)
+
+The fitted vocabularies stay frozen, so once the new patterns bring in too many
+n-grams they have never seen (MEDBOT_VOCAB_DRIFT, share of n-gram occurrences),
+or the intent set or any setting changes, train.py falls back to a full rebuild.
+"""
+
+import os, hashlib
+from collections import Counter
+import joblib, numpy as np
+from scipy.sparse import vstack
+from compact_model import char_wb_ngrams
+
+CACHE_DIR   = os.path.join("models", ".train_cache")
+VOCAB_DRIFT = float(os.environ.get("MEDBOT_VOCAB_DRIFT", 0.25))
+
+
+def _sha1(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def intent_fingerprint(intent: dict) -> str:
+    return _sha1("\x1e".join([intent["tag"], *intent["patterns"]]))[:16]
+
+
+def sample_ids(intents: list) -> list:
+    """One id per (tag, pattern, occurrence) — unchanged as long as the pattern is."""
+    ids = []
+    for intent in intents:
+        seen = Counter()
+        for pattern in intent["patterns"]:
+            text = pattern.lower()
+            ids.append(_sha1(f"{intent['tag']}\x1f{text}\x1f{seen[text]}")[:16])
+            seen[text] += 1
+    return ids
+
+
+def new_fold(sample_id: str, n_folds: int) -> int:
+    """Fold for a sample the cached StratifiedKFold split has never seen."""
+    return int(sample_id, 16) % n_folds
+
+
+def unseen_share(texts: list, vocabulary, ngram_range) -> float:
+    """Share of the n-gram occurrences in `texts` that are missing from a fitted vocabulary."""
+    grams = [g for t in texts for g in char_wb_ngrams(t, *ngram_range)]
+    return sum(g not in vocabulary for g in grams) / len(grams) if grams else 0.0
+
+
+class TrainCache:
+    """Load/compare/save the state of the last training run."""
+
+    def __init__(self, state: dict):
+        self.state = state
+
+    @classmethod
+    def load(cls, settings: dict, path: str = CACHE_DIR):
+        """→ (cache or None, reason it cannot be used)."""
+        file = os.path.join(path, "state.joblib")
+        if not os.path.exists(file):
+            return None, "no cache yet"
+        try:
+            state = joblib.load(file)
+        except Exception as e:
+            return None, f"unreadable cache ({e.__class__.__name__})"
+        if state.get("settings", {}).get("features") != settings["features"] \
+                or state["settings"].get("sklearn") != settings["sklearn"]:
+            return None, "feature settings or scikit-learn version changed"
+        return cls(state), ""
+
+    @staticmethod
+    def save(state: dict, path: str = CACHE_DIR):
+        os.makedirs(path, exist_ok=True)
+        tmp = os.path.join(path, "state.joblib.tmp")
+        joblib.dump(state, tmp)
+        os.replace(tmp, os.path.join(path, "state.joblib"))
+
+    def changed_intents(self, fingerprints: dict) -> list:
+        """Tags added, removed or edited since the cached run; fingerprints: tag → intent_fingerprint()."""
+        old, new = self.state["fingerprints"], fingerprints
+        return sorted(tag for tag in old.keys() | new.keys() if old.get(tag) != new.get(tag))
+
+    def rows(self, key, ids: list, texts: list):
+        """Feature rows of `ids` in order: cached rows where possible, new samples transformed."""
+        feats, X = self.state["features"][key]
+        pos   = {sid: i for i, sid in enumerate(self.state["ids"])}
+        added = [i for i, sid in enumerate(ids) if sid not in pos]
+        if added:
+            X = vstack([X, feats.transform([texts[i] for i in added])]).tocsr()
+        extra = dict(zip(added, range(len(pos), len(pos) + len(added))))
+        take  = [pos[sid] if sid in pos else extra[i] for i, sid in enumerate(ids)]
+        return feats, X[take]
+
+    def folds(self, ids: list, n_folds: int) -> np.ndarray:
+        fold_of = self.state["fold_of"]
+        return np.array([fold_of.get(sid, new_fold(sid, n_folds)) for sid in ids])